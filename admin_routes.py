@@ -1,9 +1,18 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from database import get_db, hash_password, get_constituencies
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
+from database import get_db, hash_password, verify_password, needs_rehash, get_constituencies, constituency_id, constituency_name
+from passwords import PasswordHasherBusy
+from ratelimit import rate_limit, form_field
+from voter_import import queue_import, recent_imports
+from storage import store_upload, acquire_upload, release_upload, delete_upload_file
+from uploads import MAX_ROLL_BYTES, MB
+from httpcache import versioned, bump_data_version, data_version, tally_version
+from voting import create_vote_partition
+from queries import run, query_stats
+from purge import queue_purge, pending_purges, ELECTION, CANDIDATE
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
 import os
-from auth import admin_login_required, send_winner_email
+from auth import admin_login_required, send_winner_email, log_audit
 from datetime import datetime
-from werkzeug.utils import secure_filename
 
 admin_bp = Blueprint('admin_routes', __name__)
 
@@ -13,6 +22,25 @@ def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def swap_upload(cursor, old, new):
+    """Move a candidate column from old to new upload; returns a file to delete after commit"""
+    if old == new:
+        return None
+    acquire_upload(cursor, new)
+    return old if release_upload(cursor, old) else None
+
+
+# ----------------------------------------------------------------------
+# REJECTED UPLOADS
+# ----------------------------------------------------------------------
+@admin_bp.errorhandler(RequestEntityTooLarge)
+@admin_bp.errorhandler(UnsupportedMediaType)
+def rejected_upload(e):
+    # Raised by the streaming form parser before the rest of the body is read
+    flash(e.description, "error")
+    return redirect(request.referrer or url_for('admin_routes.admin_dashboard'))
+
+
 # ----------------------------------------------------------------------
 # UPDATE ELECTION STATUS
 # ----------------------------------------------------------------------
@@ -25,13 +53,14 @@ def update_election_status():
             cursor.execute("""
                 UPDATE elections
                 SET status = 'active'
-                WHERE start_time <= %s AND end_time >= %s AND status = 'upcoming'
+                WHERE start_time <= %s AND end_time >= %s AND status = 'upcoming' AND deleted_at IS NULL
             """, (current_time, current_time))
+            changed = cursor.rowcount
 
             # Find newly completed elections
             cursor.execute("""
                 SELECT * FROM elections
-                WHERE end_time < %s AND status != 'completed'
+                WHERE end_time < %s AND status != 'completed' AND deleted_at IS NULL
             """, (current_time,))
             completed = cursor.fetchall()
 
@@ -40,6 +69,8 @@ def update_election_status():
                 cursor.execute("UPDATE elections SET status='completed' WHERE id=%s", (election['id'],))
                 send_election_winner_email(election['id'])
 
+            if changed or completed:
+                bump_data_version(cursor)
             db.commit()
 
 
@@ -55,21 +86,12 @@ def send_election_winner_email(election_id):
     try:
         with get_db() as db:
             with db.cursor() as cursor:
-                cursor.execute('SELECT * FROM elections WHERE id = %s', (election_id,))
-                election = cursor.fetchone()
+                election = run(cursor, 'election_by_id', (election_id,)).fetchone()
                 if not election:
                     return False, "election_not_found"
 
                 # Get results for the election's constituency
-                cursor.execute("""
-                    SELECT c.name, c.party, COUNT(v.id) AS vote_count
-                    FROM candidates c
-                    LEFT JOIN votes v ON c.id = v.candidate_id AND v.election_id = %s
-                    WHERE c.constituency = %s
-                    GROUP BY c.id
-                    ORDER BY vote_count DESC
-                """, (election_id, election['constituency']))
-                results = cursor.fetchall()
+                results = run(cursor, 'tally', (election_id, election['constituency_id'])).fetchall()
 
                 if not results:
                     return False, "no_results"
@@ -87,12 +109,13 @@ def send_election_winner_email(election_id):
                     return False, "no_voter_emails_configured"
 
                 subject = f"Election Results: {election['title']}"
+                constituency = constituency_name(election['constituency_id'])
                 
                 # Create more detailed content for voters
                 text_content = f"""
 ELECTION RESULTS: {election['title']}
 
-CONSTITUENCY: {election['constituency']}
+CONSTITUENCY: {constituency}
 
 WINNER: {winner['name']} ({winner['party']})
 Votes: {winner['vote_count']} ({winner_percentage:.1f}%)
@@ -101,7 +124,7 @@ FULL RESULTS:
 """
                 html_content = f"""
 <h2>Election Results: {election['title']}</h2>
-<p><strong>Constituency:</strong> {election['constituency']}</p>
+<p><strong>Constituency:</strong> {constituency}</p>
 
 <div style="background: #fff3cd; padding: 15px; border-radius: 5px; margin: 15px 0;">
     <h3 style="color: #856404; margin-top: 0;">🏆 WINNER</h3>
@@ -180,6 +203,7 @@ FULL RESULTS:
 # ADMIN LOGIN (FIXED VERSION)
 # ----------------------------------------------------------------------
 @admin_bp.route('/admin/login', methods=['GET', 'POST'])
+@rate_limit('admin_login', account=form_field('username'))
 def admin_login():
     if request.method == 'POST':
         username = request.form['username'].strip()
@@ -187,10 +211,6 @@ def admin_login():
         
         print(f"DEBUG: Login attempt for username: '{username}'")
         
-        # Hash the entered password
-        hashed_password = hash_password(password)
-        print(f"DEBUG: Hashed password (first 20 chars): {hashed_password[:20]}...")
-        
         with get_db() as db:
             with db.cursor() as cursor:
                 # Check if any admin exists in the database
@@ -210,11 +230,28 @@ def admin_login():
                 
                 if admin:
                     print(f"DEBUG: Found admin in DB: '{admin['username']}'")
-                    print(f"DEBUG: DB password hash (first 20 chars): {admin['password'][:20]}...")
-                    print(f"DEBUG: Entered password hash (first 20 chars): {hashed_password[:20]}...")
                     
                     # Compare password hashes
-                    if admin['password'] == hashed_password:
+                    try:
+                        valid = verify_password(password, admin['password'])
+                    except PasswordHasherBusy:
+                        flash("The server is busy. Please try logging in again in a moment.", "error")
+                        return render_template('admin_login.html'), 503
+                    
+                    if valid:
+                        # Upgrade legacy SHA-256 / low-cost hashes now that we know the password
+                        if needs_rehash(admin['password']):
+                            try:
+                                cursor.execute(
+                                    "UPDATE admins SET password = %s WHERE id = %s",
+                                    (hash_password(password), admin['id'])
+                                )
+                                db.commit()
+                            except PasswordHasherBusy:
+                                pass  # busy: the next login upgrades it
+                        
+                        # A fresh session id, so one planted before login can't be reused
+                        session.regenerate()
                         session['admin_id'] = admin['id']
                         session['admin_username'] = admin['username']
                         flash("Login successful!", "success")
@@ -232,49 +269,63 @@ def admin_login():
 # ----------------------------------------------------------------------
 # DASHBOARD
 # ----------------------------------------------------------------------
+def dashboard_version():
+    # Statuses are brought up to date here, before the version is read
+    update_election_status()
+    with get_db(readonly=True) as db:
+        with db.cursor() as cursor:
+            # Not votes_id_seq.last_value: replicas see sequences advance in
+            # steps of 32, so it would miss new votes there
+            cursor.execute("""
+                SELECT (SELECT MAX(id) FROM voters) AS voters,
+                       (SELECT MAX(id) FROM votes) AS votes
+            """)
+            row = cursor.fetchone()
+            return data_version(cursor), row['voters'], row['votes']
+
+
 @admin_bp.route('/admin/dashboard')
 @admin_login_required
+@versioned(dashboard_version)
 def admin_dashboard():
-    update_election_status()
-
-    with get_db() as db:
+    with get_db(readonly=True) as db:
         with db.cursor() as cursor:
             cursor.execute("SELECT COUNT(*) FROM voters")
             total_voters = cursor.fetchone()['count']
             
-            cursor.execute("SELECT COUNT(*) FROM candidates")
+            cursor.execute("SELECT COUNT(*) FROM candidates WHERE deleted_at IS NULL")
             total_candidates = cursor.fetchone()['count']
             
-            cursor.execute("SELECT COUNT(*) FROM elections WHERE status='active'")
+            cursor.execute("SELECT COUNT(*) FROM elections WHERE status='active' AND deleted_at IS NULL")
             active_elections = cursor.fetchone()['count']
             
             cursor.execute("SELECT COUNT(*) FROM votes")
             total_votes = cursor.fetchone()['count']
             
-            cursor.execute("SELECT * FROM elections ORDER BY created_at DESC")
+            cursor.execute("SELECT * FROM elections WHERE deleted_at IS NULL ORDER BY created_at DESC")
             elections = cursor.fetchall()
     
-    # Convert datetime objects to string format
-    def format_election(election_data):
-        election_dict = dict(election_data)
-        election_dict['start_time'] = election_data['start_time'].strftime('%Y-%m-%d %H:%M')
-        election_dict['end_time'] = election_data['end_time'].strftime('%Y-%m-%d %H:%M')
-        if election_data.get('created_at'):
-            election_dict['created_at'] = election_data['created_at'].strftime('%Y-%m-%d %H:%M')
-        return election_dict
-    
-    formatted_elections = [format_election(e) for e in elections]
-
     return render_template(
         'admin_dashboard.html',
         total_voters=total_voters,
         total_candidates=total_candidates,
         active_elections=active_elections,
         total_votes=total_votes,
-        elections=formatted_elections
+        elections=elections,
+        purges=pending_purges()
     )
 
 
+# ----------------------------------------------------------------------
+# QUERY STATS
+# ----------------------------------------------------------------------
+@admin_bp.route('/admin/query-stats')
+@admin_login_required
+def view_query_stats():
+    """Calls and timings of the registered statements in this worker"""
+    return jsonify(query_stats())
+
+
 # ----------------------------------------------------------------------
 # CREATE ELECTION
 # ----------------------------------------------------------------------
@@ -285,7 +336,7 @@ def create_election():
 
     if request.method == 'POST':
         title = request.form['title']
-        constituency = request.form['constituency']
+        constituency = constituency_id(request.form['constituency'])
         start_time_raw = request.form['start_time']
         end_time_raw = request.form['end_time']
         description = request.form.get('description', '')
@@ -301,6 +352,10 @@ def create_election():
             flash("Invalid date format!", "error")
             return redirect(url_for('admin_routes.create_election'))
 
+        if constituency is None:
+            flash("Unknown constituency!", "error")
+            return redirect(url_for('admin_routes.create_election'))
+
         # Determine status
         now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         if start_time > now:
@@ -314,9 +369,12 @@ def create_election():
         with get_db() as db:
             with db.cursor() as cursor:
                 cursor.execute("""
-                    INSERT INTO elections (title, description, constituency, start_time, end_time, status)
+                    INSERT INTO elections (title, description, constituency_id, start_time, end_time, status)
                     VALUES (%s, %s, %s, %s, %s, %s)
+                    RETURNING id
                 """, (title, description, constituency, start_time, end_time, status))
+                create_vote_partition(cursor, cursor.fetchone()['id'])
+                bump_data_version(cursor)
                 db.commit()
 
         flash("Election created successfully!", "success")
@@ -337,7 +395,7 @@ def create_election():
 def manage_candidates():
     with get_db() as db:
         with db.cursor() as cursor:
-            cursor.execute("SELECT * FROM candidates")
+            cursor.execute("SELECT * FROM candidates WHERE deleted_at IS NULL")
             candidates = cursor.fetchall()
 
     constituencies = get_constituencies()
@@ -357,7 +415,10 @@ def manage_candidates():
 def add_candidate():
     name = request.form['name']
     party = request.form['party']
-    constituency = request.form['constituency']
+    constituency = constituency_id(request.form['constituency'])
+    if constituency is None:
+        flash("Unknown constituency!", "error")
+        return redirect(url_for('admin_routes.manage_candidates'))
 
     # Handle photos
     photo = request.files.get('photo')
@@ -367,21 +428,20 @@ def add_candidate():
     symbol_path = None
 
     if photo and allowed_file(photo.filename):
-        filename = secure_filename(photo.filename)
-        photo_path = f"photo_{datetime.now().timestamp()}_{filename}"
-        photo.save(os.path.join('static/uploads', photo_path))
+        photo_path = store_upload(photo, 'photo')
 
     if symbol and allowed_file(symbol.filename):
-        filename = secure_filename(symbol.filename)
-        symbol_path = f"symbol_{datetime.now().timestamp()}_{filename}"
-        symbol.save(os.path.join('static/uploads', symbol_path))
+        symbol_path = store_upload(symbol, 'symbol')
 
     with get_db() as db:
         with db.cursor() as cursor:
             cursor.execute("""
-                INSERT INTO candidates (name, party, constituency, photo_path, symbol_path)
+                INSERT INTO candidates (name, party, constituency_id, photo_path, symbol_path)
                 VALUES (%s, %s, %s, %s, %s)
             """, (name, party, constituency, photo_path, symbol_path))
+            acquire_upload(cursor, photo_path)
+            acquire_upload(cursor, symbol_path)
+            bump_data_version(cursor)
             db.commit()
 
     flash("Candidate added!", "success")
@@ -396,7 +456,7 @@ def add_candidate():
 def edit_candidate(candidate_id):
     with get_db() as db:
         with db.cursor() as cursor:
-            cursor.execute("SELECT * FROM candidates WHERE id=%s", (candidate_id,))
+            cursor.execute("SELECT * FROM candidates WHERE id=%s AND deleted_at IS NULL", (candidate_id,))
             candidate = cursor.fetchone()
 
     if not candidate:
@@ -408,7 +468,10 @@ def edit_candidate(candidate_id):
     if request.method == 'POST':
         name = request.form['name']
         party = request.form['party']
-        constituency = request.form['constituency']
+        constituency = constituency_id(request.form['constituency'])
+        if constituency is None:
+            flash("Unknown constituency!", "error")
+            return redirect(url_for('admin_routes.edit_candidate', candidate_id=candidate_id))
 
         photo_path = candidate['photo_path']
         symbol_path = candidate['symbol_path']
@@ -416,30 +479,31 @@ def edit_candidate(candidate_id):
         # Photo
         photo = request.files.get('photo')
         if photo and allowed_file(photo.filename):
-            if photo_path and os.path.exists(os.path.join('static/uploads', photo_path)):
-                os.remove(os.path.join('static/uploads', photo_path))
-            filename = secure_filename(photo.filename)
-            photo_path = f"photo_{datetime.now().timestamp()}_{filename}"
-            photo.save(os.path.join('static/uploads', photo_path))
+            photo_path = store_upload(photo, 'photo')
 
         # Symbol
         symbol = request.files.get('symbol')
         if symbol and allowed_file(symbol.filename):
-            if symbol_path and os.path.exists(os.path.join('static/uploads', symbol_path)):
-                os.remove(os.path.join('static/uploads', symbol_path))
-            filename = secure_filename(symbol.filename)
-            symbol_path = f"symbol_{datetime.now().timestamp()}_{filename}"
-            symbol.save(os.path.join('static/uploads', symbol_path))
+            symbol_path = store_upload(symbol, 'symbol')
 
         with get_db() as db:
             with db.cursor() as cursor:
                 cursor.execute("""
                     UPDATE candidates
-                    SET name=%s, party=%s, constituency=%s, photo_path=%s, symbol_path=%s
+                    SET name=%s, party=%s, constituency_id=%s, photo_path=%s, symbol_path=%s
                     WHERE id=%s
                 """, (name, party, constituency, photo_path, symbol_path, candidate_id))
+                unused = [
+                    swap_upload(cursor, candidate['photo_path'], photo_path),
+                    swap_upload(cursor, candidate['symbol_path'], symbol_path),
+                ]
+                bump_data_version(cursor)
                 db.commit()
 
+        # Only remove files once nothing in the database points at them
+        for filename in unused:
+            delete_upload_file(filename)
+
         flash("Candidate updated!", "success")
         return redirect(url_for('admin_routes.manage_candidates'))
 
@@ -454,27 +518,53 @@ def edit_candidate(candidate_id):
 def delete_candidate(candidate_id):
     with get_db() as db:
         with db.cursor() as cursor:
-            cursor.execute("SELECT * FROM candidates WHERE id=%s", (candidate_id,))
+            cursor.execute("SELECT * FROM candidates WHERE id=%s AND deleted_at IS NULL", (candidate_id,))
             candidate = cursor.fetchone()
 
             if not candidate:
                 flash("Candidate not found!", "error")
                 return redirect(url_for('admin_routes.manage_candidates'))
 
-            # Remove files
-            if candidate['photo_path'] and os.path.exists(os.path.join('static/uploads', candidate['photo_path'])):
-                os.remove(os.path.join('static/uploads', candidate['photo_path']))
-
-            if candidate['symbol_path'] and os.path.exists(os.path.join('static/uploads', candidate['symbol_path'])):
-                os.remove(os.path.join('static/uploads', candidate['symbol_path']))
-
-            cursor.execute("DELETE FROM candidates WHERE id=%s", (candidate_id,))
+            # Hidden now; votes, the row and unshared files are purged in the background
+            queue_purge(cursor, CANDIDATE, candidate_id, candidate['name'])
             db.commit()
 
     flash("Candidate deleted!", "success")
     return redirect(url_for('admin_routes.manage_candidates'))
 
 
+# ----------------------------------------------------------------------
+# IMPORT VOTER ROLL
+# ----------------------------------------------------------------------
+@admin_bp.route('/admin/voters/import', methods=['GET', 'POST'])
+@admin_login_required
+def import_voter_roll():
+    if request.method == 'POST':
+        # Rolls are far bigger than the app-wide limit sized for candidate images
+        request.max_content_length = MAX_ROLL_BYTES + MB
+        roll = request.files.get('roll')
+        if not roll or not roll.filename:
+            flash("Please choose a CSV or NDJSON file to import", "error")
+            return redirect(url_for('admin_routes.import_voter_roll'))
+
+        fmt = 'ndjson' if roll.filename.lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+
+        # Large rolls take minutes to hash; a background task imports them
+        with get_db() as db:
+            with db.cursor() as cursor:
+                job_id = queue_import(cursor, roll.stream, roll.filename, fmt, session['admin_id'])
+                log_audit('voter_roll_import', 'admin', session['admin_id'],
+                          f"{roll.filename}: queued as import {job_id}", cursor=cursor)
+                db.commit()
+
+        flash(f"{roll.filename} is queued for import. Refresh this page to follow its progress.", "success")
+        return redirect(url_for('admin_routes.import_voter_roll'))
+
+    imports = recent_imports()
+    report = next((job['report'] for job in imports if job['report']), None)
+    return render_template('import_voters.html', imports=imports, report=report)
+
+
 # ----------------------------------------------------------------------
 # EDIT ELECTION
 # ----------------------------------------------------------------------
@@ -484,7 +574,7 @@ def edit_election(election_id):
     with get_db() as db:
         with db.cursor() as cursor:
             cursor.execute(
-                "SELECT * FROM elections WHERE id = %s",
+                "SELECT * FROM elections WHERE id = %s AND deleted_at IS NULL",
                 (election_id,)
             )
             election = cursor.fetchone()
@@ -497,7 +587,7 @@ def edit_election(election_id):
 
     if request.method == "POST":
         title = request.form["title"]
-        constituency = request.form["constituency"]
+        constituency = constituency_id(request.form["constituency"])
         description = request.form.get("description", "")
         start_time_raw = request.form["start_time"]
         end_time_raw = request.form["end_time"]
@@ -512,6 +602,10 @@ def edit_election(election_id):
             flash("Invalid date format!", "error")
             return redirect(url_for('admin_routes.edit_election', election_id=election_id))
 
+        if constituency is None:
+            flash("Unknown constituency!", "error")
+            return redirect(url_for('admin_routes.edit_election', election_id=election_id))
+
         now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
         if start_time > now:
             status = "upcoming"
@@ -524,22 +618,18 @@ def edit_election(election_id):
             with db.cursor() as cursor:
                 cursor.execute("""
                     UPDATE elections
-                    SET title=%s, description=%s, constituency=%s, start_time=%s, end_time=%s, status=%s
+                    SET title=%s, description=%s, constituency_id=%s, start_time=%s, end_time=%s, status=%s
                     WHERE id=%s
                 """, (title, description, constituency, start_time, end_time, status, election_id))
+                bump_data_version(cursor)
                 db.commit()
 
         flash("Election updated successfully!", "success")
         return redirect(url_for('admin_routes.admin_dashboard'))
 
-    # Convert SQL datetime to datetime-local input format
-    election_data = dict(election)
-    election_data["start_time"] = election["start_time"].strftime('%Y-%m-%dT%H:%M')
-    election_data["end_time"] = election["end_time"].strftime('%Y-%m-%dT%H:%M')
-
     return render_template(
         "edit_election.html",
-        election=election_data,
+        election=election,
         constituencies=constituencies
     )
 
@@ -552,16 +642,14 @@ def edit_election(election_id):
 def delete_election(election_id):
     with get_db() as db:
         with db.cursor() as cursor:
-            cursor.execute("SELECT * FROM elections WHERE id=%s", (election_id,))
+            cursor.execute("SELECT * FROM elections WHERE id=%s AND deleted_at IS NULL", (election_id,))
             election = cursor.fetchone()
             if not election:
                 flash("Election not found!", "error")
                 return redirect(url_for('admin_routes.admin_dashboard'))
 
-            # Optional: delete related votes
-            cursor.execute("DELETE FROM votes WHERE election_id=%s", (election_id,))
-            # Delete the election itself
-            cursor.execute("DELETE FROM elections WHERE id=%s", (election_id,))
+            # Hidden now; its votes partition and the row are purged in the background
+            queue_purge(cursor, ELECTION, election_id, election['title'])
             db.commit()
 
     flash("Election deleted successfully!", "success")
@@ -571,57 +659,35 @@ def delete_election(election_id):
 # ----------------------------------------------------------------------
 # VIEW ELECTION RESULTS
 # ----------------------------------------------------------------------
+def results_version():
+    election_id = request.args.get('election_id', type=int)
+    with get_db(readonly=True) as db:
+        with db.cursor() as cursor:
+            return data_version(cursor), election_id and tally_version(cursor, election_id)
+
+
 @admin_bp.route('/admin/results')
 @admin_login_required
+@versioned(results_version)
 def view_results():
-    election_id = request.args.get('election_id')
+    election_id = request.args.get('election_id', type=int)
 
-    with get_db() as db:
+    with get_db(readonly=True) as db:
         with db.cursor() as cursor:
-            cursor.execute("SELECT * FROM elections ORDER BY created_at DESC")
+            cursor.execute("SELECT * FROM elections WHERE deleted_at IS NULL ORDER BY created_at DESC")
             elections = cursor.fetchall()
 
-            if election_id:
-                cursor.execute("""
-                    SELECT c.name, c.party, COUNT(v.id) AS vote_count
-                    FROM candidates c
-                    LEFT JOIN votes v ON c.id = v.candidate_id AND v.election_id = %s
-                    WHERE c.constituency = (SELECT constituency FROM elections WHERE id = %s)
-                    GROUP BY c.id
-                    ORDER BY vote_count DESC
-                """, (election_id, election_id))
-                results = cursor.fetchall()
-
-                cursor.execute(
-                    "SELECT * FROM elections WHERE id=%s",
-                    (election_id,)
-                )
-                election = cursor.fetchone()
+            election = run(cursor, 'election_by_id', (election_id,)).fetchone() if election_id else None
+            if election:
+                results = run(cursor, 'tally', (election_id, election['constituency_id'])).fetchall()
             else:
                 results = []
-                election = None
     
-    # Convert datetime objects to string format
-    def format_election(election_data):
-        if election_data:
-            election_dict = dict(election_data)
-            election_dict['start_time'] = election_data['start_time'].strftime('%Y-%m-%d %H:%M')
-            election_dict['end_time'] = election_data['end_time'].strftime('%Y-%m-%d %H:%M')
-            if election_data.get('created_at'):
-                election_dict['created_at'] = election_data['created_at'].strftime('%Y-%m-%d %H:%M')
-            return election_dict
-        return None
-    
-    # Convert all elections in the list
-    formatted_elections = []
-    for e in elections:
-        formatted_elections.append(format_election(e))
-
     return render_template(
         'election_results.html',
-        elections=formatted_elections,
+        elections=elections,
         results=results,
-        election=format_election(election)
+        election=election
     )
 
 # ----------------------------------------------------------------------
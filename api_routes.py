@@ -0,0 +1,272 @@
+"""JSON API for elections, ballots, results and voting.
+
+Clients authenticate with the same session cookie as the HTML views.
+Responses are compact JSON (encoded with orjson when it is installed) with
+ISO 8601 timestamps. Endpoints returning elections or candidates accept
+?fields=id,title,... to return only the listed fields.
+
+    GET  /api/v1/elections[?status=active]
+    GET  /api/v1/elections/<id>
+    GET  /api/v1/elections/<id>/ballot
+    GET  /api/v1/elections/<id>/results
+    POST /api/v1/elections/<id>/votes      {"candidate_id": 3}
+    GET  /api/v1/receipts/<token>
+"""
+import json
+from functools import wraps
+
+from flask import Blueprint, request, session, Response
+from werkzeug.exceptions import HTTPException
+
+import voting
+from database import get_db, constituency_id, constituency_name
+from formatting import serialize_datetime
+from httpcache import versioned, data_version, tally_version
+from queries import run, ELECTION_COLUMNS
+from storage_backends import upload_url
+from voter_routes import update_election_status
+from voting import cast_vote, make_receipt, receipt_code, load_receipt
+
+try:
+    import orjson
+except ImportError:  # the standard library encoder is the fallback
+    orjson = None
+
+api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
+
+ELECTION_STATUSES = ('upcoming', 'active', 'completed')
+
+VOTE_STATUS = {
+    voting.CAST: 201,
+    voting.NOT_ACTIVE: 404,
+    voting.WRONG_CONSTITUENCY: 403,
+    voting.INVALID_CANDIDATE: 400,
+    voting.ALREADY_VOTED: 409,
+}
+
+
+# ----------------------------------------------------------------------
+# HELPERS
+# ----------------------------------------------------------------------
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), default=serialize_datetime).encode()
+
+
+def api_response(data, status=200):
+    return Response(dumps(data), status=status, mimetype='application/json')
+
+
+def api_error(message, status):
+    return api_response({'error': message}, status)
+
+
+def requested_fields():
+    fields = request.args.get('fields')
+    if not fields:
+        return None
+    return {field.strip() for field in fields.split(',') if field.strip()}
+
+
+def select_fields(row, fields):
+    if fields is None:
+        return dict(row)
+    return {key: value for key, value in row.items() if key in fields}
+
+
+def election_fields(election, fields):
+    """An election for JSON, with its constituency's name as well as its id"""
+    data = dict(election)
+    data['constituency'] = constituency_name(election['constituency_id'])
+    return select_fields(data, fields)
+
+
+def voter_constituency_id():
+    return constituency_id(session.get('voter_constituency'))
+
+
+def api_login_required(view):
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if 'voter_id' not in session and 'admin_id' not in session:
+            return api_error('Authentication required', 401)
+        return view(*args, **kwargs)
+    return wrapper
+
+
+def is_admin():
+    return 'admin_id' in session
+
+
+def fetch_election(cursor, election_id):
+    """The election, or None if it doesn't exist or the voter may not see it"""
+    election = run(cursor, 'election_by_id', (election_id,)).fetchone()
+    if election and not is_admin() and election['constituency_id'] != voter_constituency_id():
+        return None
+    return election
+
+
+@api_bp.errorhandler(HTTPException)
+def http_error(e):
+    return api_error(e.description, e.code)
+
+
+# ----------------------------------------------------------------------
+# ELECTIONS
+# ----------------------------------------------------------------------
+@api_bp.route('/elections')
+@api_login_required
+def list_elections():
+    status = request.args.get('status')
+    if status and status not in ELECTION_STATUSES:
+        return api_error(f"status must be one of {', '.join(ELECTION_STATUSES)}", 400)
+
+    update_election_status()
+
+    conditions, params = ['deleted_at IS NULL'], []
+    if not is_admin():
+        conditions.append('constituency_id = %s')
+        params.append(voter_constituency_id())
+    if status:
+        conditions.append('status = %s')
+        params.append(status)
+    where = f"WHERE {' AND '.join(conditions)}"
+
+    with get_db() as db:
+        with db.cursor() as cursor:
+            cursor.execute(f'SELECT {ELECTION_COLUMNS} FROM elections {where} ORDER BY start_time DESC',
+                           params)
+            elections = cursor.fetchall()
+
+    fields = requested_fields()
+    return api_response({'elections': [election_fields(e, fields) for e in elections]})
+
+
+@api_bp.route('/elections/<int:election_id>')
+@api_login_required
+def get_election(election_id):
+    update_election_status()
+    with get_db() as db:
+        with db.cursor() as cursor:
+            election = fetch_election(cursor, election_id)
+
+    if not election:
+        return api_error('Election not found', 404)
+    return api_response(election_fields(election, requested_fields()))
+
+
+# ----------------------------------------------------------------------
+# BALLOT
+# ----------------------------------------------------------------------
+@api_bp.route('/elections/<int:election_id>/ballot')
+@api_login_required
+def get_ballot(election_id):
+    with get_db() as db:
+        with db.cursor() as cursor:
+            election = fetch_election(cursor, election_id)
+            if not election:
+                return api_error('Election not found', 404)
+
+            candidates = run(cursor, 'candidates_by_constituency', (election['constituency_id'],)).fetchall()
+
+            has_voted = None
+            if 'voter_id' in session:
+                has_voted = run(cursor, 'has_voted', (session['voter_id'], election_id)).fetchone() is not None
+
+    fields = requested_fields()
+    ballot = []
+    for candidate in candidates:
+        ballot.append(select_fields({
+            'id': candidate['id'],
+            'name': candidate['name'],
+            'party': candidate['party'],
+            'photo_url': upload_url(candidate['photo_path']) if candidate['photo_path'] else None,
+            'symbol_url': upload_url(candidate['symbol_path']) if candidate['symbol_path'] else None,
+        }, fields))
+
+    return api_response({
+        'election_id': election_id,
+        'status': election['status'],
+        'has_voted': has_voted,
+        'candidates': ballot,
+    })
+
+
+# ----------------------------------------------------------------------
+# RESULTS
+# ----------------------------------------------------------------------
+def results_version():
+    election_id = request.view_args['election_id']
+    with get_db(readonly=True) as db:
+        with db.cursor() as cursor:
+            return data_version(cursor), tally_version(cursor, election_id)
+
+
+@api_bp.route('/elections/<int:election_id>/results')
+@api_login_required
+@versioned(results_version)
+def get_results(election_id):
+    with get_db(readonly=True) as db:
+        with db.cursor() as cursor:
+            election = fetch_election(cursor, election_id)
+            # Voters only see final tallies, as on the results page
+            if not election or (not is_admin() and election['status'] != 'completed'):
+                return api_error('Results not available', 404)
+
+            results = run(cursor, 'tally', (election_id, election['constituency_id'])).fetchall()
+
+    fields = requested_fields()
+    return api_response({
+        'election_id': election_id,
+        'status': election['status'],
+        'total_votes': sum(r['vote_count'] for r in results),
+        'results': [select_fields(r, fields) for r in results],
+    })
+
+
+# ----------------------------------------------------------------------
+# VOTING
+# ----------------------------------------------------------------------
+@api_bp.route('/elections/<int:election_id>/votes', methods=['POST'])
+@api_login_required
+def submit_vote(election_id):
+    if 'voter_id' not in session:
+        return api_error('Only voters can vote', 403)
+
+    # JSON only: a cross-site HTML form can't send it, so no CSRF token is
+    # needed here (browser form posts go through the ballot page)
+    if not request.is_json:
+        return api_error('Expected an application/json body', 415)
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return api_error('The body must be a JSON object', 400)
+    try:
+        candidate_id = int(payload.get('candidate_id'))
+    except (TypeError, ValueError):
+        return api_error('candidate_id is required', 400)
+
+    outcome, vote = cast_vote(session['voter_id'], voter_constituency_id(),
+                              election_id, candidate_id)
+    body = {
+        'success': outcome == voting.CAST,
+        'outcome': outcome,
+        'message': voting.MESSAGES[outcome],
+    }
+    if vote:
+        receipt = make_receipt(vote, session['voter_id'], election_id)
+        body.update(receipt=receipt, receipt_code=receipt_code(receipt), voted_at=vote['voted_at'])
+    return api_response(body, VOTE_STATUS[outcome])
+
+
+@api_bp.route('/receipts/<token>')
+def verify_receipt(token):
+    receipt = load_receipt(token)
+    if receipt is None:
+        return api_response({'valid': False}, 404)
+    return api_response({
+        'valid': True,
+        'receipt_code': receipt_code(token),
+        'election_id': receipt['election'],
+        'voted_at': receipt['at'],
+    })
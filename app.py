@@ -1,13 +1,29 @@
 # app.py - Updated version
 
 from flask import Flask, render_template, request, redirect, url_for, session, flash, jsonify
-from database import init_db, get_db
+from database import init_db, get_db, constituency_name
+from migrations import ensure_schema
 from auth import voter_login_required, admin_login_required
+from sessions import create_session_interface, purge_expired_sessions
+from registrations import purge_expired_registrations
+from background import register_task, start_background_tasks
+import ratelimit
+from images import candidate_image
+from formatting import format_datetime
+from assets import init_assets
+from uploads import init_uploads
+from pagecache import cached_page
+from httpcache import init_httpcache
+import upload_gc
+import purge
+import voter_import
 import admin_routes
 import voter_routes
+import api_routes
 import os
 from datetime import datetime
 from dotenv import load_dotenv
+from werkzeug.middleware.proxy_fix import ProxyFix
 import atexit
 
 # Load environment variables
@@ -16,20 +32,30 @@ load_dotenv()
 app = Flask(__name__)
 app.secret_key = os.getenv('SECRET_KEY', 'fallback-secret-key-change-in-production')
 
+# Behind Render's proxy, trust X-Forwarded-For so rate limits and audit logs see client IPs
+trusted_proxy_hops = int(os.getenv('TRUSTED_PROXY_HOPS', 0))
+if trusted_proxy_hops:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=trusted_proxy_hops, x_proto=trusted_proxy_hops)
+
+# Server-side sessions: the cookie only carries a session id
+app.session_interface = create_session_interface()
+
 # Configure upload folder for Render
 app.config['UPLOAD_FOLDER'] = os.path.join(os.getcwd(), 'static', 'uploads')
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+# Stream file parts to disk with per-field size and type checks
+init_uploads(app)
 
 # Ensure upload folder exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
-# Initialize database BEFORE registering blueprints
-print("Initializing database...")
+# Migrations run in the release step (python manage.py migrate); at boot a
+# worker only checks the latest applied one. DB_AUTO_MIGRATE=1 (the default
+# outside gunicorn) applies pending migrations here instead, e.g. for
+# `python app.py`.
 try:
-    init_db()
-    print("Database initialized successfully!")
+    ensure_schema(migrate=os.getenv('DB_AUTO_MIGRATE', '1') == '1')
 except Exception as e:
-    print(f"Warning: Database initialization error: {e}")
+    print(f"Warning: Database schema check failed: {e}")
     print("The app will continue but database operations may fail.")
 
 
@@ -280,6 +306,16 @@ def setup_system():
         messages.append(f"❌ Error during setup: {str(e)}")
         success = False
     
+    security_note = f'''
+            <div class="security-note">
+                <strong>🔒 Security Recommendations:</strong><br>
+                1. Bookmark this page: <strong>{request.url_root}admin/login</strong><br>
+                2. Delete this setup page after use (remove /setup route from app.py)<br>
+                3. Change admin password regularly<br>
+                4. Use different credentials for each environment (dev/staging/prod)
+            </div>
+            ''' if success else ''
+    
     # Return results
     return f'''
     <!DOCTYPE html>
@@ -377,15 +413,7 @@ def setup_system():
                 {"".join([f'<div class="message {("success" if "✅" in msg else "warning" if "⚠️" in msg else "info" if "ℹ️" in msg else "error" if "❌" in msg else "info")}">{msg}</div>' for msg in messages])}
             </div>
             
-            {f'''
-            <div class="security-note">
-                <strong>🔒 Security Recommendations:</strong><br>
-                1. Bookmark this page: <strong>{request.url_root}admin/login</strong><br>
-                2. Delete this setup page after use (remove /setup route from app.py)<br>
-                3. Change admin password regularly<br>
-                4. Use different credentials for each environment (dev/staging/prod)
-            </div>
-            ''' if success else ''}
+            {security_note}
             
             <div class="btn-container">
                 {f'<a href="/admin/login" class="btn btn-login">🔐 Go to Admin Login</a>' if success else ''}
@@ -396,11 +424,37 @@ def setup_system():
     </html>
     '''
 
+# Fingerprinted CSS/JS with far-future caching (templates use asset_url)
+init_assets(app)
+init_httpcache(app)
+
+# Responsive <picture> markup for candidate photos and symbols
+app.jinja_env.globals['candidate_image'] = candidate_image
+# Timestamps are formatted as templates render them: {{ election.end_time|datetime }}
+app.add_template_filter(format_datetime, 'datetime')
+# Rows carry constituency ids: {{ election.constituency_id|constituency }}
+app.add_template_filter(constituency_name, 'constituency')
+
 # Register blueprints
 app.register_blueprint(admin_routes.admin_bp)
 app.register_blueprint(voter_routes.voter_bp)
+app.register_blueprint(api_routes.api_bp)
+
+# Housekeeping that runs in the background of every worker
+register_task('purge_pending_registrations', 300, purge_expired_registrations)
+register_task('purge_sessions', 900, lambda: purge_expired_sessions(app.session_interface))
+if ratelimit.limiter.shared is not None:
+    register_task('purge_rate_limits', 900, ratelimit.limiter.shared.purge_stale)
+if upload_gc.GC_INTERVAL:
+    register_task('upload_gc', upload_gc.GC_INTERVAL, upload_gc.run_gc)
+register_task('purge_deleted', purge.PURGE_INTERVAL, purge.run_purge_jobs)
+register_task('voter_imports', voter_import.IMPORT_INTERVAL, voter_import.run_import_jobs)
+# Under gunicorn with preload_app, each worker starts them in post_fork instead
+if os.getenv('GUNICORN_PRELOAD') != '1':
+    start_background_tasks()
 
 @app.route('/')
+@cached_page
 def index():
     # If user is logged in as voter, redirect to voter dashboard
     if 'voter_id' in session:
@@ -412,6 +466,7 @@ def index():
     return render_template('index.html')
 
 @app.route('/about')
+@cached_page
 def about():
     # If user is logged in as voter, redirect to voter dashboard
     if 'voter_id' in session:
@@ -423,6 +478,7 @@ def about():
     return render_template('about.html')
 
 @app.route('/how-it-works')
+@cached_page
 def how_it_works():
     # If user is logged in as voter, redirect to voter dashboard
     if 'voter_id' in session:
@@ -436,6 +492,8 @@ def how_it_works():
 # Error handlers
 @app.errorhandler(404)
 def not_found_error(error):
+    if request.path.startswith(api_routes.api_bp.url_prefix + '/'):
+        return api_routes.api_error('Not found', 404)
     return render_template('404.html'), 404
 
 @app.errorhandler(500)
@@ -0,0 +1,144 @@
+"""Fingerprinted, precompressed static assets.
+
+CSS and JS under static/ are served from /assets/<path>.<hash>.<ext> with a
+one-year immutable Cache-Control, so browsers never revalidate them; a new
+deploy changes the hash and therefore the URL. Gzip and (when the Brotli
+package is installed) brotli bodies are computed once per worker and chosen
+by Accept-Encoding.
+
+Templates link assets with asset_url('css/style.css').
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from flask import Blueprint, abort, request, url_for, Response
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip is always available
+    brotli = None
+
+STATIC_DIR = 'static'
+ASSET_DIRS = ('css', 'js')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Content-addressed uploads and their variants never change either
+UPLOAD_CACHE_PATTERN = re.compile(r'^/static/uploads/(variants/)?(photo|symbol)_[0-9a-f]{64}')
+MIN_COMPRESS_SIZE = 256
+
+assets_bp = Blueprint('assets', __name__)
+
+_manifest = None  # logical path -> Asset
+_by_url = None    # fingerprinted path -> Asset
+_lock = threading.Lock()
+
+
+class Asset:
+    __slots__ = ('path', 'fingerprinted', 'mimetype', 'etag', 'bodies')
+
+    def __init__(self, path, data):
+        digest = hashlib.sha256(data).hexdigest()
+        stem, ext = os.path.splitext(path)
+        self.path = path
+        self.fingerprinted = f"{stem}.{digest[:12]}{ext}"
+        self.mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        self.etag = digest[:32]
+        self.bodies = compress_bodies(data)
+
+
+def compress_bodies(data):
+    """identity, gzip and (if available) brotli encodings of data, best compression"""
+    bodies = {'identity': data}
+    if len(data) >= MIN_COMPRESS_SIZE:
+        bodies['gzip'] = gzip.compress(data, compresslevel=9, mtime=0)
+        if brotli is not None:
+            bodies['br'] = brotli.compress(data, quality=11)
+    return bodies
+
+
+def build_manifest():
+    manifest = {}
+    for directory in ASSET_DIRS:
+        root = os.path.join(STATIC_DIR, directory)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                full = os.path.join(dirpath, filename)
+                path = os.path.relpath(full, STATIC_DIR).replace(os.sep, '/')
+                with open(full, 'rb') as f:
+                    manifest[path] = Asset(path, f.read())
+    return manifest
+
+
+def asset_manifest():
+    global _manifest, _by_url
+    if _manifest is None:
+        with _lock:
+            if _manifest is None:
+                manifest = build_manifest()
+                _by_url = {asset.fingerprinted: asset for asset in manifest.values()}
+                _manifest = manifest
+    return _manifest
+
+
+def asset_url(path):
+    """URL of the fingerprinted copy of a static file (plain static URL if unknown)"""
+    asset = asset_manifest().get(path)
+    if asset is None:
+        return url_for('static', filename=path)
+    return url_for('assets.serve_asset', filename=asset.fingerprinted)
+
+
+def choose_encoding(available, accept_encoding):
+    """Best of br/gzip the client accepts: highest q-value, then br over gzip.
+    q=0 refuses an encoding, and * covers any not listed."""
+    accepted = parse_accept_header(accept_encoding.lower())
+    best, best_quality = 'identity', 0
+    for encoding in ('br', 'gzip'):
+        quality = accepted.quality(encoding)
+        if encoding in available and quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+@assets_bp.route('/assets/<path:filename>')
+def serve_asset(filename):
+    asset_manifest()
+    asset = _by_url.get(filename)
+    if asset is None:
+        abort(404)
+
+    encoding = choose_encoding(asset.bodies, request.headers.get('Accept-Encoding', ''))
+    etag = f'{asset.etag}-{encoding}'
+    headers = {'Cache-Control': IMMUTABLE, 'Vary': 'Accept-Encoding'}
+
+    if request.if_none_match.contains(etag):
+        return Response(status=304, headers=headers)
+
+    response = Response(asset.bodies[encoding], mimetype=asset.mimetype, headers=headers)
+    if encoding != 'identity':
+        response.headers['Content-Encoding'] = encoding
+    response.set_etag(etag)
+    return response
+
+
+def cache_uploads(response):
+    """after_request hook: content-addressed uploads may be cached forever"""
+    if response.status_code == 200 and UPLOAD_CACHE_PATTERN.match(request.path):
+        response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+def init_assets(app):
+    app.register_blueprint(assets_bp)
+    app.jinja_env.globals['asset_url'] = asset_url
+    app.after_request(cache_uploads)
+
+
+if __name__ == '__main__':
+    for path, asset in sorted(build_manifest().items()):
+        sizes = '  '.join(f"{name}={len(body)}" for name, body in asset.bodies.items())
+        print(f"{path} -> {asset.fingerprinted}  {sizes}")
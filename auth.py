@@ -89,17 +89,26 @@ def send_otp_email(email, otp):
         import traceback
         traceback.print_exc()
         return False
-def log_audit(action, user_type, user_id, details=None):
-    """Log user actions for security auditing"""
+def log_audit(action, user_type, user_id, details=None, cursor=None):
+    """Log user actions for security auditing.
+
+    Pass cursor to write the entry inside the caller's transaction.
+    """
+    if cursor is not None:
+        _insert_audit(cursor, action, user_type, user_id, details)
+        return
     with get_db() as db:
         with db.cursor() as cursor:  # Create a cursor
-            cursor.execute('''
-                INSERT INTO audit_logs (action, user_type, user_id, ip_address, user_agent, details)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            ''', (action, user_type, user_id, request.remote_addr, 
-                  request.headers.get('User-Agent'), details))
+            _insert_audit(cursor, action, user_type, user_id, details)
             db.commit()
 
+def _insert_audit(cursor, action, user_type, user_id, details):
+    cursor.execute('''
+        INSERT INTO audit_logs (action, user_type, user_id, ip_address, user_agent, details)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    ''', (action, user_type, user_id, request.remote_addr, 
+          request.headers.get('User-Agent'), details))
+
 def voter_login_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
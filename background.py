@@ -0,0 +1,72 @@
+"""Periodic housekeeping tasks run on a daemon thread inside each worker.
+
+Tasks are registered with register_task() and started once per process with
+start_background_tasks(). Every task must be safe to run concurrently from
+several workers, since each gunicorn worker runs its own copy.
+
+Set BACKGROUND_TASKS=0 to disable the thread (e.g. for one-off scripts).
+"""
+import os
+import threading
+import time
+import traceback
+
+BACKGROUND_TASKS_ENABLED = os.getenv('BACKGROUND_TASKS', '1') != '0'
+TICK_SECONDS = 5
+
+_tasks = {}  # name -> [interval, fn, next_run]
+_lock = threading.Lock()
+_thread = None
+_stop = threading.Event()
+
+
+def register_task(name, interval, fn):
+    """Run fn every interval seconds (first run one interval after start)"""
+    with _lock:
+        _tasks[name] = [interval, fn, time.monotonic() + interval]
+
+
+def run_task(name):
+    """Run a registered task immediately in the calling thread"""
+    interval, fn, _ = _tasks[name]
+    try:
+        fn()
+    except Exception as e:
+        print(f"[background] task {name} failed: {e}")
+        traceback.print_exc()
+    finally:
+        with _lock:
+            _tasks[name][2] = time.monotonic() + interval
+
+
+def _loop():
+    while not _stop.wait(TICK_SECONDS):
+        now = time.monotonic()
+        with _lock:
+            due = [name for name, (_, _, next_run) in _tasks.items() if next_run <= now]
+        for name in due:
+            run_task(name)
+
+
+def start_background_tasks():
+    global _thread
+    if not BACKGROUND_TASKS_ENABLED or (_thread is not None and _thread.is_alive()):
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_loop, name='background-tasks', daemon=True)
+    _thread.start()
+
+
+def stop_background_tasks():
+    _stop.set()
+
+
+def _after_fork():
+    # Threads do not survive fork; the child has to call start_background_tasks() again
+    global _thread, _lock
+    _thread = None
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
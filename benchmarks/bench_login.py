@@ -0,0 +1,92 @@
+"""Login throughput benchmark for the password hashing executor.
+
+Simulates a login storm: N client threads verify passwords as fast as they
+can while a separate thread measures how long a cheap "vote" operation
+waits for the CPU. Run from the repository root:
+
+    python benchmarks/bench_login.py --clients 64 --seconds 10
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import passwords  # noqa: E402
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run(clients, seconds, legacy_ratio):
+    print(f"bcrypt rounds: {passwords.get_rounds()}  "
+          f"workers: {passwords.HASH_WORKERS}  queue: {passwords.HASH_QUEUE}")
+
+    password = 'correct horse battery staple'
+    modern = passwords.hash_password(password)
+    legacy = passwords._legacy_hash(password)
+
+    latencies = []
+    busy = [0]
+    lock = threading.Lock()
+    stop = time.perf_counter() + seconds
+
+    def client(index):
+        stored = legacy if legacy_ratio and index % int(1 / legacy_ratio) == 0 else modern
+        local = []
+        rejected = 0
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                passwords.verify_password(password, stored)
+                local.append((time.perf_counter() - start) * 1000)
+            except passwords.PasswordHasherBusy:
+                rejected += 1
+        with lock:
+            latencies.extend(local)
+            busy[0] += rejected
+
+    # A stand-in for vote casting: a short CPU task whose latency should stay flat
+    vote_latencies = []
+
+    def voter():
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            sum(range(2000))
+            vote_latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.005)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    threads.append(threading.Thread(target=voter))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    total = len(latencies)
+    print(f"logins verified: {total}  ({total / seconds:.0f}/s)")
+    print(f"rejected as busy: {busy[0]}")
+    if latencies:
+        print(f"login latency ms  p50={statistics.median(latencies):.1f}  "
+              f"p99={percentile(latencies, 99):.1f}  max={max(latencies):.1f}")
+    if vote_latencies:
+        print(f"vote task ms      p50={statistics.median(vote_latencies):.3f}  "
+              f"p99={percentile(vote_latencies, 99):.3f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--legacy-ratio', type=float, default=0.0,
+                        help='fraction of clients whose stored hash is legacy SHA-256')
+    args = parser.parse_args()
+    run(args.clients, args.seconds, args.legacy_ratio)
@@ -0,0 +1,113 @@
+"""Vote casting throughput benchmark.
+
+N client threads cast votes through voting.cast_vote() as fast as they can,
+each for its own voters, and report throughput and latency. Without
+DATABASE_URL it runs against a fresh SQLite file, so it needs no Postgres
+server. Run from the repository root:
+
+    python benchmarks/bench_votes.py --clients 16 --voters 20000
+    DATABASE_URL=postgresql://... python benchmarks/bench_votes.py
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def seed(voters):
+    """One active election with two candidates and `voters` voters. Returns (election_id, constituency_id, candidate_ids, first_voter_id)."""
+    from database import get_db, constituency_id
+    from voting import create_vote_partition
+
+    now = datetime.now()
+    guntur = constituency_id('Guntur')
+    with get_db() as db:
+        with db.cursor() as cursor:
+            cursor.execute('''
+                INSERT INTO elections (title, constituency_id, start_time, end_time, status)
+                VALUES (%s, %s, %s, %s, 'active') RETURNING id
+            ''', ('Benchmark', guntur, now - timedelta(hours=1), now + timedelta(hours=1)))
+            election_id = cursor.fetchone()['id']
+            create_vote_partition(cursor, election_id)
+            candidates = []
+            for name in ('Candidate A', 'Candidate B'):
+                cursor.execute('INSERT INTO candidates (name, party, constituency_id) VALUES (%s, %s, %s) RETURNING id',
+                               (name, 'Benchmark', guntur))
+                candidates.append(cursor.fetchone()['id'])
+            stamp = int(time.time())
+            cursor.executemany(
+                'INSERT INTO voters (name, email, password, constituency_id, is_verified) VALUES (%s, %s, %s, %s, TRUE)',
+                [(f'Voter {i}', f'bench{stamp}-{i}@example.com', 'x', guntur) for i in range(voters)]
+            )
+            cursor.execute('SELECT MIN(id) AS first FROM voters WHERE email LIKE %s', (f'bench{stamp}-%',))
+            first = cursor.fetchone()['first']
+            db.commit()
+    return election_id, guntur, candidates, first
+
+
+def run(clients, voters):
+    from flask import Flask
+
+    from migrations import run_migrations
+    import voting
+
+    run_migrations()
+    election_id, guntur, candidates, first = seed(voters)
+    app = Flask(__name__)
+
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    def client(index):
+        local, failed = [], []
+        with app.test_request_context():
+            for voter_id in range(first + index, first + voters, clients):
+                start = time.perf_counter()
+                outcome, _ = voting.cast_vote(voter_id, guntur, election_id, candidates[voter_id % 2])
+                local.append((time.perf_counter() - start) * 1000)
+                if outcome != voting.CAST:
+                    failed.append(outcome)
+        with lock:
+            latencies.extend(local)
+            failures.extend(failed)
+
+    threads = [threading.Thread(target=client, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    print(f"votes cast: {len(latencies) - len(failures)}  ({len(latencies) / elapsed:.0f}/s)")
+    print(f"failed: {len(failures)}")
+    if latencies:
+        print(f"vote latency ms  p50={statistics.median(latencies):.2f}  "
+              f"p99={percentile(latencies, 99):.2f}  max={max(latencies):.2f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--voters', type=int, default=10000)
+    args = parser.parse_args()
+    if not os.getenv('DATABASE_URL'):
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+        print(f"Using {os.environ['DATABASE_URL']}")
+    os.environ.setdefault('DB_POOL_MAX', str(args.clients))
+    run(args.clients, args.voters)
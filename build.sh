@@ -4,5 +4,5 @@ pip install -r requirements.txt
 # Create static directories
 mkdir -p static/uploads
 
-# Initialize database
-python -c "from database import init_db; init_db()"
\ No newline at end of file
+# Create or upgrade the database schema
+python manage.py migrate
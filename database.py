@@ -1,181 +1,316 @@
+import itertools
 import os
+import threading
 import psycopg2
-from psycopg2.extras import RealDictCursor
-import hashlib
+from psycopg2.pool import ThreadedConnectionPool, PoolError
 from dotenv import load_dotenv
+from flask import g, has_request_context, session
+from passwords import hash_password, verify_password, needs_rehash  # re-exported for callers
+from rows import RowCursor
 
 load_dotenv()
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+POSTGRES = "postgres"
+SQLITE = "sqlite"
 
-if not DATABASE_URL:
-    raise RuntimeError("DATABASE_URL environment variable is not set")
 
-# Fix old Render postgres:// URL
-if DATABASE_URL.startswith("postgres://"):
-    DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+def backend():
+    """SQLITE when DATABASE_URL is a sqlite:/// URL (see sqlite_backend.py), else POSTGRES"""
+    return SQLITE if os.getenv("DATABASE_URL", "").startswith("sqlite:") else POSTGRES
 
+# Connections are pooled per process; size the pool to the worker's threads
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", 1))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", 10))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
 
-def get_db():
-    """Get PostgreSQL database connection (local + Render safe)"""
-    try:
-        DATABASE_URL = os.getenv("DATABASE_URL")
+# Read replicas for get_db(readonly=True), comma separated. Reads wait for
+# nothing: a replica that hasn't replayed the session's last write yet is
+# skipped, and the primary answers if none has.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+if backend() == SQLITE:  # a SQLite file has no replicas
+    DATABASE_REPLICA_URLS = []
+# Session key holding the WAL position of the session's last write
+WRITE_LSN_KEY = "_db_write_lsn"
+
+PRIMARY = "primary"
+
+_pools = {}  # name -> pool, for this process
+_pools_pid = None
+_pool_lock = threading.Lock()
+# Pools inherited across a fork are kept referenced, never closed: closing
+# them in the child would tear down the parent's server connections
+_inherited_pools = []
+_replica_order = itertools.count()
+_local = threading.local()
+
+
+class BlockingConnectionPool(ThreadedConnectionPool):
+    """ThreadedConnectionPool that waits for a free connection instead of raising"""
+
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        self._slots = threading.BoundedSemaphore(maxconn)
+        super().__init__(minconn, maxconn, *args, **kwargs)
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=DB_POOL_TIMEOUT):
+            raise PoolError(f"no database connection free after {DB_POOL_TIMEOUT}s")
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
+
+
+class PooledConnection:
+    """A borrowed connection. `with get_db() as db:` commits (or rolls back on
+    error) on exit like a plain psycopg2 connection, then returns it to the pool."""
+
+    def __init__(self, pool, conn, primary=True):
+        self._pool = pool
+        self._conn = conn
+        self._primary = primary
+
+    def __enter__(self):
+        return self._conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close(commit=exc_type is None,
+                   broken=isinstance(exc, (psycopg2.OperationalError, psycopg2.InterfaceError)))
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self, commit=False, broken=False):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        try:
+            if not conn.closed:
+                if commit:
+                    conn.commit()
+                else:
+                    conn.rollback()
+                if self._primary and getattr(_local, "wrote", False):
+                    _local.wrote = False
+                    _remember_write(conn)
+        except psycopg2.Error:
+            broken = True
+        finally:
+            self._pool.putconn(conn, close=broken or bool(conn.closed))
+
+
+def _connect_kwargs(database_url=None):
+    database_url = database_url or os.getenv("DATABASE_URL")
+
+    if not database_url:
+        raise RuntimeError("DATABASE_URL is not set")
+
+    # Fix old postgres:// URLs
+    if database_url.startswith("postgres://"):
+        database_url = database_url.replace("postgres://", "postgresql://", 1)
+
+    # Detect local vs Render
+    is_local = "localhost" in database_url or "127.0.0.1" in database_url
+
+    return dict(
+        dsn=database_url,
+        cursor_factory=RowCursor,
+        sslmode="disable" if is_local else "require"
+    )
+
+
+def get_pool(name=PRIMARY):
+    """This process's pool for the primary or for replica `name` ('replica0', ...)"""
+    global _pools, _pools_pid
+    if _pools_pid != os.getpid() or name not in _pools:
+        with _pool_lock:
+            if _pools_pid != os.getpid():
+                _inherited_pools.extend(_pools.values())
+                _pools = {}
+                _pools_pid = os.getpid()
+            if name not in _pools and backend() == SQLITE:
+                from sqlite_backend import SQLitePool
+                _pools[name] = SQLitePool(DB_POOL_MIN, DB_POOL_MAX, os.getenv("DATABASE_URL"), DB_POOL_TIMEOUT)
+            elif name not in _pools:
+                if name == PRIMARY:
+                    kwargs = _connect_kwargs()
+                else:
+                    kwargs = _connect_kwargs(DATABASE_REPLICA_URLS[int(name[len("replica"):])])
+                    # A misconfigured URL pointing at the primary must not take writes
+                    kwargs["options"] = "-c default_transaction_read_only=on"
+                _pools[name] = BlockingConnectionPool(DB_POOL_MIN, DB_POOL_MAX, **kwargs)
+    return _pools[name]
+
+
+def close_pool():
+    """Close this process's connections (e.g. in the gunicorn master before forking)"""
+    global _pools, _pools_pid
+    with _pool_lock:
+        if _pools_pid == os.getpid():
+            for pool in _pools.values():
+                pool.closeall()
+        _pools = {}
+        _pools_pid = None
 
-        if not DATABASE_URL:
-            raise RuntimeError("DATABASE_URL is not set")
 
-        # Fix old postgres:// URLs
-        if DATABASE_URL.startswith("postgres://"):
-            DATABASE_URL = DATABASE_URL.replace("postgres://", "postgresql://", 1)
+def reset_pool():
+    """Forget pools inherited from the parent process without closing them"""
+    global _pools, _pools_pid
+    with _pool_lock:
+        if _pools and _pools_pid != os.getpid():
+            _inherited_pools.extend(_pools.values())
+            _pools = {}
+            _pools_pid = None
 
-        # Detect local vs Render
-        is_local = "localhost" in DATABASE_URL or "127.0.0.1" in DATABASE_URL
 
-        conn = psycopg2.connect(
-            DATABASE_URL,
-            cursor_factory=RealDictCursor,
-            sslmode="disable" if is_local else "require"
-        )
-        return conn
+# ----------------------------------------------------------------------
+# READ-YOUR-WRITES
+# ----------------------------------------------------------------------
+def mark_write():
+    """Call inside a transaction whose changes the session must see on its next
+    read-only query; the WAL position is recorded when the transaction ends."""
+    if DATABASE_REPLICA_URLS and has_request_context():
+        _local.wrote = True
 
+
+def _remember_write(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT pg_current_wal_lsn()::text AS lsn")
+        lsn = cursor.fetchone()["lsn"]
+    conn.rollback()
+    if has_request_context():
+        session[WRITE_LSN_KEY] = lsn
+
+
+def _replica_connection():
+    """A connection to a replica that has replayed this session's last write, or None.
+    The first replica chosen is kept for the rest of the request, so ETag
+    version checks and the page they describe read the same snapshot."""
+    min_lsn = session.get(WRITE_LSN_KEY) if has_request_context() else None
+    pinned = g.get("_db_replica") if has_request_context() else None
+    if pinned == PRIMARY:
+        return None
+
+    if pinned is not None:
+        candidates = [pinned]
+    else:
+        start = next(_replica_order)
+        candidates = [f"replica{(start + i) % len(DATABASE_REPLICA_URLS)}"
+                      for i in range(len(DATABASE_REPLICA_URLS))]
+
+    for name in candidates:
+        try:
+            pool = get_pool(name)
+            conn = pool.getconn()
+        except (psycopg2.Error, PoolError) as e:
+            print(f"Replica {name} unavailable: {e}")
+            continue
+        borrowed = PooledConnection(pool, conn, primary=False)
+        if min_lsn and pinned is None:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT COALESCE(pg_last_wal_replay_lsn() >= %s::pg_lsn, TRUE) AS caught_up",
+                                   (min_lsn,))
+                    caught_up = cursor.fetchone()["caught_up"]
+            except psycopg2.Error as e:
+                print(f"Replica {name} unavailable: {e}")
+                borrowed.close(broken=True)
+                continue
+            if not caught_up:
+                borrowed.close()
+                continue
+        if has_request_context():
+            g._db_replica = name
+        return borrowed
+
+    if has_request_context():
+        g._db_replica = PRIMARY
+    return None
+
+
+def connect():
+    """A dedicated connection outside the pool, for work that changes session
+    settings pooled connections shouldn't inherit (e.g. migrations)"""
+    if backend() == SQLITE:
+        from sqlite_backend import connect as connect_sqlite
+        return connect_sqlite(os.getenv("DATABASE_URL"))
+    return psycopg2.connect(**_connect_kwargs())
+
+
+def get_db(readonly=False):
+    """Borrow a PostgreSQL (or SQLite) connection from the process's pool (local + Render safe).
+    readonly=True may be served by a replica (see DATABASE_REPLICA_URLS)."""
+    if readonly and DATABASE_REPLICA_URLS:
+        replica = _replica_connection()
+        if replica is not None:
+            return replica
+    try:
+        pool = get_pool()
+        return PooledConnection(pool, pool.getconn())
     except Exception as e:
         print(f"Database connection error: {e}")
         raise
 
 
-def hash_password(password):
-    return hashlib.sha256(password.encode()).hexdigest()
+def init_db():
+    """Create or upgrade the schema by applying pending migrations (see migrations.py)"""
+    from migrations import run_migrations
+    run_migrations()
+    # REMOVED DEFAULT ADMIN - No admin is created automatically
+    print("✅ Database initialized. No default admin created.")
 
 
-def init_db():
-    """Initialize PostgreSQL database schema"""
-    with get_db() as db:
-        with db.cursor() as cursor:
-
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS constituencies (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR(255) UNIQUE NOT NULL,
-                    state VARCHAR(255) NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS voters (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR(255) NOT NULL,
-                    email VARCHAR(255) UNIQUE NOT NULL,
-                    password VARCHAR(255) NOT NULL,
-                    constituency VARCHAR(255) NOT NULL,
-                    is_verified BOOLEAN DEFAULT FALSE,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS admins (
-                    id SERIAL PRIMARY KEY,
-                    username VARCHAR(255) UNIQUE NOT NULL,
-                    password VARCHAR(255) NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS candidates (
-                    id SERIAL PRIMARY KEY,
-                    name VARCHAR(255) NOT NULL,
-                    party VARCHAR(255) NOT NULL,
-                    constituency VARCHAR(255) NOT NULL,
-                    photo_path TEXT,
-                    symbol_path TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS elections (
-                    id SERIAL PRIMARY KEY,
-                    title VARCHAR(255) NOT NULL,
-                    description TEXT,
-                    constituency VARCHAR(255) NOT NULL,
-                    start_time TIMESTAMP NOT NULL,
-                    end_time TIMESTAMP NOT NULL,
-                    status VARCHAR(50) NOT NULL,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS votes (
-                    id SERIAL PRIMARY KEY,
-                    voter_id INTEGER NOT NULL,
-                    election_id INTEGER NOT NULL,
-                    candidate_id INTEGER NOT NULL,
-                    voted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                    UNIQUE (voter_id, election_id),
-                    FOREIGN KEY (voter_id) REFERENCES voters (id) ON DELETE CASCADE,
-                    FOREIGN KEY (election_id) REFERENCES elections (id) ON DELETE CASCADE,
-                    FOREIGN KEY (candidate_id) REFERENCES candidates (id) ON DELETE CASCADE
-                )
-            """)
-
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS audit_logs (
-                    id SERIAL PRIMARY KEY,
-                    action VARCHAR(255) NOT NULL,
-                    user_type VARCHAR(50) NOT NULL,
-                    user_id INTEGER NOT NULL,
-                    ip_address VARCHAR(45),
-                    user_agent TEXT,
-                    details TEXT,
-                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
-
-            # Andhra Pradesh constituencies
-            ap_constituencies = [
-                'Araku', 'Srikakulam', 'Vizianagaram', 'Visakhapatnam',
-                'Anakapalli', 'Kakinada', 'Amalapuram', 'Rajahmundry',
-                'Narasapuram', 'Eluru', 'Machilipatnam', 'Vijayawada',
-                'Guntur', 'Narasaraopet', 'Bapatla', 'Ongole',
-                'Nandyal', 'Kurnool', 'Anantapur', 'Hindupur',
-                'Kadapa', 'Nellore', 'Tirupati', 'Rajampet',
-                'Chittoor'
-            ]
-
-            for constituency in ap_constituencies:
-                cursor.execute(
-                    """
-                    INSERT INTO constituencies (name, state)
-                    VALUES (%s, %s)
-                    ON CONFLICT (name) DO NOTHING
-                    """,
-                    (constituency, "Andhra Pradesh")
-                )
-
-            # REMOVED DEFAULT ADMIN - No admin is created automatically
-            print("✅ Database initialized. No default admin created.")
-
-        db.commit()
+# ----------------------------------------------------------------------
+# CONSTITUENCIES
+# ----------------------------------------------------------------------
+# Voters, candidates and elections reference constituencies.id. The table
+# only changes through migrations, so each process reads it once and maps
+# names to ids (and back) from memory.
+_constituencies = None  # (names in order, id by name, name by id)
+_constituencies_lock = threading.Lock()
 
 
-if __name__ == '__main__':
-    # Initialize database on startup
-    try:
-        from database import initialize_database
-        initialize_database()
-    except Exception as e:
-        print(f"Warning: Could not initialize database: {e}")
-    
-    app.run(debug=True)
+def _constituency_maps():
+    global _constituencies
+    if _constituencies is None:
+        with _constituencies_lock:
+            if _constituencies is None:
+                with get_db() as db:
+                    with db.cursor() as cursor:
+                        cursor.execute("SELECT id, name FROM constituencies ORDER BY name")
+                        rows = cursor.fetchall()
+                _constituencies = ([row["name"] for row in rows],
+                                   {row["name"]: row["id"] for row in rows},
+                                   {row["id"]: row["name"] for row in rows})
+    return _constituencies
+
+
+def reload_constituencies():
+    """Forget the cached constituencies; the next lookup reads the table again"""
+    global _constituencies
+    _constituencies = None
 
 
 def get_constituencies():
-    """Fetch constituencies"""
-    with get_db() as db:
-        with db.cursor() as cursor:
-            cursor.execute("SELECT name FROM constituencies ORDER BY name")
-            rows = cursor.fetchall()
-            return [row["name"] for row in rows]
+    """Constituency names, sorted"""
+    return list(_constituency_maps()[0])
+
+
+def constituency_id(name):
+    """id of the constituency called name, or None if there is none"""
+    return _constituency_maps()[1].get(name)
+
+
+def constituency_name(cid):
+    """Name of the constituency with id cid, or None"""
+    return _constituency_maps()[2].get(cid)
+
+
+if __name__ == '__main__':
+    init_db()
@@ -0,0 +1,23 @@
+"""Display and JSON formatting shared by the HTML views and the API.
+
+Rows keep their datetimes; templates format them while rendering with the
+`datetime` filter: {{ election.end_time|datetime }} or
+{{ voter.created_at|datetime('%d %b, %Y') }}.
+"""
+from datetime import datetime
+
+DATETIME_FORMAT = '%Y-%m-%d %H:%M'
+
+
+def format_datetime(value, fmt=DATETIME_FORMAT):
+    """datetime -> display string; strings and None pass through unchanged"""
+    if hasattr(value, 'strftime'):
+        return value.strftime(fmt)
+    return value
+
+
+def serialize_datetime(value):
+    """JSON form of timestamps: ISO 8601, as orjson writes them"""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
@@ -0,0 +1,96 @@
+"""Gunicorn settings for production.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app is preloaded in the master so workers share its imported code;
+each worker then opens its own database pool and background thread in
+post_fork. gevent workers are the exception: they load the app themselves,
+after gevent has monkey-patched the standard library, so that its locks,
+threads and sockets are the cooperative ones.
+
+Worker classes (GUNICORN_WORKER_CLASS):
+    gthread  (default) one worker per core, GUNICORN_THREADS threads each.
+             Requests waiting on Postgres or SMTP release the GIL, so they
+             overlap; bcrypt keeps running on its own thread pool.
+    gevent   one worker per core, GUNICORN_WORKER_CONNECTIONS greenlets each.
+             Needs the gevent and psycogreen packages; psycopg2 is switched
+             to gevent-friendly waits in post_fork. bcrypt calls still block
+             the worker's event loop while they run.
+    sync     2 x cores + 1 single-threaded workers.
+
+WEB_CONCURRENCY overrides the worker count (e.g. on small instances whose
+CPU count reflects the host rather than the container).
+"""
+import os
+import sys
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class not in ('gthread', 'gevent', 'sync'):
+    raise RuntimeError(f"GUNICORN_WORKER_CLASS must be gthread, gevent or sync, not {worker_class!r}")
+
+try:
+    cores = len(os.sched_getaffinity(0))
+except AttributeError:  # not available on macOS
+    cores = os.cpu_count() or 1
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = int(os.getenv('WEB_CONCURRENCY', 2 * cores + 1 if worker_class == 'sync' else cores))
+threads = int(os.getenv('GUNICORN_THREADS', 4)) if worker_class == 'gthread' else 1
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 100))
+
+if worker_class == 'gevent':
+    try:
+        import gevent  # noqa: F401
+        import psycogreen.gevent  # noqa: F401
+        from psycopg2 import extensions
+    except ImportError as e:
+        raise RuntimeError(f"The gevent worker needs gevent and psycogreen installed ({e})")
+    if not hasattr(extensions, 'set_wait_callback'):
+        raise RuntimeError("This psycopg2 build cannot run cooperatively under gevent")
+    # Greenlets share connections; don't let one worker open hundreds
+    os.environ.setdefault('DB_POOL_MAX', '20')
+else:
+    # Enough for every thread plus a nested helper query
+    os.environ.setdefault('DB_POOL_MAX', str(threads * 2))
+
+# Preloading would import the app, and with it threading and psycopg2, in the
+# master before a gevent worker gets to patch them
+preload_app = worker_class != 'gevent'
+if preload_app:
+    # Background threads are started per worker in post_fork, never in the master
+    os.environ['GUNICORN_PRELOAD'] = '1'
+# Schema changes run once per deploy (python manage.py migrate), not at boot
+os.environ.setdefault('DB_AUTO_MIGRATE', '0')
+
+# Winner announcements send mail synchronously; leave room for slow SMTP
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to cap slow memory growth
+max_requests = 2000
+max_requests_jitter = 200
+
+accesslog = '-'
+errorlog = '-'
+
+
+def pre_fork(server, worker):
+    # The master used the database while preloading (schema check); don't hand those sockets down
+    database = sys.modules.get('database')
+    if database is not None:
+        database.close_pool()
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        import psycogreen.gevent
+        psycogreen.gevent.patch_psycopg()
+
+    database = sys.modules.get('database')
+    if database is not None:
+        database.reset_pool()
+
+    background = sys.modules.get('background')
+    if background is not None:
+        background.start_background_tasks()
@@ -0,0 +1,136 @@
+"""Compression and conditional requests for dynamic pages.
+
+compress_response() is an after_request hook that gzips (or brotli-encodes)
+HTML and JSON bodies above COMPRESS_MIN_SIZE.
+
+@versioned(version_fn) gives a view a weak ETag built from cheap data
+versions instead of a hash of the rendered body. version_fn runs before the
+view and returns anything hashable describing the data the page shows,
+e.g. the election's tally version. When the client's If-None-Match still
+matches, the view is skipped and a 304 goes out, so polling a results page
+costs one small query.
+
+Data versions:
+    catalog          counter in data_versions, bumped by every change to
+                     elections or candidates (bump_data_version)
+    tally_version()  highest vote id in an election; votes are insert-only,
+                     so it changes exactly when the tally does
+"""
+import gzip
+import hashlib
+import os
+from functools import wraps
+
+from flask import current_app, request, session, Response
+
+from assets import choose_encoding
+from pagecache import template_version
+from database import mark_write
+from queries import run
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+COMPRESS_MIMETYPES = {'text/html', 'application/json'}
+# Per-request compression: favour speed over the last few percent
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+CATALOG = 'catalog'
+
+
+# ----------------------------------------------------------------------
+# DATA VERSIONS
+# ----------------------------------------------------------------------
+def bump_data_version(cursor, name=CATALOG):
+    """Record a change (inside the caller's transaction)"""
+    cursor.execute('''
+        INSERT INTO data_versions (name, version) VALUES (%s, 1)
+        ON CONFLICT (name) DO UPDATE SET version = data_versions.version + 1
+    ''', (name,))
+    # The admin's next page may be read from a replica; make it wait for this
+    mark_write()
+
+
+def data_version(cursor, name=CATALOG):
+    row = run(cursor, 'data_version', (name,)).fetchone()
+    return row['version'] if row else 0
+
+
+def tally_version(cursor, election_id):
+    return run(cursor, 'tally_version', (election_id,)).fetchone()['version']
+
+
+# ----------------------------------------------------------------------
+# CONDITIONAL REQUESTS
+# ----------------------------------------------------------------------
+def _viewer():
+    return session.get('voter_id'), session.get('admin_id')
+
+
+def versioned(version_fn):
+    """Weak ETag from version_fn() plus the URL, viewer and template version; 304 if unchanged"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Always called: version functions may refresh state the view relies on
+            version = version_fn()
+            # Flash messages are one-off content the ETag knows nothing about
+            if request.method != 'GET' or '_flashes' in session:
+                return view(*args, **kwargs)
+
+            key = repr((request.full_path, _viewer(), template_version(), version))
+            etag = hashlib.sha256(key.encode()).hexdigest()[:32]
+            headers = {'Cache-Control': 'private, no-cache'}
+
+            if request.if_none_match.contains_weak(etag):
+                # A 304 must repeat the validator it confirms
+                response = Response(status=304, headers=headers)
+                response.set_etag(etag, weak=True)
+                return response
+
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code == 200:
+                response.set_etag(etag, weak=True)
+                response.headers.update(headers)
+            return response
+        return wrapper
+    return decorator
+
+
+# ----------------------------------------------------------------------
+# COMPRESSION
+# ----------------------------------------------------------------------
+def compress_response(response):
+    """after_request hook: compress HTML/JSON bodies the client accepts"""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESS_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_SIZE:
+        return response
+
+    available = ('br', 'gzip') if brotli is not None else ('gzip',)
+    encoding = choose_encoding(available, request.headers.get('Accept-Encoding', ''))
+    if encoding == 'br':
+        body = brotli.compress(data, quality=BROTLI_QUALITY)
+    elif encoding == 'gzip':
+        body = gzip.compress(data, compresslevel=GZIP_LEVEL)
+    else:
+        return response
+
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+
+def init_httpcache(app):
+    app.after_request(compress_response)
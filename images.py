@@ -0,0 +1,186 @@
+"""Resized variants of candidate photos and party symbols.
+
+Every upload gets square thumbnails at VARIANT_WIDTHS in WebP and JPEG,
+stored under variants/ in the upload storage backend with all metadata
+stripped. Variants
+are generated on a background thread so the admin request returns as soon
+as the original is on disk; until they exist, templates fall back to the
+original file.
+
+Backfill variants for existing uploads with:
+    python images.py
+"""
+import importlib.util
+import io
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from markupsafe import Markup, escape
+
+from cache import LRUCache
+from storage_backends import get_storage, upload_url
+
+# Pillow is optional; without it the originals are served. It is imported on
+# first use so that booting a worker doesn't pay for it.
+PILLOW_AVAILABLE = importlib.util.find_spec('PIL') is not None
+
+# Ballot photos render at 80-100px and symbols at 40px; these cover 1x-3x screens
+VARIANT_WIDTHS = (80, 160, 320)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+
+IMAGE_WORKERS = int(os.getenv('IMAGE_WORKERS', 1))
+_executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix='image-variants')
+# Which uploads already have variants. Another worker may delete them (the
+# upload was released) so hits are re-checked too, just less often than misses.
+VARIANT_READY_TTL = float(os.getenv('VARIANT_READY_TTL', 300))
+VARIANT_MISSING_TTL = 30
+_ready = LRUCache(maxsize=4096, ttl=VARIANT_READY_TTL)
+
+
+def variant_name(filename, width, ext):
+    stem = os.path.splitext(filename)[0]
+    return f"{stem}_w{width}.{ext}"
+
+
+def upload_kind(filename):
+    return 'symbol' if filename.startswith(('symbol_', 'party_symbol_')) else 'photo'
+
+
+def variant_key(filename, width, ext):
+    return 'variants/' + variant_name(filename, width, ext)
+
+
+def _square(image, width, kind):
+    from PIL import Image, ImageOps
+    if kind == 'symbol':
+        # Symbols keep their whole outline, centred on a transparent square
+        image = ImageOps.contain(image, (width, width), Image.LANCZOS)
+        canvas = Image.new('RGBA', (width, width), (255, 255, 255, 0))
+        canvas.paste(image, ((width - image.width) // 2, (width - image.height) // 2))
+        return canvas
+    return ImageOps.fit(image, (width, width), Image.LANCZOS)
+
+
+def generate_variants(filename, kind='photo'):
+    """Write every variant of an upload. Returns the number of files written."""
+    if not PILLOW_AVAILABLE:
+        return 0
+    from PIL import Image, ImageOps
+
+    storage = get_storage()
+    with storage.open(filename) as source, Image.open(source) as original:
+        original.seek(0)  # first frame of animated GIFs
+        # Bake in the camera orientation before EXIF is discarded
+        image = ImageOps.exif_transpose(original).convert('RGBA')
+
+    written = 0
+    for width in VARIANT_WIDTHS:
+        resized = _square(image, width, kind)
+        for ext, (fmt, options) in FORMATS.items():
+            out = resized
+            if fmt == 'JPEG':
+                background = Image.new('RGB', resized.size, (255, 255, 255))
+                background.paste(resized, mask=resized.split()[-1])
+                out = background
+            buffer = io.BytesIO()
+            out.save(buffer, fmt, **options)
+            storage.save_bytes(variant_key(filename, width, ext), buffer.getvalue())
+            written += 1
+
+    _ready.set(filename, True)
+    return written
+
+
+def _generate_logged(filename, kind):
+    try:
+        generate_variants(filename, kind)
+    except Exception as e:
+        print(f"[images] could not generate variants for {filename}: {e}")
+
+
+def _after_fork():
+    global _executor
+    _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix='image-variants')
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork)
+
+
+def schedule_variants(filename, kind='photo'):
+    """Generate variants off the request thread"""
+    if PILLOW_AVAILABLE and filename:
+        _executor.submit(_generate_logged, filename, kind)
+
+
+def delete_variants(filename):
+    if not filename:
+        return
+    _ready.pop(filename)
+    storage = get_storage()
+    for width in VARIANT_WIDTHS:
+        for ext in FORMATS:
+            storage.delete(variant_key(filename, width, ext))
+
+
+def variants_exist(filename):
+    """Check storage itself (bypassing the cache) for the upload's variants"""
+    ready = get_storage().exists(variant_key(filename, VARIANT_WIDTHS[-1], 'jpg'))
+    _ready.set(filename, ready, ttl=None if ready else VARIANT_MISSING_TTL)
+    return ready
+
+
+def variants_ready(filename):
+    """Whether templates can point at the variants; may be up to VARIANT_READY_TTL stale"""
+    ready = _ready.get(filename)
+    if ready is None:
+        ready = variants_exist(filename)
+    return ready
+
+
+def candidate_image(filename, alt, css_class, size):
+    """<picture> markup serving WebP/JPEG variants sized for a size-px slot"""
+    if not variants_ready(filename):
+        src = upload_url(filename)
+        return Markup(f'<img src="{src}" alt="{escape(alt)}" class="{css_class}" loading="lazy">')
+
+    def srcset(ext):
+        return ', '.join(
+            f"{upload_url(variant_key(filename, w, ext))} {w}w"
+            for w in VARIANT_WIDTHS
+        )
+
+    fallback = upload_url(variant_key(filename, VARIANT_WIDTHS[0], 'jpg'))
+    return Markup(
+        f'<picture>'
+        f'<source type="image/webp" srcset="{srcset("webp")}" sizes="{size}px">'
+        f'<img src="{fallback}" srcset="{srcset("jpg")}" sizes="{size}px" '
+        f'width="{size}" height="{size}" alt="{escape(alt)}" class="{css_class}" loading="lazy">'
+        f'</picture>'
+    )
+
+
+def backfill():
+    """Generate missing variants for every upload already in storage"""
+    count = 0
+    for obj in sorted(get_storage().list(), key=lambda o: o.key):
+        if obj.key.startswith('.') or obj.key.endswith('.tmp') or variants_ready(obj.key):
+            continue
+        try:
+            generate_variants(obj.key, upload_kind(obj.key))
+            count += 1
+            print(f"✅ {obj.key}")
+        except Exception as e:
+            print(f"❌ {obj.key}: {e}")
+    print(f"Generated variants for {count} uploads")
+
+
+if __name__ == '__main__':
+    if not PILLOW_AVAILABLE:
+        print("Pillow is not installed; nothing to do")
+        sys.exit(1)
+    backfill()
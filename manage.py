@@ -0,0 +1,110 @@
+"""Release and maintenance commands.
+
+    python manage.py migrate [--dry-run]  apply pending migrations; run once per deploy
+    python manage.py check                exit 1 unless every migration is applied
+    python manage.py status               list migrations and when they were applied
+    python manage.py import-time [--budget MS]
+                                          time `import app` by module; exit 1 over budget
+
+Workers don't create tables at boot; they only check that the latest
+migration in migrations/ has been applied, so deploys should run `migrate`
+in the release step before new workers start.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+
+def migrate(args):
+    from migrations import run_migrations
+    applied = run_migrations(dry_run=args.dry_run)
+    if not applied:
+        print("✅ Schema is up to date")
+    return 0
+
+
+def check(args):
+    from migrations import ensure_schema
+    if ensure_schema():
+        print("✅ Schema is up to date")
+        return 0
+    return 1
+
+
+def status(args):
+    from migrations import migration_status
+    for migration, applied_at in migration_status():
+        state = applied_at.strftime('%Y-%m-%d %H:%M') if applied_at else 'pending'
+        kind = '' if migration.transactional else ' (no transaction)'
+        print(f"{migration.version:04d}_{migration.name:<32} {state}{kind}")
+    return 0
+
+
+def parse_importtime(output):
+    """-X importtime stderr -> [(cumulative_us, depth, module)]"""
+    modules = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        stripped = name.lstrip()
+        depth = (len(name) - len(stripped) - 1) // 2
+        modules.append((int(cumulative), depth, stripped))
+    return modules
+
+
+def import_time(args):
+    env = dict(os.environ, DB_AUTO_MIGRATE='0', BACKGROUND_TASKS='0')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app'],
+                            cwd=os.path.dirname(os.path.abspath(__file__)),
+                            env=env, capture_output=True, text=True)
+    modules = parse_importtime(result.stderr)
+    if result.returncode != 0 or not modules:
+        print(result.stderr[-2000:])
+        return 1
+
+    # Children are listed before their parent: app's direct imports are the
+    # depth-1 lines between the previous top-level module and app itself
+    total, direct = 0, []
+    for us, depth, name in modules:
+        if depth == 0:
+            if name == 'app':
+                total = us
+                break
+            direct = []
+        elif depth == 1:
+            direct.append((us, depth, name))
+
+    print(f"import app: {total / 1000:.0f} ms")
+    print("Slowest direct imports:")
+    direct = sorted(direct, reverse=True)[:args.top]
+    for us, _, name in direct:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+    if args.budget and total / 1000 > args.budget:
+        print(f"❌ Over the {args.budget} ms budget")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = commands.add_parser('migrate')
+    migrate_parser.add_argument('--dry-run', action='store_true', help='list pending migrations only')
+    migrate_parser.set_defaults(func=migrate)
+    commands.add_parser('check').set_defaults(func=check)
+    commands.add_parser('status').set_defaults(func=status)
+    timing = commands.add_parser('import-time')
+    timing.add_argument('--budget', type=float, default=float(os.getenv('IMPORT_BUDGET_MS', 0)),
+                        help='fail if importing the app takes longer than this many ms')
+    timing.add_argument('--top', type=int, default=15)
+    timing.set_defaults(func=import_time)
+
+    args = parser.parse_args()
+    sys.exit(args.func(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""Ordered, checksummed schema migrations.
+
+Migrations are SQL files in migrations/ named NNNN_description.sql and run
+in version order. Each applied migration is recorded in schema_migrations
+with the SHA-256 of its file; editing a migration after it has been applied
+is an error, so write a new one instead.
+
+A migration runs in a single transaction unless its first line is
+
+    -- migrate: no-transaction
+
+in which case its statements run one by one in autocommit mode (needed for
+CREATE INDEX CONCURRENTLY). Those files are split on semicolons at the end
+of a line, so keep them to plain statements.
+
+Run pending migrations with `python manage.py migrate`. Workers only call
+ensure_schema(), which is one query when the schema is current.
+
+The SQLite backend has its own files in migrations/sqlite/. Its first file
+is numbered after the Postgres migration whose schema it matches, and later
+changes get the same number in both directories.
+"""
+import hashlib
+import os
+import re
+import time
+
+import psycopg2
+import psycopg2.errors
+
+from database import get_db, connect, backend, reload_constituencies, SQLITE
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+SQLITE_MIGRATIONS_DIR = os.path.join(MIGRATIONS_DIR, 'sqlite')
+NO_TRANSACTION = '-- migrate: no-transaction'
+# pg_advisory_lock key: concurrent migrate() runs wait for each other
+MIGRATION_LOCK_ID = 7261001
+
+_FILENAME = re.compile(r'^(\d{4})_(\w+)\.sql$')
+_CONCURRENT_INDEX = re.compile(
+    r'CREATE\s+(?:UNIQUE\s+)?INDEX\s+CONCURRENTLY\s+(?:IF\s+NOT\s+EXISTS\s+)?(\w+)', re.I)
+
+
+class MigrationError(RuntimeError):
+    pass
+
+
+class Migration:
+    __slots__ = ('version', 'name', 'path', 'sql', 'checksum', 'transactional')
+
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path, 'rb') as f:
+            data = f.read().replace(b'\r\n', b'\n')
+        self.sql = data.decode('utf-8')
+        self.checksum = hashlib.sha256(data).hexdigest()
+        self.transactional = not self.sql.lstrip().startswith(NO_TRANSACTION)
+
+    def statements(self):
+        """The file split into statements (for no-transaction migrations)"""
+        lines = [line for line in self.sql.splitlines() if not line.lstrip().startswith('--')]
+        parts = re.split(r';\s*$', '\n'.join(lines), flags=re.M)
+        return [part.strip() for part in parts if part.strip()]
+
+    def __repr__(self):
+        return f'<Migration {self.version:04d}_{self.name}>'
+
+
+def migrations_dir():
+    """Where the configured backend's migrations live"""
+    return SQLITE_MIGRATIONS_DIR if backend() == SQLITE else MIGRATIONS_DIR
+
+
+def load_migrations():
+    """Every migration file, in version order"""
+    directory = migrations_dir()
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = _FILENAME.match(filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2),
+                                        os.path.join(directory, filename)))
+    versions = [m.version for m in migrations]
+    if len(set(versions)) != len(versions):
+        raise MigrationError(f"Duplicate migration versions in {directory}")
+    return migrations
+
+
+def latest_version():
+    """Highest migration version on disk, without reading the files"""
+    versions = [int(m.group(1)) for m in map(_FILENAME.match, os.listdir(migrations_dir())) if m]
+    return max(versions, default=0)
+
+
+def schema_version():
+    """Highest applied migration, or None if migrations never ran"""
+    with get_db() as db:
+        with db.cursor() as cursor:
+            try:
+                cursor.execute("SELECT MAX(version) AS version FROM schema_migrations")
+            except psycopg2.errors.UndefinedTable:
+                db.rollback()
+                return None
+            return cursor.fetchone()["version"]
+
+
+def ensure_schema(migrate=False):
+    """Startup check. Returns True if the schema is current, running the
+    pending migrations first when it isn't and migrate is set."""
+    version, latest = schema_version(), latest_version()
+    # A newer schema is fine: old workers keep serving during a rolling deploy
+    if version is not None and version >= latest:
+        return True
+    if migrate:
+        run_migrations()
+        return True
+    print(f"⚠️ Database schema is at migration {version}, expected {latest}; "
+          "run `python manage.py migrate`")
+    return False
+
+
+# ----------------------------------------------------------------------
+# RUNNER
+# ----------------------------------------------------------------------
+def _applied(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            name VARCHAR(255) NOT NULL,
+            checksum CHAR(64) NOT NULL,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            duration_ms INTEGER
+        )
+    """)
+    cursor.execute("SELECT version, name, checksum FROM schema_migrations ORDER BY version")
+    return {row['version']: row for row in cursor.fetchall()}
+
+
+def _verify(migrations, applied):
+    """Raise if an applied migration was edited or removed"""
+    on_disk = {m.version: m for m in migrations}
+    for version, row in applied.items():
+        migration = on_disk.get(version)
+        if migration is None:
+            raise MigrationError(f"Applied migration {version:04d}_{row['name']} is missing from {migrations_dir()}")
+        if migration.checksum != row['checksum']:
+            raise MigrationError(f"{migration!r} changed after it was applied; add a new migration instead")
+
+
+def _drop_invalid_indexes(cursor, migration):
+    """Drop indexes an interrupted CREATE INDEX CONCURRENTLY left INVALID, so IF NOT EXISTS retries them"""
+    names = _CONCURRENT_INDEX.findall(migration.sql)
+    if not names:
+        return
+    cursor.execute("""
+        SELECT c.relname FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+        WHERE NOT i.indisvalid AND c.relname = ANY(%s)
+    """, (names,))
+    for row in cursor.fetchall():
+        print(f"Dropping invalid index {row['relname']}")
+        cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS "{row["relname"]}"')
+
+
+def _apply(conn, migration):
+    started = time.perf_counter()
+    with conn.cursor() as cursor:
+        if migration.transactional:
+            conn.autocommit = False
+            cursor.execute(migration.sql)
+        else:
+            conn.autocommit = True
+            _drop_invalid_indexes(cursor, migration)
+            for statement in migration.statements():
+                cursor.execute(statement)
+            conn.autocommit = False
+
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        cursor.execute(
+            "INSERT INTO schema_migrations (version, name, checksum, duration_ms) VALUES (%s, %s, %s, %s)",
+            (migration.version, migration.name, migration.checksum, duration_ms)
+        )
+    conn.commit()
+    return duration_ms
+
+
+def _run_sqlite_migrations(migrations, dry_run):
+    """SQLite: one BEGIN IMMEDIATE transaction holds the write lock for the
+    whole run, so concurrent runs wait and a failure leaves nothing applied"""
+    conn = connect()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("BEGIN IMMEDIATE")
+            applied = _applied(cursor)
+            _verify(migrations, applied)
+
+            pending = [m for m in migrations if m.version not in applied]
+            for migration in pending:
+                if dry_run:
+                    print(f"Would apply {migration.version:04d}_{migration.name}")
+                    continue
+                print(f"Applying {migration.version:04d}_{migration.name}...")
+                started = time.perf_counter()
+                try:
+                    for statement in migration.statements():
+                        cursor.execute(statement)
+                except psycopg2.Error as e:
+                    conn.rollback()
+                    raise MigrationError(f"{migration!r} failed: {e}") from e
+                duration_ms = int((time.perf_counter() - started) * 1000)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum, duration_ms) VALUES (%s, %s, %s, %s)",
+                    (migration.version, migration.name, migration.checksum, duration_ms)
+                )
+                print(f"✅ {migration.version:04d}_{migration.name} ({duration_ms} ms)")
+        conn.commit()
+        if pending and not dry_run:
+            reload_constituencies()
+        return pending
+    finally:
+        conn.close()
+
+
+def run_migrations(dry_run=False):
+    """Apply pending migrations in order. Returns the migrations that were (or would be) applied."""
+    migrations = load_migrations()
+    if backend() == SQLITE:
+        return _run_sqlite_migrations(migrations, dry_run)
+    # A dedicated connection: migrations switch autocommit on and off, which
+    # pooled connections shouldn't inherit
+    conn = connect()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+            applied = _applied(cursor)
+        _verify(migrations, applied)
+
+        pending = [m for m in migrations if m.version not in applied]
+        for migration in pending:
+            if dry_run:
+                print(f"Would apply {migration.version:04d}_{migration.name}")
+                continue
+            print(f"Applying {migration.version:04d}_{migration.name}...")
+            try:
+                duration_ms = _apply(conn, migration)
+            except psycopg2.Error as e:
+                conn.rollback()
+                raise MigrationError(f"{migration!r} failed: {e}") from e
+            print(f"✅ {migration.version:04d}_{migration.name} ({duration_ms} ms)")
+        if pending and not dry_run:
+            reload_constituencies()  # a migration may have added some
+        return pending
+    finally:
+        conn.close()  # also releases the advisory lock
+
+
+def migration_status():
+    """[(migration, applied_at or None)] for every migration on disk; raises on checksum mismatches"""
+    migrations = load_migrations()
+    with get_db() as db:
+        with db.cursor() as cursor:
+            applied = _applied(cursor)
+            cursor.execute("SELECT version, applied_at FROM schema_migrations")
+            applied_at = {row['version']: row['applied_at'] for row in cursor.fetchall()}
+    _verify(migrations, applied)
+    return [(m, applied_at.get(m.version)) for m in migrations]
@@ -0,0 +1,28 @@
+-- Andhra Pradesh constituencies
+INSERT INTO constituencies (name, state) VALUES
+    ('Araku', 'Andhra Pradesh'),
+    ('Srikakulam', 'Andhra Pradesh'),
+    ('Vizianagaram', 'Andhra Pradesh'),
+    ('Visakhapatnam', 'Andhra Pradesh'),
+    ('Anakapalli', 'Andhra Pradesh'),
+    ('Kakinada', 'Andhra Pradesh'),
+    ('Amalapuram', 'Andhra Pradesh'),
+    ('Rajahmundry', 'Andhra Pradesh'),
+    ('Narasapuram', 'Andhra Pradesh'),
+    ('Eluru', 'Andhra Pradesh'),
+    ('Machilipatnam', 'Andhra Pradesh'),
+    ('Vijayawada', 'Andhra Pradesh'),
+    ('Guntur', 'Andhra Pradesh'),
+    ('Narasaraopet', 'Andhra Pradesh'),
+    ('Bapatla', 'Andhra Pradesh'),
+    ('Ongole', 'Andhra Pradesh'),
+    ('Nandyal', 'Andhra Pradesh'),
+    ('Kurnool', 'Andhra Pradesh'),
+    ('Anantapur', 'Andhra Pradesh'),
+    ('Hindupur', 'Andhra Pradesh'),
+    ('Kadapa', 'Andhra Pradesh'),
+    ('Nellore', 'Andhra Pradesh'),
+    ('Tirupati', 'Andhra Pradesh'),
+    ('Rajampet', 'Andhra Pradesh'),
+    ('Chittoor', 'Andhra Pradesh')
+ON CONFLICT (name) DO NOTHING;
@@ -0,0 +1,60 @@
+-- Databases created by models.py (SQLAlchemy create_all) differ from the
+-- schema the app queries: votes and audit_logs had a "timestamp" column,
+-- elections had no description, admins required an email, and voters and
+-- candidates carried OTP and image blob columns nothing reads any more
+-- (OTPs live hashed in pending_registrations, images in upload storage).
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = 'votes'
+                 AND column_name = 'timestamp') THEN
+        ALTER TABLE votes RENAME COLUMN "timestamp" TO voted_at;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = 'audit_logs'
+                 AND column_name = 'timestamp') THEN
+        ALTER TABLE audit_logs RENAME COLUMN "timestamp" TO created_at;
+    END IF;
+
+    IF EXISTS (SELECT 1 FROM information_schema.columns
+               WHERE table_schema = current_schema() AND table_name = 'admins'
+                 AND column_name = 'email') THEN
+        ALTER TABLE admins ALTER COLUMN email DROP NOT NULL;
+    END IF;
+END $$;
+
+ALTER TABLE votes ALTER COLUMN voted_at SET DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE audit_logs ALTER COLUMN created_at SET DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE elections ADD COLUMN IF NOT EXISTS description TEXT;
+
+ALTER TABLE voters
+    DROP COLUMN IF EXISTS otp,
+    DROP COLUMN IF EXISTS otp_expiry;
+
+ALTER TABLE candidates
+    DROP COLUMN IF EXISTS photo,
+    DROP COLUMN IF EXISTS symbol;
+
+-- create_all() used VARCHAR(100) and smaller; widening is catalog-only
+ALTER TABLE voters
+    ALTER COLUMN name TYPE VARCHAR(255),
+    ALTER COLUMN email TYPE VARCHAR(255),
+    ALTER COLUMN constituency TYPE VARCHAR(255);
+ALTER TABLE admins ALTER COLUMN username TYPE VARCHAR(255);
+ALTER TABLE candidates
+    ALTER COLUMN name TYPE VARCHAR(255),
+    ALTER COLUMN party TYPE VARCHAR(255),
+    ALTER COLUMN constituency TYPE VARCHAR(255),
+    ALTER COLUMN photo_path TYPE TEXT,
+    ALTER COLUMN symbol_path TYPE TEXT;
+ALTER TABLE elections
+    ALTER COLUMN title TYPE VARCHAR(255),
+    ALTER COLUMN constituency TYPE VARCHAR(255),
+    ALTER COLUMN status TYPE VARCHAR(50);
+ALTER TABLE audit_logs
+    ALTER COLUMN action TYPE VARCHAR(255),
+    ALTER COLUMN user_type TYPE VARCHAR(50);
+
+-- The single-row version marker the boot check used before migrations
+DROP TABLE IF EXISTS schema_version;
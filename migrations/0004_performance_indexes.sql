@@ -0,0 +1,19 @@
+-- migrate: no-transaction
+-- Built CONCURRENTLY so votes can still be cast while they build. The runner
+-- drops an index left INVALID by an interrupted build before retrying it.
+
+-- Tallies: votes per candidate within an election
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_votes_election_candidate
+ON votes (election_id, candidate_id);
+
+-- Ballots and results list a constituency's candidates
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_candidates_constituency
+ON candidates (constituency);
+
+-- Voter dashboards: a constituency's elections, by status
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_elections_constituency_status
+ON elections (constituency, status);
+
+-- Audit log pages and retention sweeps
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_audit_logs_created_at
+ON audit_logs (created_at);
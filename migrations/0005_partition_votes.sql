@@ -0,0 +1,58 @@
+-- List-partition votes by election. Tallies only read their election's
+-- partition, and deleting an election drops its partition instead of
+-- deleting rows from one ever-growing table. Partitions are named
+-- votes_e<election id> and created together with the election
+-- (voting.create_vote_partition).
+--
+-- Within a partition every row has the same election_id, so the primary key
+-- (id, election_id) already serves the per-election MAX(id) lookups and the
+-- two election-leading votes indexes become a plain candidate_id index.
+ALTER TABLE votes RENAME TO votes_unpartitioned;
+DROP INDEX IF EXISTS idx_votes_election_id;
+DROP INDEX IF EXISTS idx_votes_election_candidate;
+
+-- Free the primary key and unique constraint names for the new table
+DO $$
+DECLARE
+    c RECORD;
+BEGIN
+    FOR c IN SELECT conname FROM pg_constraint
+             WHERE conrelid = 'votes_unpartitioned'::regclass AND contype IN ('p', 'u') LOOP
+        EXECUTE format('ALTER TABLE votes_unpartitioned RENAME CONSTRAINT %I TO %I',
+                       c.conname, c.conname || '_unpartitioned');
+    END LOOP;
+END $$;
+
+ALTER SEQUENCE votes_id_seq OWNED BY NONE;
+
+CREATE TABLE votes (
+    id INTEGER NOT NULL DEFAULT nextval('votes_id_seq'),
+    voter_id INTEGER NOT NULL,
+    election_id INTEGER NOT NULL,
+    candidate_id INTEGER NOT NULL,
+    voted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id, election_id),
+    UNIQUE (voter_id, election_id),
+    FOREIGN KEY (voter_id) REFERENCES voters (id) ON DELETE CASCADE,
+    FOREIGN KEY (election_id) REFERENCES elections (id) ON DELETE CASCADE,
+    FOREIGN KEY (candidate_id) REFERENCES candidates (id) ON DELETE CASCADE
+) PARTITION BY LIST (election_id);
+
+ALTER SEQUENCE votes_id_seq OWNED BY votes.id;
+
+-- Tallies join candidates to votes, and deleting a candidate cascades to them
+CREATE INDEX idx_votes_candidate_id ON votes (candidate_id);
+
+DO $$
+DECLARE
+    e RECORD;
+BEGIN
+    FOR e IN SELECT id FROM elections LOOP
+        EXECUTE format('CREATE TABLE votes_e%s PARTITION OF votes FOR VALUES IN (%s)', e.id, e.id);
+    END LOOP;
+END $$;
+
+INSERT INTO votes (id, voter_id, election_id, candidate_id, voted_at)
+SELECT id, voter_id, election_id, candidate_id, voted_at FROM votes_unpartitioned;
+
+DROP TABLE votes_unpartitioned;
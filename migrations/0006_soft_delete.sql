@@ -0,0 +1,21 @@
+-- Deleting an election or candidate stamps deleted_at, which hides it from
+-- every read, and queues a purge job; purge.py removes the rows later in
+-- short batches. Adding a nullable column without a default is catalog-only.
+ALTER TABLE elections ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP;
+ALTER TABLE candidates ADD COLUMN IF NOT EXISTS deleted_at TIMESTAMP;
+
+CREATE TABLE IF NOT EXISTS purge_jobs (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL,
+    target_id INTEGER NOT NULL,
+    label VARCHAR(255),
+    rows_total BIGINT,
+    rows_deleted BIGINT NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP,
+    UNIQUE (kind, target_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_purge_jobs_unfinished ON purge_jobs (id) WHERE finished_at IS NULL;
@@ -0,0 +1,39 @@
+-- Voters, candidates, elections and pending registrations reference
+-- constituencies by id instead of repeating the name: 4-byte keys make the
+-- constituency indexes smaller and comparisons cheaper, and the app maps
+-- names to ids from an in-memory copy of the constituencies table.
+
+-- Names typed into the old free-text election form may not be listed yet
+INSERT INTO constituencies (name, state)
+SELECT DISTINCT constituency, 'Unknown' FROM (
+    SELECT constituency FROM voters
+    UNION SELECT constituency FROM candidates
+    UNION SELECT constituency FROM elections
+    UNION SELECT constituency FROM pending_registrations
+) names
+ON CONFLICT (name) DO NOTHING;
+
+ALTER TABLE voters ADD COLUMN constituency_id INTEGER REFERENCES constituencies (id);
+UPDATE voters t SET constituency_id = c.id FROM constituencies c WHERE c.name = t.constituency;
+ALTER TABLE voters ALTER COLUMN constituency_id SET NOT NULL;
+ALTER TABLE voters DROP COLUMN constituency;
+
+ALTER TABLE candidates ADD COLUMN constituency_id INTEGER REFERENCES constituencies (id);
+UPDATE candidates t SET constituency_id = c.id FROM constituencies c WHERE c.name = t.constituency;
+ALTER TABLE candidates ALTER COLUMN constituency_id SET NOT NULL;
+ALTER TABLE candidates DROP COLUMN constituency;  -- drops idx_candidates_constituency
+
+ALTER TABLE elections ADD COLUMN constituency_id INTEGER REFERENCES constituencies (id);
+UPDATE elections t SET constituency_id = c.id FROM constituencies c WHERE c.name = t.constituency;
+ALTER TABLE elections ALTER COLUMN constituency_id SET NOT NULL;
+ALTER TABLE elections DROP COLUMN constituency;  -- drops idx_elections_constituency_status
+
+ALTER TABLE pending_registrations ADD COLUMN constituency_id INTEGER REFERENCES constituencies (id);
+UPDATE pending_registrations t SET constituency_id = c.id FROM constituencies c WHERE c.name = t.constituency;
+ALTER TABLE pending_registrations ALTER COLUMN constituency_id SET NOT NULL;
+ALTER TABLE pending_registrations DROP COLUMN constituency;
+
+-- Ballots and results list a constituency's candidates
+CREATE INDEX idx_candidates_constituency_id ON candidates (constituency_id);
+-- Voter dashboards: a constituency's elections, by status
+CREATE INDEX idx_elections_constituency_id_status ON elections (constituency_id, status);
@@ -0,0 +1,6 @@
+-- Every registration attempt gets its own pending row, tied to the session
+-- that made it. With one row per email, registering an email someone else
+-- was verifying replaced their name and password under the same row id, and
+-- their code would then create the account with the second password.
+ALTER TABLE pending_registrations DROP CONSTRAINT IF EXISTS pending_registrations_email_key;
+CREATE INDEX IF NOT EXISTS idx_pending_registrations_email ON pending_registrations (email);
@@ -0,0 +1,18 @@
+-- Voter roll uploads are imported by a background task instead of inside
+-- the request. Each upload is spooled to disk and queued here; the task
+-- claims it, runs the import and stores the report for the admin page.
+CREATE TABLE IF NOT EXISTS voter_imports (
+    id SERIAL PRIMARY KEY,
+    filename VARCHAR(255) NOT NULL,
+    format VARCHAR(10) NOT NULL,
+    spool_path TEXT NOT NULL,
+    admin_id INTEGER,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',  -- queued, running, finished, failed
+    report TEXT,  -- JSON, as returned by voter_import.import_voters()
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_voter_imports_queued ON voter_imports (id) WHERE status = 'queued';
@@ -0,0 +1,4 @@
+-- Spooled rolls live on the local disk of the instance that took the
+-- upload. Record which host that was so only its workers claim the job;
+-- on any other instance the spool file does not exist.
+ALTER TABLE voter_imports ADD COLUMN IF NOT EXISTS spool_host VARCHAR(255);
@@ -0,0 +1,6 @@
+-- A running import touches heartbeat_at after every batch, and a job is
+-- only reclaimed once that goes stale, not because it has been running a
+-- long time. Each claim gets a new runner token; a runner whose token no
+-- longer matches has been superseded and stops without writing anything.
+ALTER TABLE voter_imports ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP;
+ALTER TABLE voter_imports ADD COLUMN IF NOT EXISTS runner VARCHAR(32);
@@ -0,0 +1,171 @@
+-- The schema Postgres reaches after migration 0006, for the SQLite backend.
+-- Votes are one table (SQLite has no partitioning); AUTOINCREMENT keeps vote
+-- ids from being reused after a purge, since tally ETags use MAX(id).
+
+CREATE TABLE constituencies (
+    id INTEGER PRIMARY KEY,
+    name VARCHAR(255) UNIQUE NOT NULL,
+    state VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE voters (
+    id INTEGER PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    constituency VARCHAR(255) NOT NULL,
+    is_verified BOOLEAN DEFAULT FALSE,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE admins (
+    id INTEGER PRIMARY KEY,
+    username VARCHAR(255) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE candidates (
+    id INTEGER PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    party VARCHAR(255) NOT NULL,
+    constituency VARCHAR(255) NOT NULL,
+    photo_path TEXT,
+    symbol_path TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    deleted_at TIMESTAMP
+);
+
+CREATE INDEX idx_candidates_constituency ON candidates (constituency);
+
+CREATE TABLE elections (
+    id INTEGER PRIMARY KEY,
+    title VARCHAR(255) NOT NULL,
+    description TEXT,
+    constituency VARCHAR(255) NOT NULL,
+    start_time TIMESTAMP NOT NULL,
+    end_time TIMESTAMP NOT NULL,
+    status VARCHAR(50) NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    deleted_at TIMESTAMP
+);
+
+CREATE INDEX idx_elections_constituency_status ON elections (constituency, status);
+
+CREATE TABLE votes (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    voter_id INTEGER NOT NULL,
+    election_id INTEGER NOT NULL,
+    candidate_id INTEGER NOT NULL,
+    voted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    UNIQUE (voter_id, election_id),
+    FOREIGN KEY (voter_id) REFERENCES voters (id) ON DELETE CASCADE,
+    FOREIGN KEY (election_id) REFERENCES elections (id) ON DELETE CASCADE,
+    FOREIGN KEY (candidate_id) REFERENCES candidates (id) ON DELETE CASCADE
+);
+
+CREATE INDEX idx_votes_election_id ON votes (election_id, id);
+CREATE INDEX idx_votes_election_candidate ON votes (election_id, candidate_id);
+CREATE INDEX idx_votes_candidate_id ON votes (candidate_id);
+
+CREATE TABLE audit_logs (
+    id INTEGER PRIMARY KEY,
+    action VARCHAR(255) NOT NULL,
+    user_type VARCHAR(50) NOT NULL,
+    user_id INTEGER NOT NULL,
+    ip_address VARCHAR(45),
+    user_agent TEXT,
+    details TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_audit_logs_created_at ON audit_logs (created_at);
+
+CREATE TABLE sessions (
+    sid VARCHAR(64) PRIMARY KEY,
+    data TEXT NOT NULL,
+    expires_at TIMESTAMP NOT NULL
+);
+
+CREATE INDEX idx_sessions_expires_at ON sessions (expires_at);
+
+CREATE TABLE rate_limits (
+    key VARCHAR(255) PRIMARY KEY,
+    tokens DOUBLE PRECISION NOT NULL,
+    updated_at DOUBLE PRECISION NOT NULL,
+    allowed BOOLEAN NOT NULL DEFAULT TRUE
+);
+
+CREATE INDEX idx_rate_limits_updated_at ON rate_limits (updated_at);
+
+CREATE TABLE pending_registrations (
+    id INTEGER PRIMARY KEY,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    constituency VARCHAR(255) NOT NULL,
+    otp_hash VARCHAR(64) NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX idx_pending_registrations_expires_at ON pending_registrations (expires_at);
+
+CREATE TABLE uploads (
+    filename VARCHAR(255) PRIMARY KEY,
+    size BIGINT,
+    refcount INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE data_versions (
+    name VARCHAR(50) PRIMARY KEY,
+    version BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE TABLE purge_jobs (
+    id INTEGER PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL,
+    target_id INTEGER NOT NULL,
+    label VARCHAR(255),
+    rows_total BIGINT,
+    rows_deleted BIGINT NOT NULL DEFAULT 0,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    finished_at TIMESTAMP,
+    UNIQUE (kind, target_id)
+);
+
+CREATE INDEX idx_purge_jobs_unfinished ON purge_jobs (id) WHERE finished_at IS NULL;
+
+-- Andhra Pradesh constituencies
+INSERT INTO constituencies (name, state) VALUES
+    ('Araku', 'Andhra Pradesh'),
+    ('Srikakulam', 'Andhra Pradesh'),
+    ('Vizianagaram', 'Andhra Pradesh'),
+    ('Visakhapatnam', 'Andhra Pradesh'),
+    ('Anakapalli', 'Andhra Pradesh'),
+    ('Kakinada', 'Andhra Pradesh'),
+    ('Amalapuram', 'Andhra Pradesh'),
+    ('Rajahmundry', 'Andhra Pradesh'),
+    ('Narasapuram', 'Andhra Pradesh'),
+    ('Eluru', 'Andhra Pradesh'),
+    ('Machilipatnam', 'Andhra Pradesh'),
+    ('Vijayawada', 'Andhra Pradesh'),
+    ('Guntur', 'Andhra Pradesh'),
+    ('Narasaraopet', 'Andhra Pradesh'),
+    ('Bapatla', 'Andhra Pradesh'),
+    ('Ongole', 'Andhra Pradesh'),
+    ('Nandyal', 'Andhra Pradesh'),
+    ('Kurnool', 'Andhra Pradesh'),
+    ('Anantapur', 'Andhra Pradesh'),
+    ('Hindupur', 'Andhra Pradesh'),
+    ('Kadapa', 'Andhra Pradesh'),
+    ('Nellore', 'Andhra Pradesh'),
+    ('Tirupati', 'Andhra Pradesh'),
+    ('Rajampet', 'Andhra Pradesh'),
+    ('Chittoor', 'Andhra Pradesh')
+ON CONFLICT (name) DO NOTHING;
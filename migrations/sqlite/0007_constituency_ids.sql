@@ -0,0 +1,33 @@
+-- Matches migrations/0007_constituency_ids.sql. SQLite can't add NOT NULL
+-- to an existing column, so constituency_id stays nullable here.
+
+INSERT INTO constituencies (name, state)
+SELECT DISTINCT constituency, 'Unknown' FROM (
+    SELECT constituency FROM voters
+    UNION SELECT constituency FROM candidates
+    UNION SELECT constituency FROM elections
+    UNION SELECT constituency FROM pending_registrations
+) names
+WHERE TRUE
+ON CONFLICT (name) DO NOTHING;
+
+ALTER TABLE voters ADD COLUMN constituency_id INTEGER REFERENCES constituencies (id);
+UPDATE voters SET constituency_id = (SELECT id FROM constituencies c WHERE c.name = voters.constituency);
+ALTER TABLE voters DROP COLUMN constituency;
+
+DROP INDEX idx_candidates_constituency;
+ALTER TABLE candidates ADD COLUMN constituency_id INTEGER REFERENCES constituencies (id);
+UPDATE candidates SET constituency_id = (SELECT id FROM constituencies c WHERE c.name = candidates.constituency);
+ALTER TABLE candidates DROP COLUMN constituency;
+
+DROP INDEX idx_elections_constituency_status;
+ALTER TABLE elections ADD COLUMN constituency_id INTEGER REFERENCES constituencies (id);
+UPDATE elections SET constituency_id = (SELECT id FROM constituencies c WHERE c.name = elections.constituency);
+ALTER TABLE elections DROP COLUMN constituency;
+
+ALTER TABLE pending_registrations ADD COLUMN constituency_id INTEGER REFERENCES constituencies (id);
+UPDATE pending_registrations SET constituency_id = (SELECT id FROM constituencies c WHERE c.name = pending_registrations.constituency);
+ALTER TABLE pending_registrations DROP COLUMN constituency;
+
+CREATE INDEX idx_candidates_constituency_id ON candidates (constituency_id);
+CREATE INDEX idx_elections_constituency_id_status ON elections (constituency_id, status);
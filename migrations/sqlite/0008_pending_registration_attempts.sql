@@ -0,0 +1,27 @@
+-- Matches migrations/0008_pending_registration_attempts.sql. SQLite can't
+-- drop a UNIQUE column constraint, so the table is rebuilt without it.
+-- AUTOINCREMENT keeps ids from being reused, as SERIAL does: a session
+-- still holding a deleted attempt's id must never match someone else's.
+
+CREATE TABLE pending_registrations_new (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name VARCHAR(255) NOT NULL,
+    email VARCHAR(255) NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    constituency_id INTEGER REFERENCES constituencies (id),
+    otp_hash VARCHAR(64) NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    expires_at TIMESTAMP NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO pending_registrations_new
+    (id, name, email, password, constituency_id, otp_hash, attempts, expires_at, created_at)
+SELECT id, name, email, password, constituency_id, otp_hash, attempts, expires_at, created_at
+FROM pending_registrations;
+
+DROP TABLE pending_registrations;
+ALTER TABLE pending_registrations_new RENAME TO pending_registrations;
+
+CREATE INDEX idx_pending_registrations_expires_at ON pending_registrations (expires_at);
+CREATE INDEX idx_pending_registrations_email ON pending_registrations (email);
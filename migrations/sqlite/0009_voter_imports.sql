@@ -0,0 +1,17 @@
+-- Matches migrations/0009_voter_imports.sql.
+
+CREATE TABLE voter_imports (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    filename VARCHAR(255) NOT NULL,
+    format VARCHAR(10) NOT NULL,
+    spool_path TEXT NOT NULL,
+    admin_id INTEGER,
+    status VARCHAR(20) NOT NULL DEFAULT 'queued',
+    report TEXT,
+    last_error TEXT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    started_at TIMESTAMP,
+    finished_at TIMESTAMP
+);
+
+CREATE INDEX idx_voter_imports_queued ON voter_imports (id) WHERE status = 'queued';
@@ -0,0 +1,3 @@
+-- Matches migrations/0010_voter_import_hosts.sql.
+
+ALTER TABLE voter_imports ADD COLUMN spool_host VARCHAR(255);
@@ -0,0 +1,4 @@
+-- Matches migrations/0011_voter_import_heartbeats.sql.
+
+ALTER TABLE voter_imports ADD COLUMN heartbeat_at TIMESTAMP;
+ALTER TABLE voter_imports ADD COLUMN runner VARCHAR(32);
@@ -0,0 +1,100 @@
+"""Full-page cache for the public pages anonymous visitors see.
+
+The landing, about and how-it-works pages render the same HTML for every
+anonymous visitor until templates change. Each worker renders them once per
+template version and keeps identity, gzip and brotli bodies plus an ETag, so
+repeat hits are a dict lookup and revalidations are 304s.
+
+Logged-in sessions (which get redirected) and sessions with pending flash
+messages skip the cache and run the view as usual.
+
+Set PAGE_CACHE=0 to disable; the cache is also off in debug mode so template
+edits show up immediately.
+"""
+import hashlib
+import os
+import threading
+from functools import wraps
+
+from flask import current_app, request, session, Response
+
+from assets import compress_bodies, choose_encoding, asset_manifest
+
+PAGE_CACHE_ENABLED = os.getenv('PAGE_CACHE', '1') != '0'
+# Session keys that change what a public page renders
+PERSONALISED_KEYS = ('voter_id', 'admin_id', '_flashes')
+
+_pages = {}  # (endpoint, template version) -> CachedPage
+_version = None
+_lock = threading.Lock()
+
+
+class CachedPage:
+    __slots__ = ('etag', 'mimetype', 'bodies')
+
+    def __init__(self, data, mimetype):
+        self.etag = hashlib.sha256(data).hexdigest()[:32]
+        self.mimetype = mimetype
+        self.bodies = compress_bodies(data)
+
+    def respond(self):
+        encoding = choose_encoding(self.bodies, request.headers.get('Accept-Encoding', ''))
+        etag = f'{self.etag}-{encoding}'
+        # Always revalidate: the same URL redirects once the visitor logs in
+        headers = {'Cache-Control': 'no-cache', 'Vary': 'Accept-Encoding'}
+
+        if request.if_none_match.contains(etag):
+            return Response(status=304, headers=headers)
+
+        response = Response(self.bodies[encoding], mimetype=self.mimetype, headers=headers)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.set_etag(etag)
+        return response
+
+
+def template_version():
+    """Hash of every template's source and the asset URLs they link, computed once per worker"""
+    global _version
+    if _version is None:
+        env = current_app.jinja_env
+        digest = hashlib.sha256()
+        for name in sorted(env.list_templates()):
+            source, _, _ = env.loader.get_source(env, name)
+            digest.update(name.encode())
+            digest.update(source.encode())
+        for url in sorted(asset.fingerprinted for asset in asset_manifest().values()):
+            digest.update(url.encode())
+        _version = digest.hexdigest()[:12]
+    return _version
+
+
+def is_anonymous():
+    return not any(key in session for key in PERSONALISED_KEYS)
+
+
+def cached_page(view):
+    """Serve view's output from the page cache for anonymous visitors"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not PAGE_CACHE_ENABLED or current_app.debug or not is_anonymous():
+            return view(*args, **kwargs)
+
+        key = (request.endpoint, template_version())
+        page = _pages.get(key)
+        if page is None:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+            page = CachedPage(response.get_data(), response.mimetype)
+            with _lock:
+                _pages[key] = page
+        return page.respond()
+    return wrapper
+
+
+def clear_page_cache():
+    global _version
+    with _lock:
+        _pages.clear()
+        _version = None
@@ -0,0 +1,202 @@
+"""Password hashing for voters and admins.
+
+Passwords are hashed with bcrypt at no less than BCRYPT_MIN_ROUNDS. Above
+that floor the work factor is BCRYPT_ROUNDS if set (recommended in
+production, so every host agrees) or else calibrated once per process so a
+single hash costs roughly BCRYPT_TARGET_MS milliseconds. Every hash/verify
+runs on a small bounded executor so a burst of logins cannot occupy every
+worker thread while votes are being cast.
+
+Accounts created before bcrypt was introduced still hold unsalted SHA-256
+hex digests. Those, and bcrypt hashes below the configured cost, are
+flagged by needs_rehash() so the login routes can upgrade them
+transparently. A calibrated cost never triggers a rehash: hosts calibrate
+differently and would otherwise keep rehashing each other's hashes.
+"""
+import base64
+import hashlib
+import hmac
+import math
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+import bcrypt
+from dotenv import load_dotenv
+
+load_dotenv()
+
+BCRYPT_TARGET_MS = float(os.getenv('BCRYPT_TARGET_MS', 50))
+BCRYPT_MIN_ROUNDS = int(os.getenv('BCRYPT_MIN_ROUNDS', 10))
+BCRYPT_MAX_ROUNDS = int(os.getenv('BCRYPT_MAX_ROUNDS', 14))
+
+# Concurrent hashes per worker process, and how many more may queue behind them
+HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 2))
+HASH_QUEUE = int(os.getenv('PASSWORD_HASH_QUEUE', 16))
+HASH_WAIT_SECONDS = float(os.getenv('PASSWORD_HASH_WAIT', 5))
+
+_LEGACY_LENGTH = 64  # sha256 hexdigest
+
+_rounds = None
+_rounds_lock = threading.Lock()
+
+_executor = None
+_slots = None
+_executor_lock = threading.Lock()
+
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when the hashing executor is saturated"""
+
+
+# ----------------------------------------------------------------------
+# CALIBRATION
+# ----------------------------------------------------------------------
+def calibrate_rounds(target_ms=None):
+    """Pick the bcrypt cost whose hash time is closest to (not above) target_ms.
+
+    Each extra round doubles the work, so one timing at the minimum cost is
+    enough to extrapolate.
+    """
+    target_ms = BCRYPT_TARGET_MS if target_ms is None else target_ms
+    sample = b'calibration-password'
+    salt = bcrypt.gensalt(rounds=BCRYPT_MIN_ROUNDS)
+
+    # Best of three to ignore a cold cache or a scheduler hiccup
+    elapsed = min(_time_hash(sample, salt) for _ in range(3))
+    if elapsed <= 0:
+        return BCRYPT_MAX_ROUNDS
+
+    extra = int(math.floor(math.log2(max(target_ms / elapsed, 1.0))))
+    return max(BCRYPT_MIN_ROUNDS, min(BCRYPT_MAX_ROUNDS, BCRYPT_MIN_ROUNDS + extra))
+
+
+def _time_hash(password, salt):
+    start = time.perf_counter()
+    bcrypt.hashpw(password, salt)
+    return (time.perf_counter() - start) * 1000
+
+
+def configured_rounds():
+    """The cost every host agrees on: BCRYPT_ROUNDS if set, never below BCRYPT_MIN_ROUNDS"""
+    configured = os.getenv('BCRYPT_ROUNDS')
+    return max(BCRYPT_MIN_ROUNDS, int(configured)) if configured else BCRYPT_MIN_ROUNDS
+
+
+def get_rounds():
+    """bcrypt cost for new hashes (BCRYPT_ROUNDS env overrides calibration)"""
+    global _rounds
+    if _rounds is None:
+        with _rounds_lock:
+            if _rounds is None:
+                if os.getenv('BCRYPT_ROUNDS'):
+                    _rounds = configured_rounds()
+                else:
+                    _rounds = calibrate_rounds()
+                    print(f"🔐 bcrypt cost calibrated to {_rounds} rounds (target {BCRYPT_TARGET_MS:g} ms)")
+    return _rounds
+
+
+# ----------------------------------------------------------------------
+# BOUNDED EXECUTOR
+# ----------------------------------------------------------------------
+def _get_executor():
+    global _executor, _slots
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _slots = threading.BoundedSemaphore(HASH_WORKERS + HASH_QUEUE)
+                _executor = ThreadPoolExecutor(max_workers=HASH_WORKERS,
+                                               thread_name_prefix='password-hash')
+    return _executor, _slots
+
+
+def reset_executor():
+    """Drop the executor inherited from a parent process (threads do not survive fork)"""
+    global _executor, _slots, _executor_lock
+    _executor = None
+    _slots = None
+    _executor_lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=reset_executor)
+
+
+def _run_bounded(fn, *args):
+    executor, slots = _get_executor()
+    if not slots.acquire(blocking=False):
+        raise PasswordHasherBusy("password hashing queue is full")
+
+    try:
+        future = executor.submit(fn, *args)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda _: slots.release())
+
+    try:
+        return future.result(timeout=HASH_WAIT_SECONDS)
+    except FutureTimeout:
+        future.cancel()
+        raise PasswordHasherBusy("timed out waiting for password hashing")
+
+
+# ----------------------------------------------------------------------
+# PUBLIC API
+# ----------------------------------------------------------------------
+def _prepare(password):
+    """Encode a password for bcrypt, which only looks at the first 72 bytes"""
+    encoded = password.encode('utf-8')
+    if len(encoded) > 72:
+        encoded = base64.b64encode(hashlib.sha256(encoded).digest())
+    return encoded
+
+
+def _legacy_hash(password):
+    return hashlib.sha256(password.encode()).hexdigest()
+
+
+def is_legacy_hash(stored):
+    return bool(stored) and len(stored) == _LEGACY_LENGTH and not stored.startswith('$2')
+
+
+def hash_password(password):
+    """Return a bcrypt hash of password as a string"""
+    salt = bcrypt.gensalt(rounds=get_rounds())
+    hashed = _run_bounded(bcrypt.hashpw, _prepare(password), salt)
+    return hashed.decode('ascii')
+
+
+def hash_password_direct(password, rounds=None):
+    """Hash on the calling thread, bypassing the executor (for batch jobs in their own processes)"""
+    salt = bcrypt.gensalt(rounds=rounds or get_rounds())
+    return bcrypt.hashpw(_prepare(password), salt).decode('ascii')
+
+
+def verify_password(password, stored):
+    """Check password against a bcrypt or legacy SHA-256 hash"""
+    if not stored:
+        return False
+
+    if is_legacy_hash(stored):
+        return hmac.compare_digest(_legacy_hash(password), stored)
+
+    try:
+        return _run_bounded(bcrypt.checkpw, _prepare(password), stored.encode('ascii'))
+    except ValueError:
+        # Malformed hash in the database
+        return False
+
+
+def needs_rehash(stored):
+    """True if stored should be replaced after a successful login: legacy
+    hashes and bcrypt hashes below configured_rounds()"""
+    if is_legacy_hash(stored):
+        return True
+    try:
+        rounds = int(stored.split('$')[2])
+    except (IndexError, ValueError):
+        return True
+    return rounds < configured_rounds()
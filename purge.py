@@ -0,0 +1,185 @@
+"""Background deletion of elections and candidates.
+
+Deleting an election or candidate from the admin pages only stamps its
+deleted_at column, which hides it from every read, and queues a purge job in
+the same transaction, so the request returns at once. The background thread
+then removes the data in short transactions:
+
+    candidate  its votes, PURGE_BATCH_SIZE rows per transaction, then the
+               candidate row and its upload references
+    election   its votes partition (DETACH ... CONCURRENTLY, then one
+               DROP), then the election row
+
+Every step runs with a lock_timeout and is retried on a later run if it
+times out. Detaching the partition first (Postgres 14+) means the election
+step never waits in the lock queue of `votes`, so votes can still be cast
+meanwhile. The DROP of the detached table locks only it and the tables its
+foreign keys reference (voters, candidates, elections); writes to those,
+not votes, can wait for up to PURGE_LOCK_TIMEOUT. Progress is kept in
+purge_jobs and shown on the admin dashboard. Job rows are claimed with SKIP LOCKED, so several workers can run purges
+side by side. On SQLite a step holds the database's write lock instead
+(BEGIN IMMEDIATE), and SQLITE_BUSY_TIMEOUT plays the part of lock_timeout.
+"""
+import os
+import time
+
+import psycopg2
+import psycopg2.errors
+
+from database import get_db, backend, SQLITE
+from httpcache import bump_data_version
+from storage import release_upload, delete_upload_file
+from voting import vote_partition, detach_vote_partition, drop_vote_partition
+
+PURGE_BATCH_SIZE = int(os.getenv('PURGE_BATCH_SIZE', 5000))
+PURGE_INTERVAL = int(os.getenv('PURGE_INTERVAL', 10))
+# Longest a single run keeps the background thread busy
+PURGE_RUN_SECONDS = float(os.getenv('PURGE_RUN_SECONDS', 20))
+PURGE_LOCK_TIMEOUT = os.getenv('PURGE_LOCK_TIMEOUT', '2s')
+
+ELECTION = 'election'
+CANDIDATE = 'candidate'
+
+
+def queue_purge(cursor, kind, target_id, label=None):
+    """Hide target_id and queue its purge (inside the caller's transaction)"""
+    table = {ELECTION: 'elections', CANDIDATE: 'candidates'}[kind]
+    cursor.execute(f'UPDATE {table} SET deleted_at = CURRENT_TIMESTAMP '
+                   f'WHERE id = %s AND deleted_at IS NULL', (target_id,))
+    cursor.execute('''
+        INSERT INTO purge_jobs (kind, target_id, label) VALUES (%s, %s, %s)
+        ON CONFLICT (kind, target_id) DO NOTHING
+    ''', (kind, target_id, label))
+    bump_data_version(cursor)
+
+
+def pending_purges():
+    """Unfinished jobs for the admin dashboard"""
+    with get_db() as db:
+        with db.cursor() as cursor:
+            cursor.execute('''
+                SELECT kind, target_id, label, rows_total, rows_deleted, attempts, last_error, created_at
+                FROM purge_jobs WHERE finished_at IS NULL ORDER BY id
+            ''')
+            return cursor.fetchall()
+
+
+# ----------------------------------------------------------------------
+# STEPS
+# ----------------------------------------------------------------------
+def _count_votes(cursor, job):
+    if job['kind'] == CANDIDATE:
+        cursor.execute('SELECT COUNT(*) FROM votes WHERE candidate_id = %s', (job['target_id'],))
+        return cursor.fetchone()['count']
+    if backend() == SQLITE:
+        cursor.execute('SELECT COUNT(*) FROM votes WHERE election_id = %s', (job['target_id'],))
+        return cursor.fetchone()['count']
+    # The partition is dropped whole; the planner's estimate is enough for progress
+    cursor.execute("SELECT GREATEST(reltuples, 0)::BIGINT AS estimate FROM pg_class WHERE relname = %s",
+                   (vote_partition(job['target_id']),))
+    row = cursor.fetchone()
+    return row['estimate'] if row else 0
+
+
+def _purge_candidate_step(cursor, job):
+    """Delete one batch of the candidate's votes. Returns (rows deleted, finished, files to remove)."""
+    cursor.execute('''
+        DELETE FROM votes
+        WHERE (id, election_id) IN (
+            SELECT id, election_id FROM votes WHERE candidate_id = %s LIMIT %s
+        )
+    ''', (job['target_id'], PURGE_BATCH_SIZE))
+    deleted = cursor.rowcount
+    if deleted == PURGE_BATCH_SIZE:
+        return deleted, False, []
+
+    cursor.execute('DELETE FROM candidates WHERE id = %s RETURNING photo_path, symbol_path',
+                   (job['target_id'],))
+    candidate = cursor.fetchone()
+    unused = []
+    if candidate:
+        unused = [path for path in (candidate['photo_path'], candidate['symbol_path'])
+                  if release_upload(cursor, path)]
+    return deleted, True, unused
+
+
+def _purge_election_step(cursor, job):
+    """Detach and drop the election's votes partition, then delete the election"""
+    detach_vote_partition(job['target_id'], PURGE_LOCK_TIMEOUT)
+    drop_vote_partition(cursor, job['target_id'])
+    cursor.execute('DELETE FROM elections WHERE id = %s', (job['target_id'],))
+    return job['rows_total'], True, []
+
+
+STEPS = {
+    ELECTION: _purge_election_step,
+    CANDIDATE: _purge_candidate_step,
+}
+
+
+def run_purge_step():
+    """Claim the oldest unfinished job and run one step of it.
+    Returns False when there was nothing to do or the step could not get its locks."""
+    unused = []
+    with get_db() as db:
+        with db.cursor() as cursor:
+            sqlite = backend() == SQLITE
+            if sqlite:
+                cursor.execute('BEGIN IMMEDIATE')
+            cursor.execute('''
+                SELECT * FROM purge_jobs WHERE finished_at IS NULL
+                ORDER BY id LIMIT 1
+            ''' + ('' if sqlite else 'FOR UPDATE SKIP LOCKED'))
+            job = cursor.fetchone()
+            if job is None:
+                return False
+
+            if not sqlite:
+                cursor.execute('SET LOCAL lock_timeout = %s', (PURGE_LOCK_TIMEOUT,))
+            cursor.execute('SAVEPOINT purge_step')
+            try:
+                if job['rows_total'] is None:
+                    job['rows_total'] = _count_votes(cursor, job)
+                deleted, finished, unused = STEPS[job['kind']](cursor, job)
+            except psycopg2.errors.LockNotAvailable as e:
+                # Keep the claim row's update; retry the step on a later run
+                cursor.execute('ROLLBACK TO SAVEPOINT purge_step')
+                cursor.execute('''
+                    UPDATE purge_jobs SET attempts = attempts + 1, last_error = %s WHERE id = %s
+                ''', (str(e).strip(), job['id']))
+                db.commit()
+                print(f"⏳ Purge of {job['kind']} {job['target_id']} is waiting for locks")
+                return False
+
+            cursor.execute('''
+                UPDATE purge_jobs
+                SET rows_total = %s, rows_deleted = rows_deleted + %s, attempts = attempts + 1,
+                    last_error = NULL, finished_at = CASE WHEN %s THEN CURRENT_TIMESTAMP END
+                WHERE id = %s
+                RETURNING rows_deleted
+            ''', (job['rows_total'], deleted, finished, job['id']))
+            progress = cursor.fetchone()['rows_deleted']
+            bump_data_version(cursor)
+            db.commit()
+
+    # Files go only after the transaction releasing them has committed
+    for filename in unused:
+        delete_upload_file(filename)
+
+    if finished:
+        print(f"🗑️ Purged {job['kind']} {job['target_id']} ({progress} votes)")
+    else:
+        print(f"🗑️ Purging {job['kind']} {job['target_id']}: {progress}/{job['rows_total']} votes")
+    return True
+
+
+def run_purge_jobs():
+    """Background task: work through queued purges for up to PURGE_RUN_SECONDS"""
+    deadline = time.monotonic() + PURGE_RUN_SECONDS
+    while time.monotonic() < deadline:
+        try:
+            if not run_purge_step():
+                return
+        except psycopg2.Error as e:
+            print(f"❌ Purge step failed: {e}")
+            return
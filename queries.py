@@ -0,0 +1,143 @@
+"""Registry of the hot SQL statements, prepared once per connection.
+
+Every statement here has a name and is written with %s placeholders like the
+rest of the code. The first time a pooled connection runs one, it is sent as
+`PREPARE name AS ...`; from then on the connection runs `EXECUTE name (...)`,
+so Postgres parses and plans it once per connection rather than once per
+request. Select lists name their columns: a prepared `SELECT *` fails once a
+migration adds a column.
+
+    from queries import run
+    election = run(cursor, 'election_by_id', (election_id,)).fetchone()
+
+Each statement's calls and time are counted per worker (query_stats()), and
+runs slower than SLOW_QUERY_MS are logged.
+
+Set PREPARED_STATEMENTS=0 behind a transaction-pooling proxy such as
+PgBouncer, where a prepared statement may not outlive its transaction; the
+statements then run as plain queries. They always do on the SQLite backend,
+whose driver keeps its own cache of prepared statements per connection.
+"""
+import os
+import re
+import threading
+import time
+import weakref
+
+import psycopg2.errors
+
+from database import backend, POSTGRES
+
+PREPARED_STATEMENTS = os.getenv('PREPARED_STATEMENTS', '1') != '0'
+SLOW_QUERY_MS = float(os.getenv('SLOW_QUERY_MS', 100))
+
+ELECTION_COLUMNS = 'id, title, description, constituency_id, start_time, end_time, status, created_at'
+CANDIDATE_COLUMNS = 'id, name, party, constituency_id, photo_path, symbol_path, created_at'
+
+QUERIES = {
+    # Voting
+    'active_election': f'''
+        SELECT {ELECTION_COLUMNS} FROM elections
+        WHERE id = %s AND status = 'active' AND deleted_at IS NULL
+    ''',
+    'candidate_in_constituency': '''
+        SELECT 1 FROM candidates WHERE id = %s AND constituency_id = %s AND deleted_at IS NULL
+    ''',
+    'has_voted': '''
+        SELECT 1 FROM votes WHERE voter_id = %s AND election_id = %s
+    ''',
+    'insert_vote': '''
+        INSERT INTO votes (voter_id, election_id, candidate_id, voted_at)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (voter_id, election_id) DO NOTHING
+        RETURNING id, voted_at
+    ''',
+
+    # Ballots and results
+    'election_by_id': f'''
+        SELECT {ELECTION_COLUMNS} FROM elections WHERE id = %s AND deleted_at IS NULL
+    ''',
+    'candidates_by_constituency': f'''
+        SELECT {CANDIDATE_COLUMNS} FROM candidates
+        WHERE constituency_id = %s AND deleted_at IS NULL
+        ORDER BY name
+    ''',
+    'tally': '''
+        SELECT c.id, c.name, c.party, COUNT(v.id) AS vote_count
+        FROM candidates c
+        LEFT JOIN votes v ON c.id = v.candidate_id AND v.election_id = %s
+        WHERE c.constituency_id = %s AND c.deleted_at IS NULL
+        GROUP BY c.id
+        ORDER BY vote_count DESC
+    ''',
+
+    # ETag versions, checked on every dashboard and results request
+    'data_version': '''
+        SELECT version FROM data_versions WHERE name = %s
+    ''',
+    'tally_version': '''
+        SELECT COALESCE(MAX(id), 0) AS version FROM votes WHERE election_id = %s
+    ''',
+}
+
+
+def _to_prepare(sql):
+    """%s placeholders -> $1, $2, ... for PREPARE"""
+    counter = iter(range(1, sql.count('%s') + 1))
+    return re.sub(r'%s', lambda _: f'${next(counter)}', sql)
+
+
+_PREPARE = {name: (f'PREPARE {name} AS {_to_prepare(sql)}', sql.count('%s')) for name, sql in QUERIES.items()}
+# connection -> names prepared on it; entries go when the connection does
+_prepared = weakref.WeakKeyDictionary()
+_prepared_lock = threading.Lock()
+_stats = {}  # name -> [calls, total ms, max ms]
+_stats_lock = threading.Lock()
+
+
+def run(cursor, name, params=()):
+    """Execute registered statement `name` on cursor and return the cursor"""
+    started = time.perf_counter()
+    if PREPARED_STATEMENTS and backend() == POSTGRES:
+        with _prepared_lock:
+            prepared = _prepared.setdefault(cursor.connection, set())
+        prepare_sql, arity = _PREPARE[name]
+        try:
+            if name not in prepared:
+                cursor.execute(prepare_sql)
+                prepared.add(name)
+            cursor.execute(f"EXECUTE {name} ({', '.join(['%s'] * arity)})" if arity else f'EXECUTE {name}',
+                           params)
+        except psycopg2.errors.InvalidSqlStatementName:
+            # The session lost its statements (e.g. DISCARD ALL); prepare again next time
+            prepared.clear()
+            raise
+    else:
+        cursor.execute(QUERIES[name], params)
+    _record(name, (time.perf_counter() - started) * 1000)
+    return cursor
+
+
+def _record(name, elapsed_ms):
+    with _stats_lock:
+        stats = _stats.setdefault(name, [0, 0.0, 0.0])
+        stats[0] += 1
+        stats[1] += elapsed_ms
+        stats[2] = max(stats[2], elapsed_ms)
+    if elapsed_ms > SLOW_QUERY_MS:
+        print(f"🐢 Slow query {name}: {elapsed_ms:.0f} ms")
+
+
+def query_stats():
+    """{name: {calls, total_ms, avg_ms, max_ms}} for this worker, slowest total first"""
+    with _stats_lock:
+        items = sorted(_stats.items(), key=lambda item: item[1][1], reverse=True)
+        return {
+            name: {
+                'calls': calls,
+                'total_ms': round(total, 2),
+                'avg_ms': round(total / calls, 3),
+                'max_ms': round(longest, 2),
+            }
+            for name, (calls, total, longest) in items
+        }
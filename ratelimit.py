@@ -0,0 +1,220 @@
+"""Token-bucket rate limiting for the login, registration and OTP routes.
+
+Every limited route has an IP bucket and, where it makes sense, an account
+bucket (email / username). Buckets live in a sharded in-process table, so
+abusive bursts are rejected with a 429 before any database work happens.
+
+With RATE_LIMIT_BACKEND=database, requests that pass the local check are
+also counted in the shared `rate_limits` table, so limits hold across all
+gunicorn workers and hosts.
+
+Limits are written as "<requests>/<seconds>" and can be overridden per
+route and scope through the environment, e.g.
+RATE_LIMIT_VOTER_LOGIN_ACCOUNT=5/300.
+"""
+import math
+import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import wraps
+
+from flask import make_response, request, session
+
+from database import get_db
+
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', '1') != '0'
+RATE_LIMIT_BACKEND = os.getenv('RATE_LIMIT_BACKEND', 'memory').lower()
+RATE_LIMIT_SHARDS = int(os.getenv('RATE_LIMIT_SHARDS', 16))
+RATE_LIMIT_SHARD_SIZE = int(os.getenv('RATE_LIMIT_SHARD_SIZE', 10000))
+
+# route -> scope -> "requests/seconds"
+DEFAULT_LIMITS = {
+    'voter_login': {'ip': '20/60', 'account': '5/300'},
+    'voter_register': {'ip': '5/600', 'account': '3/600'},
+    'verify_email': {'ip': '20/60', 'account': '5/600'},
+    'admin_login': {'ip': '10/60', 'account': '5/300'},
+}
+
+
+def parse_limit(value):
+    """'10/60' -> (capacity 10, refill 10/60 tokens per second)"""
+    count, _, seconds = value.partition('/')
+    capacity = float(count)
+    period = float(seconds or 60)
+    return capacity, capacity / period
+
+
+def load_limits():
+    limits = {}
+    for route, scopes in DEFAULT_LIMITS.items():
+        limits[route] = {}
+        for scope, default in scopes.items():
+            value = os.getenv(f'RATE_LIMIT_{route.upper()}_{scope.upper()}', default)
+            limits[route][scope] = parse_limit(value)
+    return limits
+
+
+# ----------------------------------------------------------------------
+# IN-PROCESS BUCKETS
+# ----------------------------------------------------------------------
+class _Shard:
+    __slots__ = ('lock', 'buckets')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.buckets = OrderedDict()  # key -> [tokens, updated_at]
+
+
+class MemoryBuckets:
+    """Token buckets split across independently locked shards"""
+
+    def __init__(self, shards=RATE_LIMIT_SHARDS, shard_size=RATE_LIMIT_SHARD_SIZE):
+        self._shards = [_Shard() for _ in range(shards)]
+        self._shard_size = shard_size
+
+    def _shard(self, key):
+        return self._shards[zlib.crc32(key.encode()) % len(self._shards)]
+
+    def consume(self, key, capacity, refill_rate, now=None):
+        """Take one token. Returns (allowed, retry_after_seconds)."""
+        now = time.monotonic() if now is None else now
+        shard = self._shard(key)
+        with shard.lock:
+            bucket = shard.buckets.get(key)
+            if bucket is None:
+                bucket = [capacity, now]
+                shard.buckets[key] = bucket
+                # Least recently used buckets are the ones most likely to be full again
+                while len(shard.buckets) > self._shard_size:
+                    shard.buckets.popitem(last=False)
+            else:
+                shard.buckets.move_to_end(key)
+                bucket[0] = min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+                bucket[1] = now
+
+            if bucket[0] >= 1:
+                bucket[0] -= 1
+                return True, 0
+            return False, (1 - bucket[0]) / refill_rate
+
+    def clear(self):
+        for shard in self._shards:
+            with shard.lock:
+                shard.buckets.clear()
+
+
+# ----------------------------------------------------------------------
+# SHARED (DATABASE) BUCKETS
+# ----------------------------------------------------------------------
+class DatabaseBuckets:
+    """Token buckets in the `rate_limits` table, updated with one upsert"""
+
+    def consume(self, key, capacity, refill_rate, now=None):
+        now = time.time() if now is None else now
+        with get_db() as db:
+            with db.cursor() as cursor:
+                cursor.execute('''
+                    INSERT INTO rate_limits AS b (key, tokens, updated_at, allowed)
+                    VALUES (%(key)s, %(capacity)s - 1, %(now)s, TRUE)
+                    ON CONFLICT (key) DO UPDATE SET
+                        tokens = CASE
+                            WHEN LEAST(%(capacity)s, b.tokens + (%(now)s - b.updated_at) * %(rate)s) >= 1
+                            THEN LEAST(%(capacity)s, b.tokens + (%(now)s - b.updated_at) * %(rate)s) - 1
+                            ELSE LEAST(%(capacity)s, b.tokens + (%(now)s - b.updated_at) * %(rate)s)
+                        END,
+                        allowed = LEAST(%(capacity)s, b.tokens + (%(now)s - b.updated_at) * %(rate)s) >= 1,
+                        updated_at = %(now)s
+                    RETURNING tokens, allowed
+                ''', {'key': key, 'capacity': capacity, 'rate': refill_rate, 'now': now})
+                row = cursor.fetchone()
+                db.commit()
+
+        if row['allowed']:
+            return True, 0
+        return False, (1 - row['tokens']) / refill_rate
+
+    def purge_stale(self, older_than_seconds=3600):
+        """Drop buckets that have been idle long enough to be full again"""
+        with get_db() as db:
+            with db.cursor() as cursor:
+                cursor.execute(
+                    'DELETE FROM rate_limits WHERE updated_at < %s',
+                    (time.time() - older_than_seconds,)
+                )
+                deleted = cursor.rowcount
+                db.commit()
+        return deleted
+
+
+# ----------------------------------------------------------------------
+# LIMITER
+# ----------------------------------------------------------------------
+class RateLimiter:
+    def __init__(self, limits=None, shared=None):
+        self.limits = limits if limits is not None else load_limits()
+        self.local = MemoryBuckets()
+        self.shared = shared
+
+    def check(self, route, ip=None, account=None):
+        """Returns seconds to wait, or 0 if the request may proceed"""
+        scopes = self.limits.get(route, {})
+        keys = []
+        if ip and 'ip' in scopes:
+            keys.append(('ip', f'{route}:ip:{ip}'))
+        if account and 'account' in scopes:
+            keys.append(('account', f'{route}:account:{account.strip().lower()}'))
+
+        retry_after = 0
+        for scope, key in keys:
+            capacity, rate = scopes[scope]
+            allowed, wait = self.local.consume(key, capacity, rate)
+            if allowed and self.shared is not None:
+                allowed, wait = self.shared.consume(key, capacity, rate)
+            if not allowed:
+                retry_after = max(retry_after, wait)
+        return retry_after
+
+
+limiter = RateLimiter(shared=DatabaseBuckets() if RATE_LIMIT_BACKEND == 'database' else None)
+
+
+def too_many_requests(retry_after):
+    seconds = max(1, int(math.ceil(retry_after)))
+    response = make_response(
+        f'Too many attempts. Please wait {seconds} seconds and try again.', 429
+    )
+    response.headers['Retry-After'] = str(seconds)
+    response.mimetype = 'text/plain'
+    return response
+
+
+def form_field(name):
+    return lambda: request.form.get(name)
+
+
+def session_field(key, field):
+    return lambda: (session.get(key) or {}).get(field)
+
+
+def rate_limit(route, account=None):
+    """Throttle POSTs to a view by client IP and, optionally, by account.
+
+    account is a callable returning the account identifier for the request.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if RATE_LIMIT_ENABLED and request.method == 'POST':
+                retry_after = limiter.check(
+                    route,
+                    ip=request.remote_addr,
+                    account=account() if account else None,
+                )
+                if retry_after:
+                    print(f"🚫 Rate limited {route} from {request.remote_addr}")
+                    return too_many_requests(retry_after)
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
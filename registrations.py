@@ -0,0 +1,160 @@
+"""Pending voter registrations awaiting email verification.
+
+A registration is stored in `pending_registrations` with only a keyed hash
+of its OTP. Each attempt gets its own row, whose id only the registering
+session knows; registering an email again never touches another person's
+row, so their code can't create an account with someone else's password.
+Verification promotes the row into `voters` in a single statement, so two
+tabs (or two people) racing on the same email cannot both succeed.
+(SQLite has no data-modifying CTEs; there the same steps run as separate
+statements under the database's write lock.)
+"""
+import hashlib
+import hmac
+import os
+from datetime import datetime, timedelta
+
+from database import get_db, backend, SQLITE
+
+OTP_TTL = timedelta(minutes=int(os.getenv('OTP_TTL_MINUTES', 10)))
+OTP_MAX_ATTEMPTS = int(os.getenv('OTP_MAX_ATTEMPTS', 5))
+PURGE_BATCH_SIZE = 1000
+
+# Returned by verify_registration()
+VERIFIED = 'verified'
+INVALID = 'invalid'
+EXPIRED = 'expired'
+TOO_MANY_ATTEMPTS = 'too_many_attempts'
+ALREADY_REGISTERED = 'already_registered'
+
+
+def hash_otp(email, otp):
+    key = os.getenv('SECRET_KEY', 'fallback-secret-key-change-in-production').encode()
+    return hmac.new(key, f'{email.lower()}:{otp}'.encode(), hashlib.sha256).hexdigest()
+
+
+def create_registration(name, email, password_hash, constituency_id, otp, replaces=None):
+    """Store a new pending registration, discarding `replaces` (the caller's
+    previous attempt, if any).
+
+    Returns its id, or None if the email already belongs to a voter.
+    """
+    with get_db() as db:
+        with db.cursor() as cursor:
+            if replaces is not None:
+                cursor.execute('DELETE FROM pending_registrations WHERE id = %s', (replaces,))
+            cursor.execute('''
+                INSERT INTO pending_registrations
+                    (name, email, password, constituency_id, otp_hash, attempts, expires_at)
+                SELECT %s, %s, %s, %s, %s, 0, %s
+                WHERE NOT EXISTS (SELECT 1 FROM voters WHERE email = %s)
+                RETURNING id
+            ''', (name, email, password_hash, constituency_id, hash_otp(email, otp),
+                  datetime.now() + OTP_TTL, email))
+            row = cursor.fetchone()
+            db.commit()
+    return row['id'] if row else None
+
+
+def verify_registration(registration_id, email, otp):
+    """Check an OTP and promote the registration into `voters` on success.
+
+    Returns one of VERIFIED, INVALID, EXPIRED, TOO_MANY_ATTEMPTS,
+    ALREADY_REGISTERED.
+    """
+    now = datetime.now()
+    with get_db() as db:
+        with db.cursor() as cursor:
+            if backend() == SQLITE:
+                result = _promote_sqlite(cursor, registration_id, email, otp, now)
+            else:
+                result = _promote(cursor, registration_id, email, otp, now)
+
+            if result['matched']:
+                if result['voter_id']:
+                    # Other attempts at this email can no longer succeed
+                    cursor.execute('DELETE FROM pending_registrations WHERE email = %s', (email,))
+                db.commit()
+                return VERIFIED if result['voter_id'] else ALREADY_REGISTERED
+
+            # Wrong code (or expired): count the attempt and explain why
+            cursor.execute('''
+                UPDATE pending_registrations SET attempts = attempts + 1
+                WHERE id = %s
+                RETURNING attempts, expires_at
+            ''', (registration_id,))
+            pending = cursor.fetchone()
+            db.commit()
+
+    if not pending or pending['expires_at'] < now:
+        return EXPIRED
+    if pending['attempts'] >= OTP_MAX_ATTEMPTS:
+        return TOO_MANY_ATTEMPTS
+    return INVALID
+
+
+def _promote(cursor, registration_id, email, otp, now):
+    """One statement deletes the pending row and inserts the voter. Returns {matched, voter_id}."""
+    cursor.execute('''
+        WITH promoted AS (
+            DELETE FROM pending_registrations
+            WHERE id = %s AND otp_hash = %s AND expires_at >= %s AND attempts < %s
+            RETURNING name, email, password, constituency_id
+        ), inserted AS (
+            INSERT INTO voters (name, email, password, constituency_id, is_verified)
+            SELECT name, email, password, constituency_id, TRUE FROM promoted
+            ON CONFLICT (email) DO NOTHING
+            RETURNING id
+        )
+        SELECT (SELECT COUNT(*) FROM promoted) AS matched,
+               (SELECT id FROM inserted) AS voter_id
+    ''', (registration_id, hash_otp(email, otp), now, OTP_MAX_ATTEMPTS))
+    return cursor.fetchone()
+
+
+def _promote_sqlite(cursor, registration_id, email, otp, now):
+    """_promote() as two statements; the DELETE takes SQLite's write lock first"""
+    cursor.execute('''
+        DELETE FROM pending_registrations
+        WHERE id = %s AND otp_hash = %s AND expires_at >= %s AND attempts < %s
+        RETURNING name, email, password, constituency_id
+    ''', (registration_id, hash_otp(email, otp), now, OTP_MAX_ATTEMPTS))
+    promoted = cursor.fetchone()
+    if promoted is None:
+        return {'matched': 0, 'voter_id': None}
+    cursor.execute('''
+        INSERT INTO voters (name, email, password, constituency_id, is_verified)
+        VALUES (%s, %s, %s, %s, TRUE)
+        ON CONFLICT (email) DO NOTHING
+        RETURNING id
+    ''', (promoted['name'], promoted['email'], promoted['password'], promoted['constituency_id']))
+    inserted = cursor.fetchone()
+    return {'matched': 1, 'voter_id': inserted['id'] if inserted else None}
+
+
+def discard_registration(registration_id):
+    with get_db() as db:
+        with db.cursor() as cursor:
+            cursor.execute('DELETE FROM pending_registrations WHERE id = %s', (registration_id,))
+            db.commit()
+
+
+def purge_expired_registrations(batch_size=PURGE_BATCH_SIZE):
+    """Delete expired pending registrations in batches (background sweeper)"""
+    total = 0
+    while True:
+        with get_db() as db:
+            with db.cursor() as cursor:
+                cursor.execute('''
+                    DELETE FROM pending_registrations WHERE id IN (
+                        SELECT id FROM pending_registrations WHERE expires_at < %s LIMIT %s
+                    )
+                ''', (datetime.now(), batch_size))
+                deleted = cursor.rowcount
+                db.commit()
+        total += deleted
+        if deleted < batch_size:
+            break
+    if total:
+        print(f"🧹 Purged {total} expired pending registrations")
+    return total
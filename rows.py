@@ -0,0 +1,151 @@
+"""Compact result rows.
+
+get_db() cursors return each row as an instance of a small class with one
+__slots__ entry per column instead of as a RealDictRow: an eight-column
+election row takes about 100 bytes rather than over 700, and building it
+allocates one object rather than a dict and its hash table. One class is
+made per distinct column list and reused for every row with that list.
+
+Rows read like the dicts they replace (row['title'], row.get('title'),
+dict(row), 'title' in row) and also as attributes (row.title). Existing
+columns can be reassigned; new ones can't be added. Results whose column
+names can't be slots (duplicates, or names that aren't identifiers) come
+back as plain dicts.
+
+Timestamps stay datetimes; templates format them with the `datetime`
+filter (formatting.format_datetime).
+"""
+import functools
+import keyword
+from collections.abc import Mapping
+
+import psycopg2.extensions
+
+
+class Row:
+    __slots__ = ()
+    _fields = ()
+    _field_set = frozenset()
+
+    def __getitem__(self, key):
+        if key in self._field_set:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key not in self._field_set:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self._field_set
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __eq__(self, other):
+        if isinstance(other, Mapping):
+            return self._asdict() == dict(other)
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f'Row({self._asdict()!r})'
+
+    def get(self, key, default=None):
+        if key in self._field_set:
+            return getattr(self, key)
+        return default
+
+    def keys(self):
+        return self._fields
+
+    def values(self):
+        return [getattr(self, name) for name in self._fields]
+
+    def items(self):
+        return [(name, getattr(self, name)) for name in self._fields]
+
+    def _asdict(self):
+        return {name: getattr(self, name) for name in self._fields}
+
+
+Mapping.register(Row)
+
+
+def _slot_name(name):
+    return name.isidentifier() and not keyword.iskeyword(name) and not name.startswith('_') \
+        and not hasattr(Row, name)
+
+
+@functools.lru_cache(maxsize=1024)
+def row_factory(names):
+    """Callable turning a tuple of values into a row, for a tuple of column names"""
+    if len(set(names)) != len(names) or not all(map(_slot_name, names)):
+        return lambda values: dict(zip(names, values))
+
+    # Assign every slot in one generated __init__, as namedtuple does
+    args = ', '.join(names)
+    body = '\n'.join(f'    self.{name} = {name}' for name in names) or '    pass'
+    namespace = {}
+    exec(f'def __init__(self, {args}):\n{body}', namespace)
+    cls = type('Row', (Row,), {
+        '__slots__': names,
+        '__init__': namespace['__init__'],
+        '_fields': names,
+        '_field_set': frozenset(names),
+    })
+    return lambda values: cls(*values)
+
+
+class RowCursor(psycopg2.extensions.cursor):
+    """psycopg2 cursor returning Row objects; pass as cursor_factory"""
+
+    _make_row = None
+
+    def execute(self, query, vars=None):
+        self._make_row = None
+        return super().execute(query, vars)
+
+    def executemany(self, query, vars_list):
+        self._make_row = None
+        return super().executemany(query, vars_list)
+
+    def callproc(self, procname, vars=None):
+        self._make_row = None
+        return super().callproc(procname, vars)
+
+    def _row_maker(self):
+        if self._make_row is None:
+            self._make_row = row_factory(tuple(column.name for column in self.description))
+        return self._make_row
+
+    def fetchone(self):
+        values = super().fetchone()
+        if values is None:
+            return None
+        return self._row_maker()(values)
+
+    def fetchmany(self, size=None):
+        rows = super().fetchmany(size) if size is not None else super().fetchmany()
+        return list(map(self._row_maker(), rows)) if rows else rows
+
+    def fetchall(self):
+        rows = super().fetchall()
+        return list(map(self._row_maker(), rows)) if rows else rows
+
+    def __iter__(self):
+        # Named cursors only know their description after the first fetch
+        it = super().__iter__()
+        try:
+            first = next(it)
+        except StopIteration:
+            return
+        make_row = self._row_maker()
+        yield make_row(first)
+        for values in it:
+            yield make_row(values)
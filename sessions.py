@@ -0,0 +1,224 @@
+"""Server-side session storage.
+
+The browser only receives a random session id. Session data lives in the
+`sessions` table (or in memory for local runs and tests) and is read from
+there on every request: a per-worker copy would let a logout or a login made
+on one worker go unseen, or be overwritten, by the others.
+
+Call session.regenerate() when a user logs in: the session moves to a new
+id and the old one is deleted, so an id planted before login (session
+fixation) is useless afterwards.
+
+Expired sessions are ignored when read and removed in bulk by
+purge_expired_sessions().
+"""
+import os
+import secrets
+import threading
+from datetime import datetime
+
+from flask.sessions import SessionInterface, SessionMixin, session_json_serializer
+from werkzeug.datastructures import CallbackDict
+
+from database import get_db
+
+PURGE_BATCH_SIZE = 1000
+
+
+# ----------------------------------------------------------------------
+# STORES
+# ----------------------------------------------------------------------
+class PostgresSessionStore:
+    """Sessions kept in the `sessions` table"""
+
+    def load(self, sid):
+        with get_db() as db:
+            with db.cursor() as cursor:
+                cursor.execute(
+                    'SELECT data, expires_at FROM sessions WHERE sid = %s',
+                    (sid,)
+                )
+                row = cursor.fetchone()
+        if not row:
+            return None
+        return row['data'], row['expires_at']
+
+    def save(self, sid, data, expires_at):
+        with get_db() as db:
+            with db.cursor() as cursor:
+                cursor.execute('''
+                    INSERT INTO sessions (sid, data, expires_at)
+                    VALUES (%s, %s, %s)
+                    ON CONFLICT (sid) DO UPDATE
+                    SET data = EXCLUDED.data, expires_at = EXCLUDED.expires_at
+                ''', (sid, data, expires_at))
+                db.commit()
+
+    def delete(self, sid):
+        with get_db() as db:
+            with db.cursor() as cursor:
+                cursor.execute('DELETE FROM sessions WHERE sid = %s', (sid,))
+                db.commit()
+
+    def purge_expired(self, now, batch_size=PURGE_BATCH_SIZE):
+        """Delete expired sessions in batches so no single statement holds locks for long"""
+        total = 0
+        while True:
+            with get_db() as db:
+                with db.cursor() as cursor:
+                    cursor.execute('''
+                        DELETE FROM sessions WHERE sid IN (
+                            SELECT sid FROM sessions WHERE expires_at < %s LIMIT %s
+                        )
+                    ''', (now, batch_size))
+                    deleted = cursor.rowcount
+                    db.commit()
+            total += deleted
+            if deleted < batch_size:
+                return total
+
+
+class LocalSessionStore:
+    """In-memory stand-in for PostgresSessionStore (single process only)"""
+
+    def __init__(self):
+        self._rows = {}
+        self._lock = threading.Lock()
+
+    def load(self, sid):
+        with self._lock:
+            return self._rows.get(sid)
+
+    def save(self, sid, data, expires_at):
+        with self._lock:
+            self._rows[sid] = (data, expires_at)
+
+    def delete(self, sid):
+        with self._lock:
+            self._rows.pop(sid, None)
+
+    def purge_expired(self, now, batch_size=PURGE_BATCH_SIZE):
+        with self._lock:
+            expired = [sid for sid, (_, expires_at) in self._rows.items() if expires_at < now]
+            for sid in expired:
+                del self._rows[sid]
+        return len(expired)
+
+
+# ----------------------------------------------------------------------
+# FLASK SESSION INTERFACE
+# ----------------------------------------------------------------------
+class ServerSideSession(CallbackDict, SessionMixin):
+    def __init__(self, initial=None, sid=None, new=False, expires_at=None):
+        def on_update(self):
+            self.modified = True
+
+        CallbackDict.__init__(self, initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.expires_at = expires_at
+        self.modified = False
+        self.previous_sid = None
+
+    def regenerate(self):
+        """Move the session to a new id; the old one is deleted when it is saved"""
+        if not self.new and self.previous_sid is None:
+            self.previous_sid = self.sid
+        self.sid = secrets.token_urlsafe(32)
+        self.modified = True
+
+
+class ServerSideSessionInterface(SessionInterface):
+    """Keeps only a random id in the cookie; data goes to a session store"""
+
+    serializer = session_json_serializer
+
+    def __init__(self, store):
+        self.store = store
+
+    def _lifetime(self, app):
+        return app.permanent_session_lifetime
+
+    def open_session(self, app, request):
+        sid = request.cookies.get(self.get_cookie_name(app))
+        if not sid:
+            return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+        now = datetime.utcnow()
+        record = self.store.load(sid)
+        if record is not None:
+            data, expires_at = record
+            if expires_at >= now:
+                try:
+                    return ServerSideSession(self.serializer.loads(data), sid=sid,
+                                             expires_at=expires_at)
+                except ValueError:
+                    pass
+            # Lazy expiry: stale rows are swept by purge_expired_sessions()
+
+        return ServerSideSession(sid=secrets.token_urlsafe(32), new=True)
+
+    def save_session(self, app, session, response):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        # Responses that looked at the session differ per visitor
+        if session.accessed:
+            response.vary.add('Cookie')
+
+        if session.previous_sid:
+            self.store.delete(session.previous_sid)
+
+        if not session:
+            if not session.new and not session.previous_sid:
+                self.store.delete(session.sid)
+            if session.modified or not session.new:
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        now = datetime.utcnow()
+        lifetime = self._lifetime(app)
+        # Unchanged sessions are only re-written once half their lifetime has passed
+        needs_refresh = session.expires_at is None or session.expires_at - now < lifetime / 2
+        if not session.modified and not needs_refresh:
+            return
+
+        expires_at = now + lifetime
+        data = self.serializer.dumps(dict(session))
+        self.store.save(session.sid, data, expires_at)
+
+        response.set_cookie(
+            name,
+            session.sid,
+            expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            samesite=self.get_cookie_samesite(app),
+        )
+
+
+def create_session_interface(kind=None):
+    """Build the session interface selected by SESSION_STORE (postgres or local)"""
+    kind = (kind or os.getenv('SESSION_STORE', 'postgres')).lower()
+    if kind == 'local':
+        store = LocalSessionStore()
+    elif kind == 'postgres':
+        store = PostgresSessionStore()
+    else:
+        raise ValueError(f"Unknown SESSION_STORE: {kind}")
+    return ServerSideSessionInterface(store)
+
+
+def purge_expired_sessions(interface):
+    """Remove every expired session from the interface's store"""
+    deleted = interface.store.purge_expired(datetime.utcnow())
+    if deleted:
+        print(f"🧹 Purged {deleted} expired sessions")
+    return deleted
+
+
+if __name__ == '__main__':
+    purge_expired_sessions(create_session_interface())
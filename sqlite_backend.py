@@ -0,0 +1,238 @@
+"""SQLite backend for get_db(): development, load tests and benchmarks on one
+box without a Postgres server, and small embedded installs (a polling
+station's laptop).
+
+    DATABASE_URL=sqlite:///voting.db                 relative to the working directory
+    DATABASE_URL=sqlite:////var/lib/evoting/voting.db
+
+Connections look like the psycopg2 connections the rest of the code uses:
+`with db.cursor() as cursor`, %s and %(name)s placeholders, the same Row
+objects as rows.RowCursor (unaliased COUNT(*) and MAX(...) columns are named count and max as in
+Postgres), TIMESTAMP columns as datetimes, commit() and rollback(). Errors
+are raised as the matching psycopg2 exceptions, so existing except clauses
+keep working; a busy database raises LockNotAvailable like a Postgres
+lock_timeout.
+
+Every connection runs in WAL mode, so readers never block the single writer,
+with synchronous=NORMAL (durable across application crashes; the last few
+transactions may be lost on power failure). Writes take the database lock
+up front (BEGIN IMMEDIATE), waiting up to SQLITE_BUSY_TIMEOUT ms for it,
+which avoids the deadlock of two readers upgrading to writers at once.
+
+The schema lives in migrations/sqlite/. Postgres-only features fall back
+where they are used: no vote partitions, replicas or prepared statements.
+"""
+import functools
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+
+import psycopg2
+import psycopg2.errors
+from psycopg2.pool import PoolError
+
+from rows import row_factory
+
+SQLITE_BUSY_TIMEOUT = int(os.getenv('SQLITE_BUSY_TIMEOUT', 5000))
+# Page cache per connection, in KiB, and how much of the file to memory-map
+SQLITE_CACHE_KB = int(os.getenv('SQLITE_CACHE_KB', 32 * 1024))
+SQLITE_MMAP_BYTES = int(os.getenv('SQLITE_MMAP_BYTES', 256 * 1024 * 1024))
+
+PRAGMAS = (
+    'journal_mode = WAL',
+    'synchronous = NORMAL',
+    'foreign_keys = ON',
+    f'busy_timeout = {SQLITE_BUSY_TIMEOUT}',
+    f'cache_size = -{SQLITE_CACHE_KB}',
+    f'mmap_size = {SQLITE_MMAP_BYTES}',
+    'temp_store = MEMORY',
+)
+
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('TIMESTAMP', lambda value: datetime.fromisoformat(value.decode()))
+sqlite3.register_converter('BOOLEAN', lambda value: value not in (b'0', b''))
+
+_PLACEHOLDER = re.compile(r'%\((\w+)\)s|%s|%%')
+_FUNCTION_COLUMN = re.compile(r'^(\w+)\s*\(.*\)$', re.S)
+
+
+def database_path(database_url):
+    """sqlite:///relative.db or sqlite:////absolute.db -> file path"""
+    path = database_url.split(':', 1)[1]
+    if path.startswith('///'):
+        path = path[3:]
+    return path
+
+
+@functools.lru_cache(maxsize=1024)
+def translate(sql):
+    """psycopg2 placeholders -> sqlite3 ones (%s -> ?, %(name)s -> :name, %% -> %)"""
+    return _PLACEHOLDER.sub(
+        lambda m: f':{m.group(1)}' if m.group(1) else ('?' if m.group(0) == '%s' else '%'), sql)
+
+
+@functools.lru_cache(maxsize=1024)
+def _column_names(names):
+    # Postgres names an unaliased COUNT(*) "count"; queries rely on that
+    return tuple(m.group(1).lower() if (m := _FUNCTION_COLUMN.match(name)) else name for name in names)
+
+
+def _make_row(cursor, values):
+    return row_factory(_column_names(tuple(column[0] for column in cursor.description)))(values)
+
+
+def _greatest(*values):
+    return max((v for v in values if v is not None), default=None)
+
+
+def _least(*values):
+    return min((v for v in values if v is not None), default=None)
+
+
+def _translate_error(e):
+    """sqlite3 exception -> the psycopg2 exception callers catch"""
+    message = str(e)
+    if isinstance(e, sqlite3.OperationalError):
+        if 'locked' in message or 'busy' in message:
+            return psycopg2.errors.LockNotAvailable(message)
+        if message.startswith('no such table'):
+            return psycopg2.errors.UndefinedTable(message)
+        return psycopg2.OperationalError(message)
+    if isinstance(e, sqlite3.IntegrityError):
+        if 'UNIQUE' in message:
+            return psycopg2.errors.UniqueViolation(message)
+        return psycopg2.IntegrityError(message)
+    if isinstance(e, (sqlite3.ProgrammingError, sqlite3.InterfaceError)):
+        return psycopg2.ProgrammingError(message)
+    return psycopg2.DatabaseError(message)
+
+
+class SQLiteCursor:
+    """The parts of a psycopg2 cursor the app uses"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self._cursor = connection._conn.cursor()
+        self.itersize = 2000  # accepted for named-cursor callers; SQLite streams rows anyway
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    @property
+    def description(self):
+        return self._cursor.description
+
+    def execute(self, sql, params=None):
+        try:
+            self._cursor.execute(translate(sql), params if params is not None else ())
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def executemany(self, sql, params):
+        try:
+            self._cursor.executemany(translate(sql), params)
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._cursor.fetchmany(size or self.itersize)
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    """A sqlite3 connection with psycopg2's connection interface"""
+
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT / 1000,
+                                     detect_types=sqlite3.PARSE_DECLTYPES,
+                                     isolation_level='IMMEDIATE', check_same_thread=False)
+        self._conn.row_factory = _make_row
+        for pragma in PRAGMAS:
+            self._conn.execute(f'PRAGMA {pragma}')
+        self._conn.create_function('GREATEST', -1, _greatest, deterministic=True)
+        self._conn.create_function('LEAST', -1, _least, deterministic=True)
+        self.closed = 0
+
+    def cursor(self, name=None, **kwargs):
+        return SQLiteCursor(self)
+
+    def commit(self):
+        try:
+            self._conn.commit()
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def rollback(self):
+        try:
+            self._conn.rollback()
+        except sqlite3.Error as e:
+            raise _translate_error(e) from e
+
+    def close(self):
+        if not self.closed:
+            self._conn.close()
+            self.closed = 1
+
+
+def connect(database_url):
+    """A new connection to the database file named by a sqlite:/// URL"""
+    return SQLiteConnection(database_path(database_url))
+
+
+class SQLitePool:
+    """Pool of connections to one SQLite file, with BlockingConnectionPool's interface"""
+
+    def __init__(self, minconn, maxconn, database_url, timeout):
+        self._path = database_path(database_url)
+        self._timeout = timeout
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._idle = [SQLiteConnection(self._path) for _ in range(minconn)]
+
+    def getconn(self, key=None):
+        if not self._slots.acquire(timeout=self._timeout):
+            raise PoolError(f"no database connection free after {self._timeout}s")
+        try:
+            with self._lock:
+                if self._idle:
+                    return self._idle.pop()
+            return SQLiteConnection(self._path)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def putconn(self, conn, key=None, close=False):
+        try:
+            if close or conn.closed:
+                conn.close()
+            else:
+                with self._lock:
+                    self._idle.append(conn)
+        finally:
+            self._slots.release()
+
+    def closeall(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
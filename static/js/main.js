@@ -91,34 +91,89 @@ function initVotingSystem() {
             }
         });
     });
+
+    // Ballot form: cast the vote over the API and show the receipt in place.
+    // If the request cannot be made, the form is submitted normally instead.
+    const ballot = document.querySelector('form[data-election-id]');
+    if (ballot && window.fetch) {
+        ballot.addEventListener('submit', function(e) {
+            if (e.defaultPrevented) return;
+            const selected = ballot.querySelector('input[name="candidate_id"]:checked');
+            if (!selected) return;
+            e.preventDefault();
+            submitVote(ballot.dataset.electionId, selected.value, ballot);
+        });
+    }
 }
 
-function submitVote(electionId, candidateId) {
-    const formData = new FormData();
-    formData.append('election_id', electionId);
-    formData.append('candidate_id', candidateId);
-    
-    fetch('/voter/submit-vote', {
+function submitVote(electionId, candidateId, form = null) {
+    const buttons = form ? form.querySelectorAll('button') : [];
+    buttons.forEach(button => button.disabled = true);
+
+    fetch(`/api/v1/elections/${electionId}/votes`, {
         method: 'POST',
-        body: formData
+        headers: { 'Content-Type': 'application/json' },
+        credentials: 'same-origin',
+        body: JSON.stringify({ candidate_id: Number(candidateId) })
+    })
+    .then(response => {
+        if (!(response.headers.get('Content-Type') || '').includes('application/json')) {
+            throw new Error(`Unexpected response (${response.status})`);
+        }
+        return response.json();
     })
-    .then(response => response.json())
     .then(data => {
         if (data.success) {
-            showNotification(data.message, 'success');
-            setTimeout(() => {
-                window.location.href = '/voter/dashboard';
-            }, 2000);
+            if (form) {
+                showVoteReceipt(form, data);
+            } else {
+                showNotification(data.message, 'success');
+                setTimeout(() => {
+                    window.location.href = '/voter/dashboard';
+                }, 2000);
+            }
         } else {
-            showNotification(data.message, 'error');
+            showNotification(data.message || data.error, 'error');
+            buttons.forEach(button => button.disabled = false);
         }
     })
     .catch(error => {
         console.error('Error:', error);
-        showNotification('An error occurred while submitting your vote', 'error');
+        if (form) {
+            // Fall back to the plain form POST
+            form.submit();
+        } else {
+            showNotification('An error occurred while submitting your vote', 'error');
+        }
     });
 }
 
+function showVoteReceipt(form, data) {
+    const receipt = document.createElement('div');
+    receipt.className = 'vote-receipt';
+
+    const heading = document.createElement('h3');
+    heading.innerHTML = '<i class="fas fa-check-circle"></i> ';
+    heading.appendChild(document.createTextNode(data.message));
+
+    const code = document.createElement('p');
+    code.innerHTML = 'Receipt code: ';
+    const strong = document.createElement('strong');
+    strong.textContent = data.receipt_code;
+    code.appendChild(strong);
+
+    const note = document.createElement('p');
+    note.textContent = 'Keep this code as proof that your vote was recorded.';
+
+    const link = document.createElement('a');
+    link.href = '/voter/dashboard';
+    link.className = 'btn btn-primary';
+    link.textContent = 'Return to Dashboard';
+
+    receipt.append(heading, code, note, link);
+    form.replaceWith(receipt);
+}
+
 // Dashboard charts (placeholder for future implementation)
 function initDashboardCharts() {
     // This would integrate with Chart.js or similar library
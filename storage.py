@@ -0,0 +1,111 @@
+"""Content-addressed storage for candidate photos and party symbols.
+
+Uploads are stored as `<kind>_<sha256>.<ext>`, so the same image uploaded
+for several candidates is kept once and its URL never changes meaning.
+The `uploads` table counts how many candidate columns point at each file;
+a file is deleted only when its last reference goes away.
+
+Files from the older `photo_<timestamp>_<name>` scheme are not tracked in
+`uploads` and were never shared, so releasing one always deletes it.
+
+The bytes themselves live in the configured storage backend (see
+storage_backends.py).
+"""
+import hashlib
+import os
+import tempfile
+
+from werkzeug.utils import secure_filename
+
+from images import schedule_variants, delete_variants, variants_exist
+from storage_backends import get_storage
+from upload_gc import restore_upload
+
+CHUNK_SIZE = 64 * 1024
+
+
+def _extension(filename):
+    filename = secure_filename(filename or '')
+    ext = filename.rsplit('.', 1)[1].lower() if '.' in filename else 'bin'
+    return 'jpg' if ext == 'jpeg' else ext
+
+
+def store_upload(file, kind):
+    """Hash an uploaded file while saving it; returns the content-addressed filename"""
+    storage = get_storage()
+    if storage.tmp_dir:
+        os.makedirs(storage.tmp_dir, exist_ok=True)
+    digest = hashlib.sha256()
+
+    fd, tmp = tempfile.mkstemp(dir=storage.tmp_dir, prefix='.upload-')
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while True:
+                chunk = file.stream.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+
+        # Prefer the type sniffed from the content by the upload parser
+        ext = getattr(file.stream, 'detected_type', None) or _extension(file.filename)
+        stored = f"{kind}_{digest.hexdigest()}.{ext}"
+        if storage.exists(stored):
+            # Same bytes already stored: keep the existing copy
+            os.remove(tmp)
+        else:
+            storage.save_file(tmp, stored)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    # Not the cached answer: another worker may have deleted the variants
+    # when this file was last released
+    if not variants_exist(stored):
+        schedule_variants(stored, kind)
+    return stored
+
+
+def acquire_upload(cursor, filename):
+    """Record one more reference to filename (inside the caller's transaction)"""
+    if not filename:
+        return
+    storage = get_storage()
+    cursor.execute('''
+        INSERT INTO uploads (filename, size, refcount)
+        VALUES (%s, %s, 1)
+        ON CONFLICT (filename) DO UPDATE SET refcount = uploads.refcount + 1
+    ''', (filename, storage.size(filename)))
+    # The upsert waits out an upload GC holding this row; if the GC moved the
+    # file to quarantine meanwhile, bring it back
+    if not storage.exists(filename) and restore_upload(filename):
+        cursor.execute('UPDATE uploads SET size = %s WHERE filename = %s',
+                       (storage.size(filename), filename))
+
+
+def release_upload(cursor, filename):
+    """Drop one reference to filename. Returns True if the file should now be deleted."""
+    if not filename:
+        return False
+    cursor.execute('''
+        UPDATE uploads SET refcount = refcount - 1
+        WHERE filename = %s
+        RETURNING refcount
+    ''', (filename,))
+    row = cursor.fetchone()
+    if row is None:
+        # Legacy per-candidate file, never shared
+        return True
+    if row['refcount'] <= 0:
+        cursor.execute('DELETE FROM uploads WHERE filename = %s AND refcount <= 0', (filename,))
+        return True
+    return False
+
+
+def delete_upload_file(filename):
+    """Remove a stored file and its variants (call after the releasing transaction commits)"""
+    if not filename:
+        return
+    get_storage().delete(filename)
+    delete_variants(filename)
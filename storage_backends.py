@@ -0,0 +1,293 @@
+"""Where uploaded files live.
+
+LocalStorage keeps them under static/uploads on the web node, which is fine
+for a single host. S3Storage keeps them in an S3-compatible bucket so every
+gunicorn host sees the same files and browsers fetch images straight from
+the bucket (or a CDN in front of it) instead of from the Python workers.
+
+Configuration:
+    STORAGE_BACKEND        local (default) or s3
+    STORAGE_BUCKET         bucket name
+    STORAGE_PREFIX         key prefix inside the bucket, e.g. uploads/
+    STORAGE_ENDPOINT_URL   for S3-compatible stores, e.g. the MinIO stand-in
+                           from docker-compose.yml at http://localhost:9000
+    STORAGE_REGION
+    STORAGE_PUBLIC_URL     public or CDN base URL; without it, presigned URLs
+                           valid for STORAGE_URL_EXPIRES seconds are used
+    AWS_ACCESS_KEY_ID / AWS_SECRET_ACCESS_KEY are read by boto3 as usual.
+
+Keys are relative paths such as `photo_<sha256>.jpg` or
+`variants/photo_<sha256>_w80.webp`. Everything the app stores is
+content-addressed, so objects are written with an immutable Cache-Control.
+
+Check the configured backend with:
+    python storage_backends.py
+"""
+import io
+import mimetypes
+import os
+import shutil
+import threading
+import time
+from collections import namedtuple
+
+from flask import url_for
+
+from cache import LRUCache
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.config import Config as BotoConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # boto3 is only needed for STORAGE_BACKEND=s3
+    boto3 = None
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Multipart settings for S3 writes; parts are uploaded in parallel
+MULTIPART_THRESHOLD = int(os.getenv('STORAGE_MULTIPART_THRESHOLD', 8 * 1024 * 1024))
+MULTIPART_CHUNKSIZE = int(os.getenv('STORAGE_MULTIPART_CHUNKSIZE', 8 * 1024 * 1024))
+MULTIPART_CONCURRENCY = int(os.getenv('STORAGE_MULTIPART_CONCURRENCY', 4))
+
+StoredObject = namedtuple('StoredObject', 'key size mtime')
+
+
+def _content_type(key):
+    return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+
+class LocalStorage:
+    """Files under static/uploads, served by Flask's static route"""
+
+    def __init__(self, root=os.path.join('static', 'uploads')):
+        self.root = root
+        # Temp files are created next to their destination so saving is a rename
+        self.tmp_dir = root
+
+    def _path(self, key):
+        return os.path.join(self.root, *key.split('/'))
+
+    def save_file(self, path, key):
+        """Store the local file at path under key (the file is consumed)"""
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.chmod(path, 0o644)  # mkstemp creates owner-only files
+        shutil.move(path, target)
+
+    def save_bytes(self, key, data):
+        target = self._path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        # Written to a temp name first so a half-written file is never served
+        tmp = target + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, target)
+
+    def open(self, key):
+        return open(self._path(key), 'rb')
+
+    def exists(self, key):
+        return os.path.exists(self._path(key))
+
+    def size(self, key):
+        try:
+            return os.path.getsize(self._path(key))
+        except OSError:
+            return None
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def move(self, source, target):
+        """Rename an object; like an S3 copy, the moved object counts as new"""
+        target_path = self._path(target)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        os.replace(self._path(source), target_path)
+        now = time.time()
+        os.utime(target_path, (now, now))
+
+    def list(self, prefix=''):
+        """Objects directly under prefix (not recursive)"""
+        directory = self._path(prefix) if prefix else self.root
+        if not os.path.isdir(directory):
+            return
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    stat = entry.stat()
+                    yield StoredObject(prefix + entry.name, stat.st_size, stat.st_mtime)
+
+    def url(self, key):
+        return url_for('static', filename='uploads/' + key)
+
+
+class S3Storage:
+    """Objects in an S3-compatible bucket"""
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None,
+                 public_url=None, url_expires=3600):
+        if boto3 is None:
+            raise RuntimeError("STORAGE_BACKEND=s3 needs boto3 (pip install boto3)")
+        if not bucket:
+            raise RuntimeError("STORAGE_BUCKET must be set for STORAGE_BACKEND=s3")
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self.url_expires = url_expires
+        self.tmp_dir = None  # system temp directory
+        self.transfer = TransferConfig(
+            multipart_threshold=MULTIPART_THRESHOLD,
+            multipart_chunksize=MULTIPART_CHUNKSIZE,
+            max_concurrency=MULTIPART_CONCURRENCY,
+            use_threads=True,
+        )
+        # Presigned URLs are reused for half their lifetime so pages stay cacheable
+        self._urls = LRUCache(maxsize=10000, ttl=max(url_expires // 2, 1))
+        self._client = None
+        self._client_pid = None
+        self._client_lock = threading.Lock()
+
+    @property
+    def client(self):
+        # boto3 connection pools must not be shared across a fork
+        if self._client is None or self._client_pid != os.getpid():
+            with self._client_lock:
+                if self._client is None or self._client_pid != os.getpid():
+                    self._client = boto3.client(
+                        's3',
+                        endpoint_url=self.endpoint_url,
+                        region_name=self.region,
+                        config=BotoConfig(
+                            max_pool_connections=max(10, MULTIPART_CONCURRENCY * 2),
+                            # MinIO and most stand-ins only support path-style addressing
+                            s3={'addressing_style': 'path' if self.endpoint_url else 'auto'},
+                        ),
+                    )
+                    self._client_pid = os.getpid()
+        return self._client
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def _extra_args(self, key):
+        return {'ContentType': _content_type(key), 'CacheControl': IMMUTABLE}
+
+    def save_file(self, path, key):
+        """Upload the local file at path (multipart above the threshold); the file is consumed"""
+        try:
+            self.client.upload_file(path, self.bucket, self._key(key),
+                                    ExtraArgs=self._extra_args(key), Config=self.transfer)
+        finally:
+            os.remove(path)
+
+    def save_bytes(self, key, data):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data,
+                               **self._extra_args(key))
+
+    def open(self, key):
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+                raise FileNotFoundError(key) from e
+            raise
+        # Pillow needs a seekable file
+        return io.BytesIO(response['Body'].read())
+
+    def _head(self, key):
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchKey', '404', 'NotFound'):
+                return None
+            raise
+
+    def exists(self, key):
+        return self._head(key) is not None
+
+    def size(self, key):
+        head = self._head(key)
+        return head['ContentLength'] if head else None
+
+    def delete(self, key):
+        self._urls.pop(key)
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def move(self, source, target):
+        self.client.copy({'Bucket': self.bucket, 'Key': self._key(source)},
+                         self.bucket, self._key(target), Config=self.transfer)
+        self.delete(source)
+
+    def list(self, prefix=''):
+        paginator = self.client.get_paginator('list_objects_v2')
+        strip = len(self.prefix)
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix), Delimiter='/'):
+            for item in page.get('Contents', []):
+                yield StoredObject(item['Key'][strip:], item['Size'], item['LastModified'].timestamp())
+
+    def url(self, key):
+        if self.public_url:
+            return f"{self.public_url}/{self._key(key)}"
+        url = self._urls.get(key)
+        if url is None:
+            url = self.client.generate_presigned_url(
+                'get_object',
+                Params={'Bucket': self.bucket, 'Key': self._key(key)},
+                ExpiresIn=self.url_expires,
+            )
+            self._urls.set(key, url)
+        return url
+
+
+def create_storage(kind=None):
+    kind = kind or os.getenv('STORAGE_BACKEND', 'local')
+    if kind == 's3':
+        return S3Storage(
+            bucket=os.getenv('STORAGE_BUCKET'),
+            prefix=os.getenv('STORAGE_PREFIX', ''),
+            endpoint_url=os.getenv('STORAGE_ENDPOINT_URL') or None,
+            region=os.getenv('STORAGE_REGION') or None,
+            public_url=os.getenv('STORAGE_PUBLIC_URL') or None,
+            url_expires=int(os.getenv('STORAGE_URL_EXPIRES', 3600)),
+        )
+    if kind == 'local':
+        return LocalStorage()
+    raise ValueError(f"Unknown STORAGE_BACKEND {kind!r} (expected 'local' or 's3')")
+
+
+_storage = None
+
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        _storage = create_storage()
+    return _storage
+
+
+def upload_url(key):
+    """Public URL of a stored upload"""
+    return get_storage().url(key)
+
+
+if __name__ == '__main__':
+    from flask import Flask
+
+    storage = get_storage()
+    key = f".storage-check-{os.getpid()}.txt"
+    print(f"Backend: {type(storage).__name__}")
+    storage.save_bytes(key, b'ok')
+    assert storage.exists(key) and storage.size(key) == 2
+    with storage.open(key) as f:
+        assert f.read() == b'ok'
+    with Flask(__name__).test_request_context():
+        print(f"URL: {storage.url(key)}")
+    storage.delete(key)
+    assert not storage.exists(key)
+    print("✅ Storage backend works")
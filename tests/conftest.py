@@ -0,0 +1,137 @@
+"""Shared fixtures for the route tests.
+
+The app is configured from the environment when it is imported, so the
+settings below are applied before anything imports it: a throwaway SQLite
+database, in-process sessions, no background threads and the cheapest
+bcrypt cost. Tests run from the repository root, where the app finds its
+static files, but uploads are stored in the temporary directory.
+
+One database serves the whole run; tests keep out of each other's way by
+creating their own admins, voters and elections with unique names.
+"""
+import io
+import itertools
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORKDIR = tempfile.mkdtemp(prefix='evoting-tests-')
+
+os.environ.update(
+    DATABASE_URL=f"sqlite:///{os.path.join(WORKDIR, 'test.db')}",
+    SESSION_STORE='local',
+    BACKGROUND_TASKS='0',
+    RATE_LIMIT_ENABLED='0',
+    STORAGE_BACKEND='local',
+    IMPORT_SPOOL_DIR=os.path.join(WORKDIR, 'imports'),
+    IMPORT_WORKERS='1',
+    BCRYPT_ROUNDS='4',
+    BCRYPT_MIN_ROUNDS='4',
+)
+os.chdir(ROOT)
+sys.path.insert(0, ROOT)
+
+_ids = itertools.count(1)
+
+
+def unique(prefix):
+    return f'{prefix}{next(_ids)}'
+
+
+def png_bytes(color='red', size=(64, 64)):
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new('RGB', size, color).save(buf, 'PNG')
+    return buf.getvalue()
+
+
+def fetch_one(sql, params=()):
+    from database import get_db
+    with get_db() as db:
+        with db.cursor() as cursor:
+            cursor.execute(sql, params)
+            return cursor.fetchone()
+
+
+@pytest.fixture(scope='session')
+def app():
+    import app as app_module
+    import storage_backends
+    app_module.app.config['TESTING'] = True
+    # Keep test uploads out of static/uploads
+    storage_backends._storage = storage_backends.LocalStorage(os.path.join(WORKDIR, 'uploads'))
+    return app_module.app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin(app):
+    """A test client logged in as a fresh admin"""
+    from database import get_db, hash_password
+    username = unique('admin')
+    with get_db() as db:
+        with db.cursor() as cursor:
+            cursor.execute('INSERT INTO admins (username, password) VALUES (%s, %s)',
+                           (username, hash_password('admin-pass1')))
+            db.commit()
+    client = app.test_client()
+    response = client.post('/admin/login', data={'username': username, 'password': 'admin-pass1'})
+    assert response.status_code == 302
+    assert response.location.endswith('/admin/dashboard')
+    return client
+
+
+@pytest.fixture
+def make_voter(app):
+    """Create a verified voter in Guntur; returns (client logged in as them, email)"""
+    from database import get_db, hash_password, constituency_id
+
+    def make_voter(password='voter-pass1'):
+        email = f"{unique('voter')}@example.com"
+        with get_db() as db:
+            with db.cursor() as cursor:
+                cursor.execute('''
+                    INSERT INTO voters (name, email, password, constituency_id, is_verified)
+                    VALUES (%s, %s, %s, %s, TRUE)
+                ''', ('Test Voter', email, hash_password(password), constituency_id('Guntur')))
+                db.commit()
+        client = app.test_client()
+        response = client.post('/voter/login', data={'email': email, 'password': password})
+        assert response.status_code == 302
+        assert response.location.endswith('/voter/dashboard')
+        return client, email
+
+    return make_voter
+
+
+@pytest.fixture
+def election(admin):
+    """An active Guntur election with two candidates: {'id': ..., 'candidates': [...]}"""
+    title = unique('Election ')
+    now = datetime.now()
+    response = admin.post('/admin/elections/create', data={
+        'title': title,
+        'constituency': 'Guntur',
+        'start_time': (now - timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'),
+        'end_time': (now + timedelta(hours=1)).strftime('%Y-%m-%dT%H:%M'),
+    })
+    assert response.status_code == 302
+    election_id = fetch_one('SELECT id FROM elections WHERE title = %s', (title,))['id']
+
+    candidates = []
+    for _ in range(2):
+        name = unique('Candidate ')
+        response = admin.post('/admin/candidates/add', data={
+            'name': name, 'party': 'Test Party', 'constituency': 'Guntur',
+        })
+        assert response.status_code == 302
+        candidates.append(fetch_one('SELECT id FROM candidates WHERE name = %s', (name,))['id'])
+    return {'id': election_id, 'candidates': candidates}
@@ -0,0 +1,36 @@
+"""Content-coding negotiation shared by assets, cached pages and compressed responses"""
+import pytest
+
+from assets import choose_encoding
+
+BOTH = ('br', 'gzip', 'identity')
+
+
+@pytest.mark.parametrize('accept_encoding, expected', [
+    ('gzip, deflate, br', 'br'),
+    ('gzip', 'gzip'),
+    ('', 'identity'),
+    ('br;q=0, gzip', 'gzip'),
+    ('gzip;q=0, br;q=0', 'identity'),
+    ('br;q=0.5, gzip;q=0.9', 'gzip'),
+    ('br;q=0.9, gzip;q=0.9', 'br'),
+    ('*', 'br'),
+    ('*;q=0.5, br;q=0', 'gzip'),
+    ('BR', 'br'),
+])
+def test_choose_encoding(accept_encoding, expected):
+    assert choose_encoding(BOTH, accept_encoding) == expected
+
+
+def test_choose_encoding_only_offers_what_is_available():
+    assert choose_encoding(('gzip', 'identity'), 'br') == 'identity'
+
+
+def test_asset_served_with_the_negotiated_encoding(client):
+    from assets import asset_url, asset_manifest
+    with client.application.test_request_context():
+        path = next(path for path, asset in asset_manifest().items() if 'gzip' in asset.bodies)
+        url = asset_url(path)
+    response = client.get(url, headers={'Accept-Encoding': 'br;q=0, gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
@@ -0,0 +1,78 @@
+"""Background jobs, run inline: purging deleted records and voter roll imports"""
+import io
+
+import purge
+import voter_import
+from conftest import fetch_one, unique
+
+
+def test_purge_removes_a_deleted_candidate_and_its_votes(admin, make_voter, election):
+    candidate_id = election['candidates'][0]
+    voter, _ = make_voter()
+    voter.post(f"/api/v1/elections/{election['id']}/votes", json={'candidate_id': candidate_id})
+
+    assert admin.post(f'/admin/candidates/{candidate_id}/delete').status_code == 302
+    job = fetch_one('SELECT finished_at FROM purge_jobs WHERE kind = %s AND target_id = %s',
+                    (purge.CANDIDATE, candidate_id))
+    assert job['finished_at'] is None
+
+    purge.run_purge_jobs()
+
+    assert fetch_one('SELECT id FROM candidates WHERE id = %s', (candidate_id,)) is None
+    assert fetch_one('SELECT COUNT(*) AS n FROM votes WHERE candidate_id = %s', (candidate_id,))['n'] == 0
+    job = fetch_one('SELECT finished_at, rows_deleted FROM purge_jobs WHERE kind = %s AND target_id = %s',
+                    (purge.CANDIDATE, candidate_id))
+    assert job['finished_at'] is not None
+    assert job['rows_deleted'] == 1
+
+
+def test_purge_removes_a_deleted_election(admin, election):
+    assert admin.post(f"/admin/elections/{election['id']}/delete").status_code == 302
+    purge.run_purge_jobs()
+    assert fetch_one('SELECT id FROM elections WHERE id = %s', (election['id'],)) is None
+
+
+def test_voter_roll_import(admin, make_voter):
+    _, existing = make_voter()
+    new = [f"{unique('imported')}@example.com" for _ in range(2)]
+    roll = (
+        'name,email,constituency,password\n'
+        f'First,{new[0]},Guntur,import-pass1\n'
+        f'Again,{new[0]},Guntur,import-pass1\n'
+        f'Second,{new[1]},Guntur,import-pass1\n'
+        f'Known,{existing},Guntur,import-pass1\n'
+        'Lost,lost@example.com,Atlantis,import-pass1\n'
+    )
+
+    response = admin.post('/admin/voters/import', data={
+        'roll': (io.BytesIO(roll.encode()), 'roll.csv'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+    job = fetch_one('SELECT id, status FROM voter_imports ORDER BY id DESC LIMIT 1')
+    assert job['status'] == 'queued'
+
+    voter_import.run_import_jobs()
+
+    job = fetch_one('SELECT status, report FROM voter_imports WHERE id = %s', (job['id'],))
+    assert job['status'] == 'finished'
+    report = voter_import.recent_imports(1)[0]['report']
+    assert (report['rows'], report['inserted'], report['duplicates'], report['existing'], report['invalid']) \
+        == (5, 2, 1, 1, 1)
+    assert fetch_one('SELECT is_verified FROM voters WHERE email = %s', (new[1],))['is_verified']
+    assert b'Finished' in admin.get('/admin/voters/import').data
+
+    # The imported password works
+    client = admin.application.test_client()
+    response = client.post('/voter/login', data={'email': new[0], 'password': 'import-pass1'})
+    assert response.location.endswith('/voter/dashboard')
+
+
+def test_undecodable_roll_fails_the_job(admin):
+    response = admin.post('/admin/voters/import', data={
+        'roll': (io.BytesIO(b'\xff\xfe\x00not utf-8'), 'roll.csv'),
+    }, content_type='multipart/form-data')
+    assert response.status_code == 302
+    voter_import.run_import_jobs()
+    job = voter_import.recent_imports(1)[0]
+    assert job['status'] == 'failed'
+    assert 'UTF-8' in job['last_error']
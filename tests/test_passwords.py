@@ -0,0 +1,38 @@
+"""Password hashing and the rehash-on-login policy"""
+import bcrypt
+
+import passwords
+
+
+def bcrypt_hash(rounds):
+    return bcrypt.hashpw(b'secret-pass1', bcrypt.gensalt(rounds)).decode('ascii')
+
+
+def test_hash_and_verify():
+    stored = passwords.hash_password('secret-pass1')
+    assert passwords.verify_password('secret-pass1', stored)
+    assert not passwords.verify_password('wrong', stored)
+
+
+def test_legacy_hashes_verify_and_need_a_rehash():
+    legacy = passwords._legacy_hash('secret-pass1')
+    assert passwords.verify_password('secret-pass1', legacy)
+    assert passwords.needs_rehash(legacy)
+
+
+def test_rehash_only_below_the_configured_floor(monkeypatch):
+    monkeypatch.setattr(passwords, 'BCRYPT_MIN_ROUNDS', 5)
+    monkeypatch.delenv('BCRYPT_ROUNDS')
+    # Another host may have calibrated higher; that hash is left alone
+    monkeypatch.setattr(passwords, '_rounds', 4)
+    assert passwords.needs_rehash(bcrypt_hash(4))
+    assert not passwords.needs_rehash(bcrypt_hash(5))
+    assert not passwords.needs_rehash(bcrypt_hash(6))
+
+
+def test_configured_rounds_never_go_below_the_floor(monkeypatch):
+    monkeypatch.setattr(passwords, 'BCRYPT_MIN_ROUNDS', 10)
+    monkeypatch.setenv('BCRYPT_ROUNDS', '8')
+    assert passwords.configured_rounds() == 10
+    monkeypatch.setenv('BCRYPT_ROUNDS', '12')
+    assert passwords.configured_rounds() == 12
@@ -0,0 +1,82 @@
+"""Voter registration with an emailed one-time code, then login"""
+import pytest
+
+import voter_routes
+from conftest import fetch_one, unique
+
+
+@pytest.fixture
+def outbox(monkeypatch):
+    """Codes that would have been emailed, by address"""
+    sent = {}
+
+    def send_otp_email(email, otp):
+        sent[email] = otp
+        return True
+
+    monkeypatch.setattr(voter_routes, 'send_otp_email', send_otp_email)
+    return sent
+
+
+def register(client, email, password='voter-pass1'):
+    return client.post('/voter/register', data={
+        'name': 'New Voter', 'email': email, 'constituency': 'Guntur', 'password': password,
+    })
+
+
+def test_register_verify_and_login(client, outbox):
+    email = f"{unique('new')}@example.com"
+
+    response = register(client, email)
+    assert response.status_code == 302
+    assert response.location.endswith('/voter/verify-email')
+    assert email in outbox
+    # Nothing is created until the code is confirmed
+    assert fetch_one('SELECT id FROM voters WHERE email = %s', (email,)) is None
+
+    response = client.post('/voter/verify-email', data={'otp': outbox[email]})
+    assert response.status_code == 302
+    assert response.location.endswith('/voter/login')
+    assert fetch_one('SELECT is_verified FROM voters WHERE email = %s', (email,))['is_verified']
+
+    response = client.post('/voter/login', data={'email': email, 'password': 'voter-pass1'})
+    assert response.status_code == 302
+    assert response.location.endswith('/voter/dashboard')
+    assert client.get('/voter/dashboard').status_code == 200
+
+
+def test_wrong_code_is_rejected(client, outbox):
+    email = f"{unique('new')}@example.com"
+    register(client, email)
+    wrong = '000000' if outbox[email] != '000000' else '111111'
+
+    response = client.post('/voter/verify-email', data={'otp': wrong})
+    assert response.status_code == 302
+    assert response.location.endswith('/voter/verify-email')
+    assert fetch_one('SELECT id FROM voters WHERE email = %s', (email,)) is None
+
+
+def test_registered_email_cannot_register_again(client, outbox, make_voter):
+    _, email = make_voter()
+    response = register(client, email)
+    assert response.status_code == 200
+    assert b'Email already registered' in response.data
+    assert email not in outbox
+
+
+def test_login_rejects_wrong_password(client, make_voter):
+    _, email = make_voter()
+    response = client.post('/voter/login', data={'email': email, 'password': 'not-it'})
+    assert response.status_code == 200
+    assert b'Invalid credentials' in response.data
+
+
+def test_profile_shows_the_voter_without_caching_the_hash(make_voter):
+    voter, email = make_voter()
+    response = voter.get('/voter/profile')
+    assert response.status_code == 200
+    assert email.encode() in response.data
+    voter_id = fetch_one('SELECT id FROM voters WHERE email = %s', (email,))['id']
+    cached = voter_routes.voter_cache.get(voter_id)
+    assert cached['email'] == email
+    assert 'password' not in cached
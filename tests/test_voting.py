@@ -0,0 +1,93 @@
+"""Casting votes through the ballot form and the JSON API, and cached results"""
+import voting
+from conftest import fetch_one
+
+
+def vote_count(election_id):
+    return fetch_one('SELECT COUNT(*) AS n FROM votes WHERE election_id = %s', (election_id,))['n']
+
+
+def test_vote_through_the_ballot_form(make_voter, election):
+    voter, _ = make_voter()
+    election_id = election['id']
+
+    assert voter.get(f'/voter/vote/{election_id}').status_code == 200
+    response = voter.post(f'/voter/submit-vote/{election_id}',
+                          data={'candidate_id': election['candidates'][0]})
+    assert response.status_code == 302
+    assert response.location.endswith('/voter/dashboard')
+    assert b'Receipt code' in voter.get('/voter/dashboard').data
+    assert vote_count(election_id) == 1
+
+    # A second ballot is turned away and not counted
+    response = voter.post(f'/voter/submit-vote/{election_id}',
+                          data={'candidate_id': election['candidates'][1]})
+    assert response.status_code == 302
+    assert vote_count(election_id) == 1
+
+
+def test_vote_through_the_api(make_voter, election):
+    voter, _ = make_voter()
+    url = f"/api/v1/elections/{election['id']}/votes"
+
+    response = voter.post(url, json={'candidate_id': election['candidates'][1]})
+    assert response.status_code == 201
+    body = response.get_json()
+    assert body['success'] and body['outcome'] == voting.CAST
+    assert body['receipt_code']
+
+    receipt = voter.get(f"/api/v1/receipts/{body['receipt']}").get_json()
+    assert receipt['valid'] and receipt['election_id'] == election['id']
+
+
+def test_double_vote_is_already_voted(make_voter, election):
+    voter, _ = make_voter()
+    url = f"/api/v1/elections/{election['id']}/votes"
+
+    assert voter.post(url, json={'candidate_id': election['candidates'][0]}).status_code == 201
+    response = voter.post(url, json={'candidate_id': election['candidates'][1]})
+    assert response.status_code == 409
+    assert response.get_json()['outcome'] == voting.ALREADY_VOTED
+    assert vote_count(election['id']) == 1
+
+
+def test_vote_requires_a_candidate(make_voter, election):
+    voter, _ = make_voter()
+    response = voter.post(f"/api/v1/elections/{election['id']}/votes", json={})
+    assert response.status_code == 400
+
+
+def test_results_etag_and_304(admin, make_voter, election):
+    url = f"/api/v1/elections/{election['id']}/results"
+    admin.get('/admin/dashboard')  # shows (and clears) the flash messages, which skip the ETag
+
+    first = admin.get(url)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert etag.startswith('W/')
+
+    unchanged = admin.get(url, headers={'If-None-Match': etag})
+    assert unchanged.status_code == 304
+    assert unchanged.data == b''
+    assert unchanged.headers['ETag'] == etag
+
+    # A new vote changes the tally and so the ETag
+    voter, _ = make_voter()
+    voter.post(f"/api/v1/elections/{election['id']}/votes", json={'candidate_id': election['candidates'][0]})
+    changed = admin.get(url, headers={'If-None-Match': etag})
+    assert changed.status_code == 200
+    assert changed.headers['ETag'] != etag
+    assert changed.get_json()['total_votes'] == 1
+
+
+def test_vote_rejects_form_posts_and_non_object_json(make_voter, election):
+    voter, _ = make_voter()
+    url = f"/api/v1/elections/{election['id']}/votes"
+    candidate_id = election['candidates'][0]
+
+    assert voter.post(url, data={'candidate_id': candidate_id}).status_code == 415
+    for body in (f'[{candidate_id}]', str(candidate_id), '"x"', 'null', '{not json'):
+        response = voter.post(url, data=body, content_type='application/json')
+        assert response.status_code == 400
+        assert response.get_json()['error']
+    assert vote_count(election['id']) == 0
@@ -0,0 +1,176 @@
+"""Garbage collection for stored uploads.
+
+Files that no candidate references (failed inline deletes, uploads whose
+candidate insert never committed, the old candidate_photo_* / party_symbol_*
+files) are first moved under .quarantine/ and only deleted once they have
+sat there for QUARANTINE_DAYS. A quarantined file that becomes referenced
+again is moved back and its variants rebuilt. Resized variants of orphans
+are deleted straight away since they can always be regenerated.
+
+The referenced set is a snapshot, so before a file is moved or deleted its
+`uploads` row is locked and its references counted again in that same
+transaction. acquire_upload() takes the same row lock, so a new reference
+either lands first (and the file stays) or waits for the move to finish
+and then restores the file from quarantine.
+
+Works against whichever storage backend is configured (see storage_backends.py).
+
+Usage:
+    python upload_gc.py            # collect and print a report
+    python upload_gc.py --dry-run  # only report what would happen
+"""
+import argparse
+import os
+import time
+
+from database import get_db
+from images import VARIANT_WIDTHS, FORMATS, variant_name, upload_kind, schedule_variants
+from storage_backends import get_storage
+
+QUARANTINE_PREFIX = '.quarantine/'
+# Uploads are written before their candidate row commits; leave recent files alone
+GRACE_SECONDS = int(os.getenv('UPLOAD_GC_GRACE_SECONDS', 3600))
+QUARANTINE_DAYS = float(os.getenv('UPLOAD_GC_QUARANTINE_DAYS', 7))
+GC_INTERVAL = int(os.getenv('UPLOAD_GC_INTERVAL', 24 * 3600))
+
+
+def referenced_uploads():
+    """Every filename a candidate points at, read through a server-side cursor"""
+    referenced = set()
+    with get_db() as db:
+        with db.cursor(name='upload_gc_refs') as cursor:
+            cursor.itersize = 5000
+            cursor.execute('SELECT photo_path, symbol_path FROM candidates')
+            for row in cursor:
+                if row['photo_path']:
+                    referenced.add(row['photo_path'])
+                if row['symbol_path']:
+                    referenced.add(row['symbol_path'])
+    return referenced
+
+
+def _lock_unreferenced(cursor, filename, size):
+    """Lock filename's uploads row (creating it with no references) and return
+    True if nothing references the file. Hold the lock while moving the file."""
+    cursor.execute('''
+        INSERT INTO uploads (filename, size, refcount) VALUES (%s, %s, 0)
+        ON CONFLICT (filename) DO UPDATE SET refcount = uploads.refcount
+        RETURNING refcount
+    ''', (filename, size))
+    if cursor.fetchone()['refcount'] > 0:
+        return False
+    cursor.execute('SELECT 1 FROM candidates WHERE photo_path = %s OR symbol_path = %s LIMIT 1',
+                   (filename, filename))
+    return cursor.fetchone() is None
+
+
+def _collect_file(filename, size, action):
+    """Run action() if filename is still unreferenced, under its row lock. Returns whether it ran."""
+    with get_db() as db:
+        with db.cursor() as cursor:
+            if not _lock_unreferenced(cursor, filename, size):
+                db.rollback()
+                return False
+            action()
+            cursor.execute('DELETE FROM uploads WHERE filename = %s AND refcount <= 0', (filename,))
+            db.commit()
+    return True
+
+
+def restore_upload(filename):
+    """Move a quarantined file back now that it is referenced again. Returns True if it was there."""
+    storage = get_storage()
+    if not storage.exists(QUARANTINE_PREFIX + filename):
+        return False
+    _move(storage, QUARANTINE_PREFIX + filename, filename)
+    schedule_variants(filename, upload_kind(filename))
+    return True
+
+
+def _variant_names(filename):
+    return {variant_name(filename, width, ext) for width in VARIANT_WIDTHS for ext in FORMATS}
+
+
+def collect(dry_run=False, now=None):
+    now = time.time() if now is None else now
+    storage = get_storage()
+    referenced = referenced_uploads()
+    report = {'quarantined': 0, 'restored': 0, 'deleted': 0,
+              'variants_deleted': 0, 'bytes_reclaimed': 0, 'bytes_quarantined': 0}
+
+    # 1. Originals nobody references go to quarantine
+    for obj in storage.list():
+        if obj.key in referenced or now - obj.mtime < GRACE_SECONDS:
+            continue
+
+        if obj.key.startswith('.upload-'):
+            # Abandoned temp file from an interrupted upload
+            report['deleted'] += 1
+            report['bytes_reclaimed'] += obj.size
+            if not dry_run:
+                storage.delete(obj.key)
+            continue
+
+        if not dry_run and not _collect_file(
+                obj.key, obj.size, lambda: _move(storage, obj.key, QUARANTINE_PREFIX + obj.key)):
+            continue  # referenced since the snapshot
+        report['quarantined'] += 1
+        report['bytes_quarantined'] += obj.size
+
+    # 2. Quarantined files are restored if referenced again, else expire
+    for obj in storage.list(QUARANTINE_PREFIX):
+        name = obj.key[len(QUARANTINE_PREFIX):]
+        if name in referenced:
+            report['restored'] += 1
+            if not dry_run:
+                _move(storage, obj.key, name)
+                schedule_variants(name, upload_kind(name))
+        elif now - obj.mtime >= QUARANTINE_DAYS * 86400:
+            if not dry_run and not _collect_file(name, obj.size, lambda: storage.delete(obj.key)):
+                continue  # referenced since the snapshot; acquire_upload() restores it
+            report['deleted'] += 1
+            report['bytes_reclaimed'] += obj.size
+
+    # 3. Variants whose original is gone or quarantined
+    live = set()
+    for filename in referenced:
+        live |= _variant_names(filename)
+    for obj in storage.list('variants/'):
+        if obj.key[len('variants/'):] in live or now - obj.mtime < GRACE_SECONDS:
+            continue
+        report['variants_deleted'] += 1
+        report['bytes_reclaimed'] += obj.size
+        if not dry_run:
+            storage.delete(obj.key)
+
+    return report
+
+
+def _move(storage, source, target):
+    try:
+        storage.move(source, target)
+    except FileNotFoundError:
+        pass  # another worker got there first
+
+
+def run_gc():
+    """Background task entry point"""
+    report = collect()
+    if any(report.values()):
+        print(f"🧹 Upload GC: {format_report(report)}")
+    return report
+
+
+def format_report(report):
+    return (f"{report['quarantined']} quarantined ({report['bytes_quarantined'] / 1024:.0f} KB), "
+            f"{report['restored']} restored, {report['deleted']} deleted, "
+            f"{report['variants_deleted']} variants deleted, "
+            f"{report['bytes_reclaimed'] / 1024:.0f} KB reclaimed")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Collect unreferenced uploads")
+    parser.add_argument('--dry-run', action='store_true', help="report without moving or deleting")
+    args = parser.parse_args()
+    result = collect(dry_run=args.dry_run)
+    print(("Would have: " if args.dry_run else "") + format_report(result))
@@ -0,0 +1,111 @@
+"""Multipart uploads with per-field size caps and content sniffing.
+
+File parts are written in chunks to a temporary file (spooled in memory only
+up to SPOOL_SIZE) as Werkzeug parses the body; the stream counts the bytes
+and keeps the first few. The request body as a whole is capped by
+MAX_CONTENT_LENGTH (raised per request for the voter roll), so an oversized
+upload is cut off while it streams. Once the body is parsed each file field
+is checked against its own size cap and, for images, a list of allowed types
+matched against the magic bytes at the start of the part: exceeding a cap
+raises 413 and a wrong type raises 415 before any view sees the files.
+
+Only Werkzeug's public hooks are used: the parser's stream_factory and
+FormDataParser.parse().
+
+The detected type is kept on the stream (`file.stream.detected_type`) so the
+stored extension comes from the content rather than the client's filename.
+"""
+import os
+import tempfile
+
+from flask import Request
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.formparser import FormDataParser
+
+MB = 1024 * 1024
+SPOOL_SIZE = 64 * 1024
+SNIFF_BYTES = 16
+
+MAX_IMAGE_BYTES = int(float(os.getenv('UPLOAD_MAX_IMAGE_MB', 2)) * MB)
+MAX_ROLL_BYTES = int(float(os.getenv('UPLOAD_MAX_ROLL_MB', 50)) * MB)
+# Whole-request cap for everything except the voter roll import (photo + symbol + fields)
+MAX_REQUEST_BYTES = 2 * MAX_IMAGE_BYTES + MB
+
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'png'),
+    (b'\xff\xd8\xff', 'jpg'),
+    (b'GIF87a', 'gif'),
+    (b'GIF89a', 'gif'),
+)
+IMAGE_TYPES = ('png', 'jpg', 'gif')
+
+# field name -> (max bytes, allowed types or None for any)
+FIELD_RULES = {
+    'photo': (MAX_IMAGE_BYTES, IMAGE_TYPES),
+    'symbol': (MAX_IMAGE_BYTES, IMAGE_TYPES),
+    'roll': (MAX_ROLL_BYTES, None),
+}
+# Any other file field
+DEFAULT_RULE = (MAX_IMAGE_BYTES, None)
+
+
+def sniff(head):
+    for signature, kind in IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return kind
+    return None
+
+
+class UploadStream(tempfile.SpooledTemporaryFile):
+    """Temporary file for one file part that counts its bytes and keeps the first few"""
+
+    def __init__(self):
+        super().__init__(max_size=SPOOL_SIZE, mode='w+b')
+        self.written = 0
+        self.head = b''
+        self.detected_type = None
+
+    def write(self, data):
+        self.written += len(data)
+        if len(self.head) < SNIFF_BYTES:
+            self.head += data[:SNIFF_BYTES - len(self.head)]
+        return super().write(data)
+
+
+def upload_stream_factory(total_content_length, content_type, filename, content_length=None):
+    """stream_factory for FormDataParser: every file part goes to an UploadStream"""
+    return UploadStream()
+
+
+def check_upload(field, stream):
+    """Apply field's size cap and allowed types to a parsed file part"""
+    max_bytes, allowed_types = FIELD_RULES.get(field, DEFAULT_RULE)
+    if stream.written > max_bytes:
+        raise RequestEntityTooLarge(
+            f"The {field} file is larger than {max_bytes // MB} MB.")
+    stream.detected_type = sniff(stream.head)
+    if allowed_types is not None and stream.written and stream.detected_type not in allowed_types:
+        raise UnsupportedMediaType(
+            f"The {field} file must be a {', '.join(t.upper() for t in allowed_types)} image.")
+
+
+class GuardedFormDataParser(FormDataParser):
+    def parse(self, stream, mimetype, content_length, options=None):
+        stream, form, files = super().parse(stream, mimetype, content_length, options)
+        for field, file in files.items(multi=True):
+            check_upload(field, file.stream)
+        return stream, form, files
+
+
+class UploadRequest(Request):
+    form_data_parser_class = GuardedFormDataParser
+
+    def make_form_data_parser(self):
+        parser = super().make_form_data_parser()
+        parser.stream_factory = upload_stream_factory
+        return parser
+
+
+def init_uploads(app):
+    app.request_class = UploadRequest
+    app.config['MAX_CONTENT_LENGTH'] = MAX_REQUEST_BYTES
@@ -0,0 +1,446 @@
+"""Bulk import of an electoral roll into `voters`.
+
+The roll is a CSV (with a header row) or NDJSON file with the fields
+name, email, constituency and either password (plain text, hashed here)
+or password_hash (an existing bcrypt hash). Imported voters are marked as
+verified.
+
+Rows are read and validated in fixed-size batches, passwords are hashed in
+a process pool, and each batch is streamed with COPY into a temporary
+staging table and committed. A final set-based merge skips emails that are
+duplicated in the file or already registered. Memory use is bounded by the
+batch size regardless of the roll's length. On the SQLite backend batches
+are inserted with executemany() instead of COPY.
+
+Rolls uploaded on the admin page are not imported inside the request: they
+are spooled to IMPORT_SPOOL_DIR and queued in `voter_imports`, and the
+run_import_jobs() background task imports them and stores each report.
+The spool is local to the instance that took the upload, so a job is only
+claimed by workers on that host. Rolls carry plain-text passwords, which is
+why they are not put in the upload storage (it is served publicly).
+
+Usage:
+    python voter_import.py roll.csv
+    python voter_import.py roll.ndjson --format ndjson --workers 8
+"""
+import argparse
+import csv
+import io
+import json
+import multiprocessing
+import os
+import re
+import secrets
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import psycopg2
+
+from database import get_db, connect, constituency_id, backend, SQLITE
+from passwords import get_rounds, hash_password_direct
+
+BATCH_SIZE = int(os.getenv('IMPORT_BATCH_SIZE', 5000))
+# Uploaded rolls wait here for the background task; every worker on this host must see it
+IMPORT_SPOOL_DIR = os.getenv('IMPORT_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'evoting-imports'))
+IMPORT_INTERVAL = int(os.getenv('IMPORT_INTERVAL', 5))
+IMPORT_WORKERS = int(os.getenv('IMPORT_WORKERS', 0)) or None  # hashing processes; default CPU count
+# A running job with no heartbeat for this long lost its worker (restart, crash) and is run again
+IMPORT_STALE_AFTER = timedelta(minutes=int(os.getenv('IMPORT_STALE_MINUTES', 60)))
+HASH_CHUNK_SIZE = 250
+MAX_REPORTED_ERRORS = 1000
+EMAIL_RE = re.compile(r'^[^\s@]+@[^\s@]+\.[^\s@]+$')
+
+
+# ----------------------------------------------------------------------
+# READING + VALIDATION
+# ----------------------------------------------------------------------
+def iter_records(stream, fmt):
+    """Yield (line_no, dict) from a text stream"""
+    if fmt == 'ndjson':
+        for line_no, line in enumerate(stream, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as e:
+                yield line_no, ValueError(f"invalid JSON: {e}")
+                continue
+            yield line_no, record if isinstance(record, dict) else ValueError("expected a JSON object")
+    else:
+        reader = csv.DictReader(stream)
+        for record in reader:
+            yield reader.line_num, record
+
+
+def _text(record, field):
+    """record[field] as a string ('' if missing); NDJSON values may be numbers, lists..."""
+    value = record.get(field)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise ValueError(f"{field} must be a string")
+    return value
+
+
+def validate(record):
+    """Return a normalised (name, email, password, password_hash, constituency_id) tuple"""
+    if isinstance(record, Exception):
+        raise record
+
+    name = _text(record, 'name').strip()
+    email = _text(record, 'email').strip().lower()
+    constituency = _text(record, 'constituency').strip()
+    password = _text(record, 'password')
+    password_hash = _text(record, 'password_hash').strip()
+
+    if not name:
+        raise ValueError("missing name")
+    if not EMAIL_RE.match(email):
+        raise ValueError(f"invalid email {email!r}")
+    cid = constituency_id(constituency)
+    if cid is None:
+        raise ValueError(f"unknown constituency {constituency!r}")
+    if password_hash:
+        if not password_hash.startswith('$2'):
+            raise ValueError("password_hash must be a bcrypt hash")
+    elif len(password) < 6:
+        raise ValueError("password must be at least 6 characters")
+
+    return name, email, password, password_hash, cid
+
+
+def _hash_chunk(passwords, rounds):
+    """Runs in a worker process"""
+    return [hash_password_direct(password, rounds) for password in passwords]
+
+
+def hash_batch(pool, rows, rounds):
+    """Fill in password hashes for rows that only have a plain-text password"""
+    pending = [i for i, row in enumerate(rows) if not row[4]]
+    chunks = [pending[i:i + HASH_CHUNK_SIZE] for i in range(0, len(pending), HASH_CHUNK_SIZE)]
+    results = pool.map(_hash_chunk, [[rows[i][3] for i in chunk] for chunk in chunks],
+                       [rounds] * len(chunks))
+    for chunk, hashes in zip(chunks, results):
+        for i, hashed in zip(chunk, hashes):
+            line_no, name, email, _, _, cid = rows[i]
+            rows[i] = (line_no, name, email, None, hashed, cid)
+
+
+# ----------------------------------------------------------------------
+# IMPORT
+# ----------------------------------------------------------------------
+def _copy_batch(cursor, rows):
+    if backend() == SQLITE:
+        cursor.executemany(
+            'INSERT INTO voter_import_staging (line_no, name, email, password, constituency_id) '
+            'VALUES (%s, %s, %s, %s, %s)',
+            [(line_no, name, email, password_hash, cid)
+             for line_no, name, email, _, password_hash, cid in rows]
+        )
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for line_no, name, email, _, password_hash, cid in rows:
+        writer.writerow((line_no, name, email, password_hash, cid))
+    buffer.seek(0)
+    cursor.copy_expert(
+        'COPY voter_import_staging (line_no, name, email, password, constituency_id) '
+        'FROM STDIN WITH (FORMAT csv)',
+        buffer
+    )
+
+
+def import_voters(stream, fmt='csv', workers=None, progress=None, pool=None):
+    """Import a roll from a text stream. Returns a report dict.
+
+    Passwords are hashed in `pool` if given, otherwise in a new pool of
+    `workers` processes.
+    """
+    started = time.monotonic()
+    rounds = get_rounds()
+    report = {'rows': 0, 'inserted': 0, 'duplicates': 0, 'existing': 0,
+              'invalid': 0, 'errors': [], 'seconds': 0.0}
+
+    def record_error(line_no, message):
+        report['invalid'] += 1
+        if len(report['errors']) < MAX_REPORTED_ERRORS:
+            report['errors'].append((line_no, message))
+
+    own_pool = pool is None
+    if own_pool:
+        pool = ProcessPoolExecutor(max_workers=workers)
+    # A dedicated connection: the staging table lives as long as it does, so
+    # every batch can commit on its own instead of one transaction holding
+    # the whole roll
+    conn = connect()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute('''
+                CREATE TEMP TABLE voter_import_staging (
+                    line_no INTEGER NOT NULL,
+                    name TEXT NOT NULL,
+                    email TEXT NOT NULL,
+                    password TEXT NOT NULL,
+                    constituency_id INTEGER NOT NULL
+                )
+            ''')
+            conn.commit()
+
+            batch = []
+            for line_no, record in iter_records(stream, fmt):
+                report['rows'] += 1
+                try:
+                    batch.append((line_no,) + validate(record))
+                except ValueError as e:
+                    record_error(line_no, str(e))
+                    continue
+
+                if len(batch) >= BATCH_SIZE:
+                    hash_batch(pool, batch, rounds)
+                    _copy_batch(cursor, batch)
+                    conn.commit()
+                    batch = []
+                    if progress:
+                        progress(report)
+
+            if batch:
+                hash_batch(pool, batch, rounds)
+                _copy_batch(cursor, batch)
+                conn.commit()
+                if progress:
+                    progress(report)
+
+            cursor.execute('CREATE INDEX voter_import_staging_email ON voter_import_staging (email, line_no)')
+            cursor.execute('ANALYZE voter_import_staging')
+            conn.commit()
+
+            # Later rows that repeat an email earlier in the file
+            cursor.execute('''
+                SELECT line_no, email FROM (
+                    SELECT line_no, email,
+                           ROW_NUMBER() OVER (PARTITION BY email ORDER BY line_no) AS n
+                    FROM voter_import_staging
+                ) ranked
+                WHERE n > 1
+                ORDER BY line_no
+            ''')
+            for row in cursor:
+                report['duplicates'] += 1
+                if len(report['errors']) < MAX_REPORTED_ERRORS:
+                    report['errors'].append((row['line_no'], f"duplicate email {row['email']} in file"))
+
+            # Emails that already belong to a voter
+            cursor.execute('''
+                SELECT s.line_no, s.email
+                FROM voter_import_staging s
+                JOIN voters v ON lower(v.email) = s.email
+                ORDER BY s.line_no
+            ''')
+            for row in cursor:
+                report['existing'] += 1
+                if len(report['errors']) < MAX_REPORTED_ERRORS:
+                    report['errors'].append((row['line_no'], f"{row['email']} is already registered"))
+
+            # Set-based merge: first occurrence of each new email wins
+            if backend() == SQLITE:
+                cursor.execute('''
+                    INSERT INTO voters (name, email, password, constituency_id, is_verified)
+                    SELECT s.name, s.email, s.password, s.constituency_id, TRUE
+                    FROM voter_import_staging s
+                    WHERE s.line_no = (SELECT MIN(f.line_no) FROM voter_import_staging f WHERE f.email = s.email)
+                      AND NOT EXISTS (SELECT 1 FROM voters v WHERE lower(v.email) = s.email)
+                    ON CONFLICT (email) DO NOTHING
+                ''')
+            else:
+                cursor.execute('''
+                    INSERT INTO voters (name, email, password, constituency_id, is_verified)
+                    SELECT DISTINCT ON (s.email) s.name, s.email, s.password, s.constituency_id, TRUE
+                    FROM voter_import_staging s
+                    WHERE NOT EXISTS (SELECT 1 FROM voters v WHERE lower(v.email) = s.email)
+                    ORDER BY s.email, s.line_no
+                    ON CONFLICT (email) DO NOTHING
+                ''')
+            report['inserted'] = cursor.rowcount
+            conn.commit()
+    finally:
+        conn.close()  # drops the staging table
+        if own_pool:
+            pool.shutdown()
+
+    report['errors'].sort()
+    report['seconds'] = time.monotonic() - started
+    return report
+
+
+# ----------------------------------------------------------------------
+# BACKGROUND JOBS
+# ----------------------------------------------------------------------
+def queue_import(cursor, stream, filename, fmt, admin_id):
+    """Spool an uploaded roll (a binary stream) to disk and queue it for
+    run_import_jobs() inside the caller's transaction. Returns the job id."""
+    os.makedirs(IMPORT_SPOOL_DIR, exist_ok=True)
+    fd, spool_path = tempfile.mkstemp(dir=IMPORT_SPOOL_DIR, suffix=f'.{fmt}')
+    try:
+        with os.fdopen(fd, 'wb') as spool:
+            shutil.copyfileobj(stream, spool)
+        cursor.execute('''
+            INSERT INTO voter_imports (filename, format, spool_path, spool_host, admin_id)
+            VALUES (%s, %s, %s, %s, %s) RETURNING id
+        ''', (filename, fmt, spool_path, socket.gethostname(), admin_id))
+        return cursor.fetchone()['id']
+    except Exception:
+        os.remove(spool_path)
+        raise
+
+
+def recent_imports(limit=10):
+    """The latest import jobs, newest first, with their reports decoded"""
+    with get_db() as db:
+        with db.cursor() as cursor:
+            cursor.execute('''
+                SELECT id, filename, status, report, last_error, created_at, finished_at
+                FROM voter_imports ORDER BY id DESC LIMIT %s
+            ''', (limit,))
+            jobs = cursor.fetchall()
+    for job in jobs:
+        job['report'] = json.loads(job['report']) if job['report'] else None
+    return jobs
+
+
+class ImportSuperseded(Exception):
+    """The job was reclaimed by another runner while this one was importing it"""
+
+
+def _claim_import():
+    """Mark the oldest queued job spooled on this host (or one whose worker
+    died mid-run) as running under a new runner token and return it"""
+    sqlite = backend() == SQLITE
+    now = datetime.now()
+    with get_db() as db:
+        with db.cursor() as cursor:
+            cursor.execute('''
+                UPDATE voter_imports
+                SET status = 'running', started_at = %s, heartbeat_at = %s, runner = %s
+                WHERE id = (
+                    SELECT id FROM voter_imports
+                    WHERE spool_host = %s
+                      AND (status = 'queued' OR (status = 'running' AND COALESCE(heartbeat_at, started_at) < %s))
+                    ORDER BY id LIMIT 1
+                ''' + ('' if sqlite else 'FOR UPDATE SKIP LOCKED') + '''
+                )
+                RETURNING id, filename, format, spool_path, runner
+            ''', (now, now, secrets.token_hex(16), socket.gethostname(), now - IMPORT_STALE_AFTER))
+            job = cursor.fetchone()
+            db.commit()
+    return job
+
+
+def _heartbeat(job):
+    """Record that `job` is still being imported; raises ImportSuperseded if
+    another runner has taken it over"""
+    with get_db() as db:
+        with db.cursor() as cursor:
+            cursor.execute('''
+                UPDATE voter_imports SET heartbeat_at = %s
+                WHERE id = %s AND runner = %s AND status = 'running'
+            ''', (datetime.now(), job['id'], job['runner']))
+            if cursor.rowcount == 0:
+                raise ImportSuperseded(job['id'])
+            db.commit()
+
+
+def _finish_import(job, status, report=None, error=None):
+    """Store the outcome, unless another runner has taken the job over.
+    Returns whether it was stored."""
+    with get_db() as db:
+        with db.cursor() as cursor:
+            cursor.execute('''
+                UPDATE voter_imports
+                SET status = %s, report = %s, last_error = %s, finished_at = CURRENT_TIMESTAMP
+                WHERE id = %s AND runner = %s
+            ''', (status, json.dumps(report) if report else None, error, job['id'], job['runner']))
+            finished = cursor.rowcount > 0
+            db.commit()
+    return finished
+
+
+def run_import_jobs():
+    """Background task: import every queued roll, one after another"""
+    pool = None
+    try:
+        while (job := _claim_import()) is not None:
+            if pool is None:
+                # Spawned rather than forked: this runs on a thread of a threaded worker
+                pool = ProcessPoolExecutor(max_workers=IMPORT_WORKERS,
+                                           mp_context=multiprocessing.get_context('spawn'))
+            print(f"📥 Importing voter roll {job['filename']} (job {job['id']})")
+            try:
+                # utf-8-sig drops the BOM spreadsheet exports like to add
+                with open(job['spool_path'], encoding='utf-8-sig', newline='') as stream:
+                    report = import_voters(stream, job['format'], pool=pool,
+                                           progress=lambda report: _heartbeat(job))
+            except ImportSuperseded:
+                # The new runner needs the spool file; leave it alone
+                print(f"⚠️ Voter roll import {job['id']} was taken over by another worker")
+                continue
+            except UnicodeDecodeError:
+                finished = _finish_import(job, 'failed', error="The file is not valid UTF-8 text")
+            except (OSError, psycopg2.Error) as e:
+                print(f"❌ Voter roll import {job['id']} failed: {e}")
+                finished = _finish_import(job, 'failed', error=str(e))
+            else:
+                finished = _finish_import(job, 'finished', report)
+                print(f"✅ Imported {report['inserted']} voters from {job['filename']}")
+            if finished:
+                try:
+                    os.remove(job['spool_path'])
+                except OSError:
+                    pass
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def print_report(report):
+    print(f"📥 Rows read: {report['rows']}")
+    print(f"✅ Voters imported: {report['inserted']}")
+    print(f"⚠️ Invalid rows: {report['invalid']}")
+    print(f"⚠️ Duplicate emails in file: {report['duplicates']}")
+    print(f"⚠️ Already registered: {report['existing']}")
+    print(f"⏱️ {report['seconds']:.1f}s")
+    for line_no, message in report['errors']:
+        print(f"   line {line_no}: {message}")
+    if len(report['errors']) >= MAX_REPORTED_ERRORS:
+        print(f"   ... only the first {MAX_REPORTED_ERRORS} problems are listed")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Import an electoral roll into voters")
+    parser.add_argument('path', help="CSV or NDJSON file ('-' for stdin)")
+    parser.add_argument('--format', choices=['csv', 'ndjson'],
+                        help="defaults to the file extension, then csv")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="password hashing processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    fmt = args.format or ('ndjson' if args.path.endswith(('.ndjson', '.jsonl')) else 'csv')
+
+    def progress(report):
+        print(f"... {report['rows']} rows read")
+
+    if args.path == '-':
+        report = import_voters(sys.stdin, fmt, args.workers, progress)
+    else:
+        with open(args.path, newline='', encoding='utf-8') as stream:
+            report = import_voters(stream, fmt, args.workers, progress)
+    print_report(report)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,40 +1,60 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
-from database import get_db, hash_password, get_constituencies  # ADD get_constituencies here
+from database import (get_db, hash_password, verify_password, needs_rehash, get_constituencies,
+                      constituency_id, constituency_name)
+from passwords import PasswordHasherBusy
+from cache import LRUCache
+from ratelimit import rate_limit, form_field, session_field
+from httpcache import versioned, bump_data_version, data_version, tally_version
+import registrations
+from registrations import create_registration, verify_registration, discard_registration
+import voting
+from voting import cast_vote, make_receipt, receipt_code
+from queries import run
 import os
 from auth import voter_login_required, generate_otp, send_otp_email, log_audit
 from datetime import datetime
 import smtplib
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from database import get_constituencies
-import sqlite3
 
 voter_bp = Blueprint('voter_routes', __name__)
 
+# Per-worker cache of what the profile page shows; never the password hash
+# (nothing edits these columns, so a worker-local TTL is enough)
+VOTER_DISPLAY_COLUMNS = 'id, name, email, constituency_id, is_verified, created_at'
+voter_cache = LRUCache(maxsize=int(os.getenv('VOTER_CACHE_SIZE', 10000)),
+                       ttl=float(os.getenv('VOTER_CACHE_TTL', 60)))
+
 def get_current_voter():
     """Get current voter from session"""
     if 'voter_id' in session:
-        with get_db() as db:
-            with db.cursor() as cursor:
-                cursor.execute('SELECT * FROM voters WHERE id = %s', (session['voter_id'],))
-                return cursor.fetchone()
+        voter_id = session['voter_id']
+        voter = voter_cache.get(voter_id)
+        if voter is None:
+            with get_db() as db:
+                with db.cursor() as cursor:
+                    cursor.execute(f'SELECT {VOTER_DISPLAY_COLUMNS} FROM voters WHERE id = %s', (voter_id,))
+                    voter = cursor.fetchone()
+            if voter is not None:
+                voter_cache.set(voter_id, voter)
+        return voter
     return None
 
 def get_voter_history(voter_id):
     """Get voting history for a voter"""
-    with get_db() as db:
+    with get_db(readonly=True) as db:
         with db.cursor() as cursor:
             cursor.execute('''
                 SELECT 
-                    e.title as election_title,
-                    e.constituency,
+                    e.title,
+                    e.constituency_id,
                     c.name as candidate_name,
                     c.party,
                     v.voted_at
                 FROM votes v
                 JOIN elections e ON v.election_id = e.id
                 JOIN candidates c ON v.candidate_id = c.id
-                WHERE v.voter_id = %s
+                WHERE v.voter_id = %s AND e.deleted_at IS NULL AND c.deleted_at IS NULL
                 ORDER BY v.voted_at DESC
             ''', (voter_id,))
             return cursor.fetchall()
@@ -48,41 +68,67 @@ def update_election_status():
             cursor.execute('''
                 UPDATE elections 
                 SET status = 'active' 
-                WHERE start_time <= %s AND end_time >= %s AND status = 'upcoming'
+                WHERE start_time <= %s AND end_time >= %s AND status = 'upcoming' AND deleted_at IS NULL
             ''', (current_time, current_time))
+            changed = cursor.rowcount
             
             # Update to completed
             cursor.execute('''
                 UPDATE elections 
                 SET status = 'completed' 
-                WHERE end_time < %s AND status != 'completed'
+                WHERE end_time < %s AND status != 'completed' AND deleted_at IS NULL
             ''', (current_time,))
+            changed += cursor.rowcount
+
+            if changed:
+                bump_data_version(cursor)
             db.commit()
 
 @voter_bp.route('/voter/login', methods=['GET', 'POST'])
+@rate_limit('voter_login', account=form_field('email'))
 def voter_login():
     if request.method == 'POST':
         email = request.form['email']
-        password = hash_password(request.form['password'])
+        password = request.form['password']
         
         with get_db() as db:
             with db.cursor() as cursor:
                 cursor.execute(
-                    'SELECT * FROM voters WHERE email = %s AND password = %s',
-                    (email, password)
+                    'SELECT * FROM voters WHERE email = %s',
+                    (email,)
                 )
                 voter = cursor.fetchone()
             
-            if voter:
+            try:
+                valid = voter is not None and verify_password(password, voter['password'])
+            except PasswordHasherBusy:
+                flash('The server is busy. Please try logging in again in a moment.', 'error')
+                return render_template('voter_login.html'), 503
+            
+            if valid:
+                # Upgrade legacy SHA-256 / low-cost hashes now that we know the password
+                if needs_rehash(voter['password']):
+                    try:
+                        with db.cursor() as cursor:
+                            cursor.execute(
+                                'UPDATE voters SET password = %s WHERE id = %s',
+                                (hash_password(password), voter['id'])
+                            )
+                        db.commit()
+                    except PasswordHasherBusy:
+                        pass  # busy: the next login upgrades it
+                
                 # Check if voter is verified
                 if not voter['is_verified']:
                     flash('Please verify your email before logging in', 'error')
                     return redirect(url_for('voter_routes.verify_email'))
                 
+                # A fresh session id, so one planted before login can't be reused
+                session.regenerate()
                 session['voter_id'] = voter['id']
                 session['voter_name'] = voter['name']
                 session['voter_email'] = voter['email']
-                session['voter_constituency'] = voter['constituency']
+                session['voter_constituency'] = constituency_name(voter['constituency_id'])
                 flash('Login successful!', 'success')
                 return redirect(url_for('voter_routes.voter_dashboard'))
             else:
@@ -91,6 +137,7 @@ def voter_login():
     return render_template('voter_login.html')
 
 @voter_bp.route('/voter/register', methods=['GET', 'POST'])
+@rate_limit('voter_register', account=form_field('email'))
 def voter_register():
     # GET CONSTITUENCIES FROM DATABASE
     constituencies = get_constituencies()
@@ -98,51 +145,48 @@ def voter_register():
     if request.method == 'POST':
         name = request.form['name']
         email = request.form['email']
-        password = hash_password(request.form['password'])
         constituency = request.form['constituency']
+        if constituency_id(constituency) is None:
+            flash('Please select a valid constituency', 'error')
+            return render_template('voter_register.html', constituencies=constituencies)
+        try:
+            password = hash_password(request.form['password'])
+        except PasswordHasherBusy:
+            flash('The server is busy. Please try again in a moment.', 'error')
+            return render_template('voter_register.html', constituencies=constituencies), 503
         
-        with get_db() as db:
-            with db.cursor() as cursor:
-                # Check if email already exists
-                cursor.execute(
-                    'SELECT * FROM voters WHERE email = %s', (email,)
-                )
-                existing_voter = cursor.fetchone()
-            
-            if existing_voter:
-                flash('Email already registered', 'error')
-                return render_template('voter_register.html', constituencies=constituencies)
-            
-            # Generate OTP
-            otp = generate_otp()
-            otp_expiry = datetime.now().timestamp() + 600  # 10 minutes
-            
-            # Store voter data in session for verification
-            session['pending_voter'] = {
-                'name': name,
-                'email': email,
-                'password': password,
-                'constituency': constituency,
-                'otp': otp,
-                'otp_expiry': otp_expiry
-            }
-            
-            # Send OTP email with more detailed feedback
-            print(f"🔄 Attempting to send OTP to {email}")
-            if send_otp_email(email, otp):
-                flash(f'OTP sent to {email}. Please verify to complete registration.', 'success')
-                return redirect(url_for('voter_routes.verify_email'))
-            else:
-                # Show user-friendly error message
-                flash('Failed to send OTP. Please check your email address and try again.', 'error')
-                # Keep form data
-                return render_template('voter_register.html', 
-                                     constituencies=constituencies,
-                                     form_data={'name': name, 'email': email, 'constituency': constituency})
+        # Generate OTP and park the registration until it is verified
+        otp = generate_otp()
+        previous = session.get('pending_voter')
+        registration_id = create_registration(name, email, password, constituency_id(constituency), otp,
+                                              replaces=previous and previous['id'])
+        
+        if registration_id is None:
+            flash('Email already registered', 'error')
+            return render_template('voter_register.html', constituencies=constituencies)
+        
+        # Only the registration id goes in the session; the OTP stays server-side
+        session['pending_voter'] = {'id': registration_id, 'email': email}
+        
+        # Send OTP email with more detailed feedback
+        print(f"🔄 Attempting to send OTP to {email}")
+        if send_otp_email(email, otp):
+            flash(f'OTP sent to {email}. Please verify to complete registration.', 'success')
+            return redirect(url_for('voter_routes.verify_email'))
+        else:
+            discard_registration(registration_id)
+            session.pop('pending_voter', None)
+            # Show user-friendly error message
+            flash('Failed to send OTP. Please check your email address and try again.', 'error')
+            # Keep form data
+            return render_template('voter_register.html', 
+                                 constituencies=constituencies,
+                                 form_data={'name': name, 'email': email, 'constituency': constituency})
     
     return render_template('voter_register.html', constituencies=constituencies)
     
 @voter_bp.route('/voter/verify-email', methods=['GET', 'POST'])
+@rate_limit('verify_email', account=session_field('pending_voter', 'email'))
 def verify_email():
     # Check if pending voter data exists
     pending = session.get('pending_voter')
@@ -152,96 +196,88 @@ def verify_email():
 
     # Handle POST - user submitted OTP
     if request.method == 'POST':
-        entered_otp = request.form.get('otp', '')
-        saved_otp = pending['otp']
-        expiry_time = pending['otp_expiry']
+        entered_otp = request.form.get('otp', '').strip()
+        outcome = verify_registration(pending['id'], pending['email'], entered_otp)
 
-        # Check expiry
-        if datetime.now().timestamp() > expiry_time:
-            session.pop('pending_voter', None)
+        if outcome == registrations.INVALID:
+            flash('Invalid verification code', 'error')
+            return redirect(url_for('voter_routes.verify_email'))
+
+        # Every other outcome ends this pending registration
+        session.pop('pending_voter', None)
+
+        if outcome == registrations.EXPIRED:
             flash('OTP expired. Please register again.', 'error')
             return redirect(url_for('voter_routes.voter_register'))
 
-        # Check OTP match
-        if entered_otp != saved_otp:
-            flash('Invalid verification code', 'error')
-            return redirect(url_for('voter_routes.verify_email'))
+        if outcome == registrations.TOO_MANY_ATTEMPTS:
+            discard_registration(pending['id'])
+            flash('Too many incorrect codes. Please register again.', 'error')
+            return redirect(url_for('voter_routes.voter_register'))
 
-        # OTP is correct → save voter to DB
-        with get_db() as db:
-            with db.cursor() as cursor:
-                # Use 't' for true in PostgreSQL
-                cursor.execute('''
-                    INSERT INTO voters (name, email, password, constituency, is_verified)
-                    VALUES (%s, %s, %s, %s, 't')
-                ''', (pending['name'], pending['email'], pending['password'], pending['constituency']))
-                db.commit()
+        if outcome == registrations.ALREADY_REGISTERED:
+            flash('Email already registered. Please log in.', 'error')
+            return redirect(url_for('voter_routes.voter_login'))
 
-        # Clear session pending data
-        session.pop('pending_voter', None)
         flash('Email verified successfully! You can now log in.', 'success')
-
         return redirect(url_for('voter_routes.voter_login'))
 
     return render_template('verify_email.html')
 
 
+def dashboard_version():
+    update_election_status()  # Update election status first
+    with get_db(readonly=True) as db:
+        with db.cursor() as cursor:
+            cursor.execute('SELECT MAX(id) AS last_vote FROM votes WHERE voter_id = %s',
+                           (session['voter_id'],))
+            last_vote = cursor.fetchone()['last_vote']
+            return data_version(cursor), session['voter_constituency'], last_vote
+
 @voter_bp.route('/voter/dashboard')
 @voter_login_required
+@versioned(dashboard_version)
 def voter_dashboard():
-    update_election_status()  # Update election status first
-    
-    with get_db() as db:
+
+    with get_db(readonly=True) as db:
         with db.cursor() as cursor:
             # Get active elections for voter's constituency
             cursor.execute('''
                 SELECT * FROM elections 
-                WHERE status = 'active' AND constituency = %s
+                WHERE status = 'active' AND constituency_id = %s AND deleted_at IS NULL
                 ORDER BY created_at DESC
-            ''', (session['voter_constituency'],))
+            ''', (constituency_id(session['voter_constituency']),))
             active_elections = cursor.fetchall()
             
             # Get upcoming elections
             cursor.execute('''
                 SELECT * FROM elections 
-                WHERE status = 'upcoming' AND constituency = %s
+                WHERE status = 'upcoming' AND constituency_id = %s AND deleted_at IS NULL
                 ORDER BY start_time ASC
-            ''', (session['voter_constituency'],))
+            ''', (constituency_id(session['voter_constituency']),))
             upcoming_elections = cursor.fetchall()
             
             # Get elections the voter has already voted in
             cursor.execute('''
                 SELECT e.* FROM elections e
                 JOIN votes v ON e.id = v.election_id
-                WHERE v.voter_id = %s
+                WHERE v.voter_id = %s AND e.deleted_at IS NULL
             ''', (session['voter_id'],))
             voted_elections = cursor.fetchall()
             
             # Get completed elections in voter's constituency
             cursor.execute('''
                 SELECT * FROM elections 
-                WHERE status = 'completed' AND constituency = %s
+                WHERE status = 'completed' AND constituency_id = %s AND deleted_at IS NULL
                 ORDER BY end_time DESC
-            ''', (session['voter_constituency'],))
+            ''', (constituency_id(session['voter_constituency']),))
             completed_elections = cursor.fetchall()
     
-    # Convert datetime objects to string format
-    def format_election_datetimes(elections_list):
-        formatted = []
-        for election in elections_list:
-            election_data = dict(election)
-            election_data['start_time'] = election['start_time'].strftime('%Y-%m-%d %H:%M')
-            election_data['end_time'] = election['end_time'].strftime('%Y-%m-%d %H:%M')
-            if election.get('created_at'):
-                election_data['created_at'] = election['created_at'].strftime('%Y-%m-%d %H:%M')
-            formatted.append(election_data)
-        return formatted
-    
     return render_template('voter_dashboard.html',
-                         active_elections=format_election_datetimes(active_elections),
-                         upcoming_elections=format_election_datetimes(upcoming_elections),
-                         voted_elections=format_election_datetimes(voted_elections),
-                         completed_elections=format_election_datetimes(completed_elections))
+                         active_elections=active_elections,
+                         upcoming_elections=upcoming_elections,
+                         voted_elections=voted_elections,
+                         completed_elections=completed_elections)
 
 @voter_bp.route('/voter/vote/<int:election_id>')
 @voter_login_required
@@ -249,167 +285,88 @@ def vote(election_id):
     with get_db() as db:
         with db.cursor() as cursor:
             # Check if election exists and is active
-            cursor.execute(
-                'SELECT * FROM elections WHERE id = %s AND status = \'active\'',
-                (election_id,)
-            )
-            election = cursor.fetchone()
+            election = run(cursor, 'active_election', (election_id,)).fetchone()
             
             if not election:
                 flash('Election not found or not active', 'error')
                 return redirect(url_for('voter_routes.voter_dashboard'))
             
             # Check if voter has already voted in this election
-            cursor.execute(
-                'SELECT * FROM votes WHERE voter_id = %s AND election_id = %s',
-                (session['voter_id'], election_id)
-            )
-            existing_vote = cursor.fetchone()
+            existing_vote = run(cursor, 'has_voted', (session['voter_id'], election_id)).fetchone()
             
             if existing_vote:
                 flash('You have already voted in this election', 'error')
                 return redirect(url_for('voter_routes.voter_dashboard'))
             
             # Check if voter's constituency matches election constituency
-            if session['voter_constituency'] != election['constituency']:
+            if constituency_id(session['voter_constituency']) != election['constituency_id']:
                 flash('This election is not for your constituency', 'error')
                 return redirect(url_for('voter_routes.voter_dashboard'))
             
             # Get candidates for this election (same constituency)
-            cursor.execute('''
-                SELECT * FROM candidates 
-                WHERE constituency = %s
-                ORDER BY name
-            ''', (election['constituency'],))
-            candidates = cursor.fetchall()
-    
-    # Convert datetime objects to string format for template
-    election_data = dict(election)
-    election_data['start_time'] = election['start_time'].strftime('%Y-%m-%d %H:%M')
-    election_data['end_time'] = election['end_time'].strftime('%Y-%m-%d %H:%M')
+            candidates = run(cursor, 'candidates_by_constituency', (election['constituency_id'],)).fetchall()
     
     return render_template('vote.html', 
-                         election=election_data, 
+                         election=election, 
                          candidates=candidates)
 
 @voter_bp.route('/voter/submit-vote/<int:election_id>', methods=['POST'])
 @voter_login_required
 def submit_vote(election_id):
-    candidate_id = request.form.get('candidate_id')
+    candidate_id = request.form.get('candidate_id', type=int)
     
     if not candidate_id:
         flash('Please select a candidate', 'error')
         return redirect(url_for('voter_routes.vote', election_id=election_id))
     
-    with get_db() as db:
-        with db.cursor() as cursor:
-            # Double-check voting constraints
-            cursor.execute(
-                'SELECT * FROM elections WHERE id = %s AND status = \'active\'',
-                (election_id,)
-            )
-            election = cursor.fetchone()
-            
-            if not election:
-                flash('Election not found or not active', 'error')
-                return redirect(url_for('voter_routes.voter_dashboard'))
-            
-            cursor.execute(
-                'SELECT * FROM votes WHERE voter_id = %s AND election_id = %s',
-                (session['voter_id'], election_id)
-            )
-            existing_vote = cursor.fetchone()
-            
-            if existing_vote:
-                flash('You have already voted in this election', 'error')
-                return redirect(url_for('voter_routes.voter_dashboard'))
-            
-            # Verify candidate exists and is in correct constituency
-            cursor.execute(
-                'SELECT * FROM candidates WHERE id = %s AND constituency = %s',
-                (candidate_id, election['constituency'])
-            )
-            candidate = cursor.fetchone()
-            
-            if not candidate:
-                flash('Invalid candidate selection', 'error')
-                return redirect(url_for('voter_routes.vote', election_id=election_id))
-            
-            # Record the vote
-            try:
-                # Try with voted_at first
-                cursor.execute('''
-                    INSERT INTO votes (voter_id, election_id, candidate_id, voted_at)
-                    VALUES (%s, %s, %s, %s)
-                ''', (session['voter_id'], election_id, candidate_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
-            except Exception as e:
-                # If voted_at column doesn't exist or other error, insert without it
-                cursor.execute('''
-                    INSERT INTO votes (voter_id, election_id, candidate_id)
-                    VALUES (%s, %s, %s)
-                ''', (session['voter_id'], election_id, candidate_id))
-            
-            db.commit()
-            
-            # Log the voting action
-            log_audit('vote_cast', 'voter', session['voter_id'], 
-                     f'Voted in election {election_id} for candidate {candidate_id}')
+    outcome, vote = cast_vote(session['voter_id'], constituency_id(session['voter_constituency']),
+                              election_id, candidate_id)
+    
+    if outcome == voting.INVALID_CANDIDATE:
+        flash(voting.MESSAGES[outcome], 'error')
+        return redirect(url_for('voter_routes.vote', election_id=election_id))
     
-    flash('Vote cast successfully! Thank you for voting.', 'success')
+    if vote:
+        code = receipt_code(make_receipt(vote, session['voter_id'], election_id))
+        flash(f"{voting.MESSAGES[outcome]} Receipt code: {code}", 'success')
+    else:
+        flash(voting.MESSAGES[outcome], 'error')
     return redirect(url_for('voter_routes.voter_dashboard'))
 
+def results_version():
+    election_id = request.args.get('election_id', type=int)
+    with get_db(readonly=True) as db:
+        with db.cursor() as cursor:
+            return (data_version(cursor), session['voter_constituency'],
+                    election_id and tally_version(cursor, election_id))
+
 @voter_bp.route('/voter/results')
 @voter_login_required
+@versioned(results_version)
 def view_results():
     election_id = request.args.get('election_id')
     
-    with get_db() as db:
+    with get_db(readonly=True) as db:
         with db.cursor() as cursor:
             # Get elections in voter's constituency
             cursor.execute('''
                 SELECT * FROM elections 
-                WHERE constituency = %s AND status = 'completed'
+                WHERE constituency_id = %s AND status = 'completed' AND deleted_at IS NULL
                 ORDER BY end_time DESC
-            ''', (session['voter_constituency'],))
+            ''', (constituency_id(session['voter_constituency']),))
             elections = cursor.fetchall()
             
             if election_id:
-                cursor.execute('''
-                    SELECT c.name, c.party, COUNT(v.id) as vote_count
-                    FROM candidates c
-                    LEFT JOIN votes v ON c.id = v.candidate_id AND v.election_id = %s
-                    WHERE c.constituency = %s
-                    GROUP BY c.id
-                    ORDER BY vote_count DESC
-                ''', (election_id, session['voter_constituency']))
-                results = cursor.fetchall()
-                
-                cursor.execute('SELECT * FROM elections WHERE id = %s', (election_id,))
-                election = cursor.fetchone()
+                results = run(cursor, 'tally', (election_id, constituency_id(session['voter_constituency']))).fetchall()
+                election = run(cursor, 'election_by_id', (election_id,)).fetchone()
             else:
                 results = []
                 election = None
     
-    # Convert datetime objects to string format for template
-    def format_election(election_data):
-        if election_data:
-            election_dict = dict(election_data)
-            election_dict['start_time'] = election_data['start_time'].strftime('%Y-%m-%d %H:%M')
-            election_dict['end_time'] = election_data['end_time'].strftime('%Y-%m-%d %H:%M')
-            if election_data.get('created_at'):
-                election_dict['created_at'] = election_data['created_at'].strftime('%Y-%m-%d %H:%M')
-            return election_dict
-        return None
-    
-    # Convert all elections in the list
-    formatted_elections = []
-    for e in elections:
-        formatted_elections.append(format_election(e))
-    
     return render_template('voter_results.html', 
-                         elections=formatted_elections, 
+                         elections=elections, 
                          results=results, 
-                         election=format_election(election))
+                         election=election)
 
 # FIXED: Changed @app.route to @voter_bp.route
 @voter_bp.route('/voter/profile')
@@ -424,37 +381,9 @@ def voter_profile():
     # Fetch voting history from database
     history = get_voter_history(voter['id'])
     
-    # Format the history properly
-    formatted_history = []
-    for record in history:
-        formatted_record = {
-            'title': record['election_title'],
-            'constituency': record['constituency'],
-            'candidate_name': record['candidate_name'],
-            'party': record['party'],
-            'voted_at': record['voted_at']
-        }
-        
-        # Handle voted_at - if it's a datetime object, convert to string
-        # If it's already a string, leave it as is
-        if hasattr(formatted_record['voted_at'], 'strftime'):
-            formatted_record['voted_at'] = formatted_record['voted_at'].strftime('%Y-%m-%d %H:%M:%S')
-        elif formatted_record['voted_at'] is None:
-            formatted_record['voted_at'] = None
-        
-        formatted_history.append(formatted_record)
-    
-    # Ensure voter dict has required fields for template
-    voter_dict = dict(voter)
-    voter_dict['name'] = voter['name']
-    voter_dict['email'] = voter['email']
-    voter_dict['constituency'] = voter['constituency']
-    voter_dict['is_verified'] = voter['is_verified']
-    voter_dict['created_at'] = voter.get('created_at')  # Handle if created_at doesn't exist
-    
     return render_template('voter_profile.html',
-                         voter=voter_dict,
-                         voting_history=formatted_history)
+                         voter=voter,
+                         voting_history=history)
 
 @voter_bp.route('/voter/logout')
 def voter_logout():
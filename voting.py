@@ -0,0 +1,164 @@
+"""Casting votes, shared by the ballot form and the JSON API.
+
+cast_vote() checks the election, constituency and candidate and records the
+vote and its audit entry in one transaction. The UNIQUE (voter_id,
+election_id) constraint decides double votes, so two concurrent submissions
+cannot both succeed.
+
+votes is list-partitioned by election_id; every election gets its own
+partition (votes_e<id>) when it is created and loses it when it is deleted.
+The SQLite backend keeps votes in one table.
+
+Each cast vote gets a receipt: a token signed with SECRET_KEY naming the
+vote, voter, election and time (but not the candidate), which
+load_receipt() can later check against the votes table.
+"""
+import hashlib
+from datetime import datetime
+
+from flask import current_app
+from itsdangerous import URLSafeSerializer, BadSignature
+
+from auth import log_audit
+from database import get_db, connect, mark_write, backend, SQLITE
+from queries import run
+
+# Outcomes of cast_vote()
+CAST = 'cast'
+NOT_ACTIVE = 'not_active'
+WRONG_CONSTITUENCY = 'wrong_constituency'
+INVALID_CANDIDATE = 'invalid_candidate'
+ALREADY_VOTED = 'already_voted'
+
+MESSAGES = {
+    CAST: 'Vote cast successfully! Thank you for voting.',
+    NOT_ACTIVE: 'Election not found or not active',
+    WRONG_CONSTITUENCY: 'This election is not for your constituency',
+    INVALID_CANDIDATE: 'Invalid candidate selection',
+    ALREADY_VOTED: 'You have already voted in this election',
+}
+
+
+def cast_vote(voter_id, voter_constituency_id, election_id, candidate_id):
+    """Record a vote. Returns (outcome, vote) where vote has id and voted_at if cast."""
+    with get_db() as db:
+        with db.cursor() as cursor:
+            election = run(cursor, 'active_election', (election_id,)).fetchone()
+            if not election:
+                return NOT_ACTIVE, None
+            if election['constituency_id'] != voter_constituency_id:
+                return WRONG_CONSTITUENCY, None
+
+            if not run(cursor, 'candidate_in_constituency',
+                       (candidate_id, election['constituency_id'])).fetchone():
+                return INVALID_CANDIDATE, None
+
+            row = run(cursor, 'insert_vote',
+                      (voter_id, election_id, candidate_id, datetime.now())).fetchone()
+            if row is None:
+                db.rollback()
+                return ALREADY_VOTED, None
+
+            log_audit('vote_cast', 'voter', voter_id,
+                      f'Voted in election {election_id} for candidate {candidate_id}',
+                      cursor=cursor)
+            # Dashboards and results may read from a replica; they must show this vote
+            mark_write()
+            db.commit()
+            return CAST, row
+
+
+# ----------------------------------------------------------------------
+# PARTITIONS
+# ----------------------------------------------------------------------
+def vote_partition(election_id):
+    return f'votes_e{int(election_id)}'
+
+
+def create_vote_partition(cursor, election_id):
+    """Create an election's votes partition; call in the transaction that inserts the election"""
+    if backend() == SQLITE:
+        return
+    cursor.execute(f'CREATE TABLE IF NOT EXISTS {vote_partition(election_id)} '
+                   f'PARTITION OF votes FOR VALUES IN ({int(election_id)})')
+
+
+def detach_vote_partition(election_id, lock_timeout):
+    """Detach an election's votes partition without blocking voting (Postgres 14+).
+
+    A DROP of a partition needs ACCESS EXCLUSIVE on `votes` itself, and while
+    it waits for that lock every cast_vote() INSERT queues behind it. DETACH
+    ... CONCURRENTLY only takes SHARE UPDATE EXCLUSIVE, which inserts don't
+    conflict with. It can't run inside a transaction, so it gets its own
+    autocommit connection.
+    """
+    if backend() == SQLITE:
+        return
+    partition = vote_partition(election_id)
+    conn = connect()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute('SET lock_timeout = %s', (lock_timeout,))
+            cursor.execute('''
+                SELECT inhdetachpending FROM pg_inherits
+                WHERE inhrelid = to_regclass(%s) AND inhparent = 'votes'::regclass
+            ''', (partition,))
+            row = cursor.fetchone()
+            if row is None:
+                return  # already detached, or never created
+            if row['inhdetachpending']:
+                # An earlier detach was interrupted between its two phases
+                cursor.execute(f'ALTER TABLE votes DETACH PARTITION {partition} FINALIZE')
+            else:
+                cursor.execute(f'ALTER TABLE votes DETACH PARTITION {partition} CONCURRENTLY')
+    finally:
+        conn.close()
+
+
+def drop_vote_partition(cursor, election_id):
+    """Drop an election's votes in one step instead of deleting them row by row.
+    On Postgres call detach_vote_partition() first, so the DROP doesn't lock `votes`."""
+    if backend() == SQLITE:
+        cursor.execute('DELETE FROM votes WHERE election_id = %s', (election_id,))
+        return
+    cursor.execute(f'DROP TABLE IF EXISTS {vote_partition(election_id)}')
+
+
+# ----------------------------------------------------------------------
+# RECEIPTS
+# ----------------------------------------------------------------------
+def _receipt_serializer():
+    return URLSafeSerializer(current_app.secret_key, salt='vote-receipt')
+
+
+def make_receipt(vote, voter_id, election_id):
+    """Signed receipt token for a vote returned by cast_vote()"""
+    return _receipt_serializer().dumps({
+        'vote': vote['id'],
+        'voter': voter_id,
+        'election': election_id,
+        'at': vote['voted_at'].isoformat(timespec='seconds'),
+    })
+
+
+def receipt_code(token):
+    """Short code for people to read out or compare"""
+    return hashlib.sha256(token.encode()).hexdigest()[:10].upper()
+
+
+def load_receipt(token):
+    """The receipt's contents if its signature is valid and the vote still exists, else None"""
+    try:
+        receipt = _receipt_serializer().loads(token)
+    except BadSignature:
+        return None
+    with get_db() as db:
+        with db.cursor() as cursor:
+            cursor.execute(
+                'SELECT 1 FROM votes WHERE id = %s AND voter_id = %s AND election_id = %s',
+                (receipt['vote'], receipt['voter'], receipt['election'])
+            )
+            if not cursor.fetchone():
+                return None
+    return receipt